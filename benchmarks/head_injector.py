@@ -0,0 +1,115 @@
+"""
+Micro-benchmark of the streaming head injector against the previous
+line-based implementation.
+
+Run with:
+
+    uv run python benchmarks/head_injector.py
+"""
+
+import base64
+import io
+import json
+import os
+import timeit
+from functools import partial
+from typing import IO, Any, Generator
+
+from schorle.streaming import build_head_injection, inject_head
+
+CHUNK_SIZE = 4096
+
+
+def legacy_injector(
+    stream: IO[bytes], render_request: dict[str, Any], props: bytes | None
+) -> Generator[bytes, None, None]:
+    """The injector used before the byte-level rewriter, kept verbatim."""
+    for line in stream:
+        decoded = line.decode("utf-8")
+        injection = ""
+
+        if render_request["css"]:
+            injection += f"<link rel='stylesheet' href='{render_request['css']}' />\n"
+
+        if props:
+            props_b64 = base64.b64encode(props).decode("utf-8")
+            injection += f"<script id='__SCHORLE_PROPS__' type='application/msgpack'>{props_b64}</script>\n"
+
+        if render_request["headers"]:
+            injection += f"<script id='__SCHORLE_HEADERS__' type='application/json'>{json.dumps(render_request['headers'])}</script>\n"
+
+        if render_request["cookies"]:
+            injection += f"<script id='__SCHORLE_COOKIES__' type='application/json'>{json.dumps(render_request['cookies'])}</script>\n"
+
+        injected = decoded.replace("</head>", f"{injection}</head>")
+        yield injected.encode("utf-8")
+
+
+def make_document(body_bytes: int, newline_every: int) -> bytes:
+    head = b"<!DOCTYPE html><html lang='en'><head><meta charset='utf-8'/></head>"
+    row = b"<div class='row'>" + b"x" * 48 + b"</div>"
+    rows = []
+    size = 0
+    while size < body_bytes:
+        rows.append(row)
+        size += len(row)
+        if newline_every and len(rows) % newline_every == 0:
+            rows.append(b"\n")
+    return head + b"<body>" + b"".join(rows) + b"</body></html>"
+
+
+def run_legacy(document: bytes, render_request: dict[str, Any], props: bytes) -> int:
+    return sum(
+        len(chunk)
+        for chunk in legacy_injector(io.BytesIO(document), render_request, props)
+    )
+
+
+def run_streaming(document: bytes, render_request: dict[str, Any], props: bytes) -> int:
+    chunks = (document[i : i + CHUNK_SIZE] for i in range(0, len(document), CHUNK_SIZE))
+    injection = build_head_injection(render_request, props)
+    return sum(len(chunk) for chunk in inject_head(chunks, injection))
+
+
+def main() -> None:
+    render_request = {
+        "css": "/.schorle/dist/client/pages/Index/assets/abc123.css",
+        "js": "/.schorle/dist/client/pages/Index/abc123.js",
+        "headers": {"user-agent": "bench/1.0", "accept": "text/html"},
+        "cookies": {"session": "abc123"},
+    }
+    props = os.urandom(32 * 1024)
+
+    scenarios = {
+        "1 MiB, no newlines": make_document(1024 * 1024, 0),
+        "1 MiB, newline every 20 rows": make_document(1024 * 1024, 20),
+        "64 KiB, newline every row": make_document(64 * 1024, 1),
+    }
+
+    print(f"{'scenario':<32}{'legacy':>12}{'streaming':>12}{'speedup':>10}")
+    for name, document in scenarios.items():
+        assert run_legacy(document, render_request, props) == run_streaming(
+            document, render_request, props
+        )
+        legacy = min(
+            timeit.repeat(
+                partial(run_legacy, document, render_request, props),
+                number=20,
+                repeat=5,
+            )
+        )
+        streaming = min(
+            timeit.repeat(
+                partial(run_streaming, document, render_request, props),
+                number=20,
+                repeat=5,
+            )
+        )
+        print(
+            f"{name:<32}{legacy / 20 * 1000:>10.3f}ms{streaming / 20 * 1000:>10.3f}ms"
+            f"{legacy / streaming:>9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
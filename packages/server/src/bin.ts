@@ -2,6 +2,7 @@
 
 import { build } from "./build";
 import { render } from "./render";
+import { serve } from "./worker";
 
 const [, , command, ...args] = Bun.argv;
 
@@ -22,6 +23,8 @@ if (command === "build") {
     throw new Error("Server JS path and render request required for render");
   }
   await render(serverJsPath, renderRequest);
+} else if (command === "worker") {
+  await serve();
 } else {
   throw new Error(`Unknown command ${command}`);
 }
@@ -2,10 +2,13 @@ import type { BuildArtifact, BunPlugin } from "bun";
 import plugin from "bun-plugin-tailwind";
 import { relative } from "path";
 import mdx from "@mdx-js/esbuild";
+import { islandsPlugin } from "./islands";
 
 interface BuildConfig {
   client?: string[];
   server?: string[];
+  // absolute paths of "use island" files, mapped to their island ids
+  islands?: Record<string, string>;
 }
 
 export async function build(configRaw: string) {
@@ -51,6 +54,7 @@ export async function build(configRaw: string) {
     : "pages/[dir]/[name]/assets/[hash].[ext]";
 
   const allArtifacts: any[] = [];
+  const islands = islandsPlugin(config.islands ?? {});
 
   // Build client entries if they exist
   if (config.client && config.client.length > 0) {
@@ -59,6 +63,7 @@ export async function build(configRaw: string) {
       outdir: ".schorle/dist/client",
       plugins: [
         plugin,
+        islands,
         mdx({
           jsxImportSource: "react",
           // This ensures MDX files are treated as JSX
@@ -103,6 +108,7 @@ export async function build(configRaw: string) {
       entrypoints: config.server,
       outdir: ".schorle/dist/server",
       plugins: [
+        islands,
         mdx({
           jsxImportSource: "react",
           development: isDev,
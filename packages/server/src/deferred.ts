@@ -0,0 +1,111 @@
+import { decode } from "msgpackr";
+
+interface DeferredEntry {
+  name: string;
+  value?: unknown;
+  error?: string;
+}
+
+interface Settler {
+  resolve: (value: unknown) => void;
+  reject: (error: Error) => void;
+}
+
+/**
+ * Deferred props of one render, settled by `Defer` frames after it started.
+ *
+ * Pages read them through `useDeferredProp`, which suspends until the value
+ * arrives. Every settled value is also turned into a hydration script that
+ * hands the same payload to the client.
+ */
+export class DeferredProps {
+  private readonly promises = new Map<string, Promise<unknown>>();
+  private readonly settlers = new Map<string, Settler>();
+  private scripts = "";
+
+  constructor(names: string[] = []) {
+    for (const name of names) {
+      const promise = new Promise<unknown>((resolve, reject) => {
+        this.settlers.set(name, { resolve, reject });
+      });
+      // a value nobody reads must not turn into an unhandled rejection
+      promise.catch(() => {});
+      this.promises.set(name, promise);
+    }
+  }
+
+  get(name: string): Promise<unknown> {
+    return (
+      this.promises.get(name) ??
+      Promise.reject(new Error(`Deferred prop ${name} was not passed to the render`))
+    );
+  }
+
+  settle(payload: Uint8Array) {
+    const { name, value, error } = decode(payload) as DeferredEntry;
+    const settler = this.settlers.get(name);
+    if (!settler) {
+      console.error(`Received unknown deferred prop ${name}`);
+      return;
+    }
+    this.settlers.delete(name);
+    if (error !== undefined) {
+      settler.reject(new Error(error));
+    } else {
+      settler.resolve(value);
+    }
+    const data = Buffer.from(payload).toString("base64");
+    this.scripts += `<script>(self.__SCHORLE_DEFERRED__=self.__SCHORLE_DEFERRED__||[]).push("${data}")</script>`;
+  }
+
+  /** Reject the values that did not arrive, e.g. when the render is aborted. */
+  cancel() {
+    for (const settler of this.settlers.values()) {
+      settler.reject(new Error("Render aborted"));
+    }
+    this.settlers.clear();
+    this.scripts = "";
+  }
+
+  /** Hydration scripts of the values settled since the last call. */
+  takeScripts(): string {
+    const scripts = this.scripts;
+    this.scripts = "";
+    return scripts;
+  }
+
+  /** Resolves once every deferred prop has a value or an error. */
+  async settled(): Promise<void> {
+    await Promise.allSettled(this.promises.values());
+  }
+}
+
+/**
+ * Group the chunks of a React stream by flush.
+ *
+ * React enqueues all chunks of a flush within one task, split at arbitrary
+ * byte offsets. Between two flushes the document is at a point where markup
+ * can be inserted without breaking it.
+ */
+export async function* flushes(
+  reader: ReadableStreamDefaultReader<Uint8Array>,
+): AsyncGenerator<Uint8Array[]> {
+  let next = reader.read();
+  for (;;) {
+    const first = await next;
+    if (first.done) return;
+    const batch = [first.value];
+    const endOfTask = new Promise<null>((resolve) => setImmediate(() => resolve(null)));
+    for (;;) {
+      next = reader.read();
+      const result = await Promise.race([next, endOfTask]);
+      if (result === null) break;
+      if (result.done) {
+        yield batch;
+        return;
+      }
+      batch.push(result.value);
+    }
+    yield batch;
+  }
+}
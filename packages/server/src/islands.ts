@@ -0,0 +1,39 @@
+import type { BunPlugin, Loader } from "bun";
+
+const EXPORT_DEFAULT = /\bexport\s+default\s+/;
+
+/** Wrap the default export of an island module in `withIsland`. */
+export function islandSource(id: string, source: string): string {
+  if (!EXPORT_DEFAULT.test(source)) {
+    throw new Error(`Island ${id} has no default export`);
+  }
+  return (
+    source.replace(EXPORT_DEFAULT, "const __SchorleIsland = ") +
+    `\nimport { withIsland as __withIsland } from "@schorle/shared";\n` +
+    `export default __withIsland(${JSON.stringify(id)}, __SchorleIsland);\n`
+  );
+}
+
+function escapeRegExp(value: string): string {
+  return value.replace(/[.*+?^${}()|[\]\\]/g, "\\$&");
+}
+
+/**
+ * Mark the components of `"use island"` files as islands in both builds.
+ *
+ * `islands` maps the absolute path of each island file to its id.
+ */
+export function islandsPlugin(islands: Record<string, string>): BunPlugin {
+  const paths = Object.keys(islands);
+  return {
+    name: "schorle-islands",
+    setup(builder) {
+      if (paths.length === 0) return;
+      const filter = new RegExp(`^(?:${paths.map(escapeRegExp).join("|")})$`);
+      builder.onLoad({ filter }, async ({ path }) => ({
+        contents: islandSource(islands[path]!, await Bun.file(path).text()),
+        loader: (path.split(".").pop() ?? "tsx") as Loader,
+      }));
+    },
+  };
+}
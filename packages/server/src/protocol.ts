@@ -0,0 +1,82 @@
+// Framed IPC protocol shared with `schorle/protocol.py`.
+//
+// Frame layout: kind (u8) | request id (u32 BE) | payload length (u32 BE) | payload
+
+export const HEADER_SIZE = 9;
+
+// Request id used for worker-level frames that are not bound to a render
+export const WORKER_FRAME_ID = 0;
+
+export enum FrameKind {
+  // Python -> Bun
+  Render = 1,
+  Props = 2,
+  Abort = 3,
+  Preload = 4,
+  Defer = 5,
+  // Bun -> Python
+  Chunk = 16,
+  End = 17,
+  Error = 18,
+  Ready = 19,
+  Preloaded = 20,
+}
+
+export interface Frame {
+  kind: FrameKind;
+  id: number;
+  payload: Uint8Array;
+}
+
+const EMPTY = new Uint8Array(0);
+
+export function encodeFrame(
+  kind: FrameKind,
+  id: number,
+  payload: Uint8Array = EMPTY,
+): Uint8Array {
+  const frame = new Uint8Array(HEADER_SIZE + payload.byteLength);
+  const view = new DataView(frame.buffer);
+  view.setUint8(0, kind);
+  view.setUint32(1, id);
+  view.setUint32(5, payload.byteLength);
+  frame.set(payload, HEADER_SIZE);
+  return frame;
+}
+
+/**
+ * Incremental frame decoder: feed it arbitrary byte chunks and it yields
+ * every complete frame received so far.
+ */
+export class FrameReader {
+  private buffer: Uint8Array = EMPTY;
+
+  *push(chunk: Uint8Array): Generator<Frame> {
+    if (this.buffer.byteLength === 0) {
+      this.buffer = chunk;
+    } else {
+      const merged = new Uint8Array(this.buffer.byteLength + chunk.byteLength);
+      merged.set(this.buffer, 0);
+      merged.set(chunk, this.buffer.byteLength);
+      this.buffer = merged;
+    }
+
+    let offset = 0;
+    while (this.buffer.byteLength - offset >= HEADER_SIZE) {
+      const view = new DataView(
+        this.buffer.buffer,
+        this.buffer.byteOffset + offset,
+        HEADER_SIZE,
+      );
+      const kind = view.getUint8(0) as FrameKind;
+      const id = view.getUint32(1);
+      const length = view.getUint32(5);
+      if (this.buffer.byteLength - offset - HEADER_SIZE < length) break;
+
+      const start = offset + HEADER_SIZE;
+      yield { kind, id, payload: this.buffer.slice(start, start + length) };
+      offset = start + length;
+    }
+    this.buffer = this.buffer.slice(offset);
+  }
+}
@@ -1,4 +1,5 @@
 import { Console as NodeConsole } from "node:console";
+import { DeferredProps } from "./deferred";
 
 // Send all SSR console output to *stderr* (stdout stays HTML-only)
 const ssrConsole = new NodeConsole(process.stderr, process.stderr);
@@ -10,6 +11,9 @@ interface RenderRequest {
   cookies?: Record<string, string> | null;
   js: string;
   css?: string;
+  deferred?: string[];
+  // base64 payloads of the deferred props, all resolved before the render
+  deferred_values?: string[];
 }
 
 // New render function for built server modules
@@ -29,10 +33,17 @@ export async function render(serverJsPath: string, rawRenderRequest: string) {
     );
   }
 
+  const { deferred_values: deferredValues, ...rest } = renderRequest;
+  const deferred = new DeferredProps(renderRequest.deferred);
+  for (const value of deferredValues ?? []) {
+    deferred.settle(Buffer.from(value, "base64"));
+  }
+
   // Prepare the render request with actual props bytes
-  const request: RenderRequest = {
-    ...renderRequest,
+  const request = {
+    ...rest,
     props: stdinU8.byteLength ? stdinU8 : undefined,
+    deferred,
   };
 
   // Call the render function from the built module
@@ -46,4 +57,6 @@ export async function render(serverJsPath: string, rawRenderRequest: string) {
       },
     }),
   );
+  // hydration data of the deferred props
+  process.stdout.write(deferred.takeScripts());
 }
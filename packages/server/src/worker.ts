@@ -0,0 +1,218 @@
+import { Console as NodeConsole } from "node:console";
+import { DeferredProps, flushes } from "./deferred";
+import {
+  FrameKind,
+  FrameReader,
+  WORKER_FRAME_ID,
+  encodeFrame,
+  type Frame,
+} from "./protocol";
+
+// Send all SSR console output to *stderr* (stdout carries protocol frames only)
+const ssrConsole = new NodeConsole(process.stderr, process.stderr);
+globalThis.console = ssrConsole as unknown as Console;
+
+interface WorkerRenderRequest {
+  server_js: string;
+  headers?: Record<string, string> | null;
+  cookies?: Record<string, string> | null;
+  js: string;
+  css?: string;
+  // names of the props sent later in Defer frames
+  deferred?: string[];
+}
+
+interface RenderJob {
+  id: number;
+  request: WorkerRenderRequest;
+  props: Uint8Array;
+  deferred: DeferredProps;
+}
+
+const encoder = new TextEncoder();
+const decoder = new TextDecoder();
+
+// Renders waiting in the queue, and the ones among them aborted before starting
+const queued = new Set<number>();
+const aborted = new Set<number>();
+// Deferred props of announced renders, by render id
+const deferreds = new Map<number, DeferredProps>();
+// The render in progress, so an Abort frame can cancel its React stream
+let current: {
+  id: number;
+  deferred: DeferredProps;
+  reader?: ReadableStreamDefaultReader<Uint8Array>;
+} | null = null;
+
+// Server bundles are imported once per worker and reused across renders
+const modules = new Map<string, Promise<any>>();
+
+function loadModule(serverJsPath: string): Promise<any> {
+  let loaded = modules.get(serverJsPath);
+  if (!loaded) {
+    loaded = import(serverJsPath).then((serverModule) => {
+      if (!serverModule.render || typeof serverModule.render !== "function") {
+        throw new Error(
+          `Built server module does not export a render function: ${serverJsPath}`,
+        );
+      }
+      return serverModule;
+    });
+    // Do not cache failed imports, the bundle may be fixed by a rebuild
+    loaded.catch(() => modules.delete(serverJsPath));
+    modules.set(serverJsPath, loaded);
+  }
+  return loaded;
+}
+
+// Reported with every finished render, so the pool can recycle bloated workers
+function stats(extra: Record<string, number> = {}): Uint8Array {
+  return encoder.encode(
+    JSON.stringify({ rss: process.memoryUsage.rss(), modules: modules.size, ...extra }),
+  );
+}
+
+async function preload(serverJsPaths: string[]) {
+  const results = await Promise.allSettled(serverJsPaths.map(loadModule));
+  let failed = 0;
+  results.forEach((result, index) => {
+    if (result.status === "rejected") {
+      failed += 1;
+      console.error(`Failed to preload ${serverJsPaths[index]}: ${result.reason}`);
+    }
+  });
+  await send(FrameKind.Preloaded, WORKER_FRAME_ID, stats({ failed }));
+}
+
+async function send(kind: FrameKind, id: number, payload?: Uint8Array) {
+  if (!process.stdout.write(encodeFrame(kind, id, payload))) {
+    await new Promise<void>((resolve) => process.stdout.once("drain", resolve));
+  }
+}
+
+async function runJob({ id, request, props, deferred }: RenderJob) {
+  queued.delete(id);
+  if (aborted.delete(id)) {
+    deferreds.delete(id);
+    return;
+  }
+  current = { id, deferred };
+  try {
+    const serverModule = await loadModule(request.server_js);
+    const reactStream: ReadableStream<Uint8Array> = await serverModule.render({
+      js: request.js,
+      css: request.css,
+      headers: request.headers,
+      cookies: request.cookies,
+      props: props.byteLength ? props : undefined,
+      deferred,
+    });
+
+    const reader = reactStream.getReader();
+    if (current === null) {
+      // aborted while the bundle was loading
+      await reader.cancel();
+      return;
+    }
+    current.reader = reader;
+    let shellSent = false;
+    for await (const batch of flushes(reader)) {
+      // hydration data goes between flushes, ahead of the markup using it
+      const scripts = shellSent ? deferred.takeScripts() : "";
+      if (scripts) await send(FrameKind.Chunk, id, encoder.encode(scripts));
+      for (const chunk of batch) {
+        await send(FrameKind.Chunk, id, chunk);
+      }
+      shellSent = true;
+    }
+    // values no boundary waited for are still needed by the client
+    await deferred.settled();
+    const scripts = deferred.takeScripts();
+    if (scripts) await send(FrameKind.Chunk, id, encoder.encode(scripts));
+    await send(FrameKind.End, id, stats());
+  } catch (error) {
+    const message =
+      error instanceof Error ? (error.stack ?? error.message) : String(error);
+    console.error(message);
+    await send(FrameKind.Error, id, encoder.encode(message));
+  } finally {
+    current = null;
+    deferreds.delete(id);
+  }
+}
+
+function abort(id: number) {
+  if (current?.id === id) {
+    // stop waiting for deferred props that will not come anymore
+    current.deferred.cancel();
+    // cancelling ends the read loop, React stops rendering the tree
+    if (current.reader) {
+      current.reader.cancel().catch(() => {});
+    } else {
+      current = null;
+    }
+  } else if (queued.has(id)) {
+    aborted.add(id);
+  }
+}
+
+/**
+ * Serve render requests over stdin/stdout until stdin is closed.
+ *
+ * Each render is announced by a `Render` frame carrying the JSON request and
+ * started by the matching `Props` frame, which may follow much later when
+ * the props are loaded asynchronously. `Defer` frames deliver deferred props
+ * into a render after it started. Renders run one at a time, since SSR hooks
+ * read request data from globals. An `Abort` frame cancels a
+ * render whose client went away; frames it still sends are ignored. A
+ * `Preload` frame imports server bundles ahead of the first render.
+ */
+export async function serve() {
+  const frames = new FrameReader();
+  const pending = new Map<number, WorkerRenderRequest>();
+  let queue: Promise<void> = Promise.resolve();
+
+  const handle = (frame: Frame) => {
+    if (frame.kind === FrameKind.Render) {
+      const request: WorkerRenderRequest = JSON.parse(decoder.decode(frame.payload));
+      pending.set(frame.id, request);
+      deferreds.set(frame.id, new DeferredProps(request.deferred));
+      // import the bundle while the props are still being loaded; a failed
+      // import is reported by the render itself
+      loadModule(request.server_js).catch(() => {});
+    } else if (frame.kind === FrameKind.Props) {
+      const request = pending.get(frame.id);
+      if (!request) {
+        console.error(`Received props for unknown render ${frame.id}`);
+        return;
+      }
+      pending.delete(frame.id);
+      const deferred = deferreds.get(frame.id) ?? new DeferredProps();
+      const job = { id: frame.id, request, props: frame.payload, deferred };
+      queued.add(job.id);
+      queue = queue.then(() => runJob(job));
+    } else if (frame.kind === FrameKind.Preload) {
+      const paths: string[] = JSON.parse(decoder.decode(frame.payload));
+      queue = queue.then(() => preload(paths));
+    } else if (frame.kind === FrameKind.Defer) {
+      // may arrive before the render started, or after it was aborted
+      deferreds.get(frame.id)?.settle(frame.payload);
+    } else if (frame.kind === FrameKind.Abort) {
+      if (pending.delete(frame.id)) deferreds.delete(frame.id);
+      abort(frame.id);
+    } else {
+      console.error(`Unexpected frame kind ${frame.kind}`);
+    }
+  };
+
+  await send(FrameKind.Ready, WORKER_FRAME_ID);
+
+  for await (const chunk of Bun.stdin.stream()) {
+    for (const frame of frames.push(chunk)) {
+      handle(frame);
+    }
+  }
+
+  // stdin closed: finish queued renders and exit
+  await queue;
+}
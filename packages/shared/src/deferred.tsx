@@ -0,0 +1,96 @@
+import React, {
+  createContext,
+  use,
+  useContext,
+  type PropsWithChildren,
+} from "react";
+
+/** Where `useDeferredProp` gets deferred props from. */
+export interface DeferredSource {
+  get(name: string): Promise<unknown>;
+}
+
+export interface DeferredEntry {
+  name: string;
+  value?: unknown;
+  error?: string;
+}
+
+const DeferredContext = createContext<DeferredSource | null>(null);
+
+export function DeferredProvider({
+  value,
+  children,
+}: PropsWithChildren<{ value: DeferredSource | null }>) {
+  return (
+    <DeferredContext.Provider value={value}>{children}</DeferredContext.Provider>
+  );
+}
+
+/**
+ * Read a prop passed to the render in `deferred`.
+ *
+ * Suspends until the value arrives, so wrap the component reading it in a
+ * `<Suspense>` boundary. A failed value throws to the nearest error boundary.
+ */
+export function useDeferredProp<T = unknown>(name: string): T {
+  const source = useContext(DeferredContext);
+  if (!source) {
+    throw new Error(`Deferred prop ${name} was not passed to the render`);
+  }
+  return use(source.get(name)) as T;
+}
+
+/**
+ * Client-side source of deferred props.
+ *
+ * Values arrive in scripts streamed after the page, which push their encoded
+ * payload to `self.__SCHORLE_DEFERRED__`; the ones that ran before hydration
+ * are read from the array.
+ */
+export function readDeferredProps(
+  decode: (data: string) => DeferredEntry,
+): DeferredSource {
+  const entries = new Map<
+    string,
+    {
+      promise: Promise<unknown>;
+      resolve: (value: unknown) => void;
+      reject: (error: Error) => void;
+    }
+  >();
+
+  const entry = (name: string) => {
+    let found = entries.get(name);
+    if (!found) {
+      let resolve!: (value: unknown) => void;
+      let reject!: (error: Error) => void;
+      const promise = new Promise<unknown>((res, rej) => {
+        resolve = res;
+        reject = rej;
+      });
+      promise.catch(() => {});
+      found = { promise, resolve, reject };
+      entries.set(name, found);
+    }
+    return found;
+  };
+
+  const settle = (data: string) => {
+    const { name, value, error } = decode(data);
+    if (error !== undefined) {
+      entry(name).reject(new Error(error));
+    } else {
+      entry(name).resolve(value);
+    }
+  };
+
+  const queue: string[] = ((globalThis as any).__SCHORLE_DEFERRED__ ??= []);
+  queue.forEach(settle);
+  queue.push = (...items: string[]) => {
+    items.forEach(settle);
+    return queue.length;
+  };
+
+  return { get: (name) => entry(name).promise };
+}
@@ -3,6 +3,14 @@ import type { JSX, ReactNode, ComponentType, ReactElement } from "react";
 import { ThemeProvider } from "./theme-provider";
 import { Meta } from "./Meta";
 import { PropsProvider, useProps } from "./props";
+import {
+  DeferredProvider,
+  useDeferredProp,
+  readDeferredProps,
+  type DeferredSource,
+} from "./deferred";
+import { withIsland, hydrateIslands, IslandProvider } from "./islands";
+import { LazyHydrate, type HydrationStrategy } from "./lazy";
 import type { LayoutFC } from "./types";
 import { useHeaders } from "./headers";
 import { useCookies } from "./cookies";
@@ -43,6 +51,15 @@ export {
   Meta,
   PropsProvider,
   useProps,
+  DeferredProvider,
+  useDeferredProp,
+  readDeferredProps,
+  type DeferredSource,
+  withIsland,
+  hydrateIslands,
+  IslandProvider,
+  LazyHydrate,
+  type HydrationStrategy,
   useHeaders,
   useCookies,
   type Dict,
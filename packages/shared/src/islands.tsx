@@ -0,0 +1,70 @@
+import React, {
+  createContext,
+  useContext,
+  type ComponentType,
+  type PropsWithChildren,
+} from "react";
+import { hydrateRoot } from "react-dom/client";
+
+// set inside an island or a hydrating page: nested islands render without
+// a wrapper and hydrate along with it
+const IslandContext = createContext(false);
+
+/**
+ * Render the islands inside as plain components.
+ *
+ * Wraps the tree of pages that hydrate as a whole, where islands need
+ * neither a wrapper element nor serialized props.
+ */
+export function IslandProvider({ children }: PropsWithChildren) {
+  return (
+    <IslandContext.Provider value={true}>{children}</IslandContext.Provider>
+  );
+}
+
+/**
+ * Mark a component as a client island.
+ *
+ * Applied by the build to the default export of files starting with the
+ * `"use island"` directive. The island renders inside a `<schorle-island>`
+ * element carrying its id and props, so pages that do not hydrate can
+ * hydrate it on its own. Island props must be JSON-serializable.
+ */
+export function withIsland<P extends object>(
+  id: string,
+  Component: ComponentType<P>,
+): ComponentType<P> {
+  function Island(props: P) {
+    const inside = useContext(IslandContext);
+    if (inside) {
+      return <Component {...props} />;
+    }
+    return React.createElement(
+      "schorle-island",
+      {
+        "data-island": id,
+        "data-props": JSON.stringify(props),
+        style: { display: "contents" },
+      },
+      <IslandContext.Provider value={true}>
+        <Component {...props} />
+      </IslandContext.Provider>,
+    );
+  }
+  Island.displayName = `Island(${Component.displayName || Component.name || id})`;
+  return Island;
+}
+
+/** Hydrate every server-rendered instance of the island `id`. */
+export function hydrateIslands(id: string, Component: ComponentType<any>) {
+  const selector = `schorle-island[data-island="${CSS.escape(id)}"]`;
+  document.querySelectorAll<HTMLElement>(selector).forEach((element) => {
+    const props = JSON.parse(element.dataset.props || "{}");
+    hydrateRoot(
+      element,
+      <IslandContext.Provider value={true}>
+        <Component {...props} />
+      </IslandContext.Provider>,
+    );
+  });
+}
@@ -0,0 +1,131 @@
+import { afterEach, beforeEach, describe, expect, test } from "bun:test";
+import React from "react";
+import { renderToString } from "react-dom/server";
+import { LazyHydrate, waitFor, type HydrationStrategy } from "./lazy";
+
+// the parts of a boundary element `waitFor` uses
+class FakeElement {
+  listeners = new Map<string, () => void>();
+
+  constructor(public children: object[] = [{}]) {}
+
+  hasChildNodes() {
+    return this.children.length > 0;
+  }
+
+  addEventListener(name: string, listener: () => void) {
+    this.listeners.set(name, listener);
+  }
+
+  removeEventListener(name: string) {
+    this.listeners.delete(name);
+  }
+}
+
+class FakeObserver {
+  static last: FakeObserver;
+  observed: object[] = [];
+  disconnected = false;
+
+  constructor(
+    public callback: (entries: { isIntersecting: boolean }[]) => void,
+  ) {
+    FakeObserver.last = this;
+  }
+
+  observe(target: object) {
+    this.observed.push(target);
+  }
+
+  disconnect() {
+    this.disconnected = true;
+  }
+}
+
+const globals = globalThis as any;
+let idle: (() => void)[];
+
+beforeEach(() => {
+  idle = [];
+  globals.window = globalThis;
+  globals.requestIdleCallback = (callback: () => void) => idle.push(callback);
+  globals.IntersectionObserver = FakeObserver;
+});
+
+afterEach(() => {
+  delete globals.window;
+  delete globals.requestIdleCallback;
+  delete globals.IntersectionObserver;
+});
+
+function wait(element: FakeElement, when: HydrationStrategy) {
+  const state = { done: false };
+  waitFor(element as unknown as Element, when).then(() => {
+    state.done = true;
+  });
+  return state;
+}
+
+const tick = () => new Promise((resolve) => setTimeout(resolve, 0));
+
+describe("waitFor", () => {
+  test("idle waits for an idle callback", async () => {
+    const state = wait(new FakeElement(), "idle");
+    await tick();
+    expect(state.done).toBe(false);
+
+    idle.forEach((callback) => callback());
+    await tick();
+    expect(state.done).toBe(true);
+  });
+
+  test("visible waits for a child to intersect", async () => {
+    const element = new FakeElement([{}, {}]);
+    const state = wait(element, "visible");
+    const observer = FakeObserver.last;
+    expect(observer.observed).toEqual(element.children);
+
+    observer.callback([{ isIntersecting: false }]);
+    await tick();
+    expect(state.done).toBe(false);
+
+    observer.callback([{ isIntersecting: true }]);
+    await tick();
+    expect(state.done).toBe(true);
+    expect(observer.disconnected).toBe(true);
+  });
+
+  test("interaction waits for the first event", async () => {
+    const element = new FakeElement();
+    const state = wait(element, "interaction");
+    await tick();
+    expect(state.done).toBe(false);
+
+    element.listeners.get("pointerover")!();
+    await tick();
+    expect(state.done).toBe(true);
+    expect(element.listeners.size).toBe(0);
+  });
+
+  test.each<HydrationStrategy>(["idle", "visible", "interaction"])(
+    "%s resolves right away without server HTML",
+    async (when) => {
+      const state = wait(new FakeElement([]), when);
+      await tick();
+      expect(state.done).toBe(true);
+    },
+  );
+});
+
+test.each<HydrationStrategy>(["idle", "visible", "interaction"])(
+  "%s boundaries render their children on the server",
+  (when) => {
+    const html = renderToString(
+      <LazyHydrate when={when}>
+        <p>content</p>
+      </LazyHydrate>,
+    );
+    expect(html).toStartWith('<schorle-lazy style="display:contents">');
+    expect(html).toContain("<p>content</p>");
+  },
+);
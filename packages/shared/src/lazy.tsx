@@ -0,0 +1,103 @@
+import React, { Suspense, use, useState, type PropsWithChildren } from "react";
+
+/** When a `<LazyHydrate>` boundary hydrates. */
+export type HydrationStrategy = "idle" | "visible" | "interaction";
+
+// events that show the user is about to use the boundary
+const INTERACTIONS = ["pointerover", "pointerdown", "focusin", "keydown"];
+
+/** Resolve once `when` is met for the boundary `element`. */
+export function waitFor(
+  element: Element,
+  when: HydrationStrategy,
+): Promise<void> {
+  return new Promise((resolve) => {
+    if (!element.hasChildNodes()) {
+      // rendered on the client, there is no server HTML to keep
+      resolve();
+    } else if (when === "idle") {
+      if ("requestIdleCallback" in window) {
+        requestIdleCallback(() => resolve());
+      } else {
+        setTimeout(resolve, 1);
+      }
+    } else if (when === "visible") {
+      // the boundary itself is `display: contents` and has no box
+      const children = Array.from(element.children);
+      if (children.length === 0) return resolve();
+      const observer = new IntersectionObserver((entries) => {
+        if (entries.some((entry) => entry.isIntersecting)) {
+          observer.disconnect();
+          resolve();
+        }
+      });
+      children.forEach((child) => observer.observe(child));
+    } else {
+      const start = () => {
+        INTERACTIONS.forEach((name) =>
+          element.removeEventListener(name, start),
+        );
+        resolve();
+      };
+      INTERACTIONS.forEach((name) =>
+        element.addEventListener(name, start, { passive: true }),
+      );
+    }
+  });
+}
+
+interface Trigger {
+  promise: Promise<void>;
+  start: (element: Element | null) => void;
+}
+
+function createTrigger(when: HydrationStrategy): Trigger {
+  let started = false;
+  let resolve!: () => void;
+  const promise = new Promise<void>((res) => {
+    resolve = res;
+  });
+  return {
+    promise,
+    start(element) {
+      if (element && !started) {
+        started = true;
+        waitFor(element, when).then(resolve);
+      }
+    },
+  };
+}
+
+function Gate({ trigger, children }: PropsWithChildren<{ trigger: Trigger }>) {
+  if (typeof document !== "undefined") {
+    use(trigger.promise);
+  }
+  return <>{children}</>;
+}
+
+/**
+ * Postpone the hydration of `children` until the browser is idle, the
+ * boundary scrolls into view, or the user first interacts with it.
+ *
+ * The server renders the children as usual. On the client they suspend
+ * inside their own `<Suspense>`, so React keeps them as dehydrated server
+ * HTML while the rest of the page hydrates. The boundary element hydrates
+ * with the page; once it is attached, the trigger is armed on it and
+ * hydration of the children resumes when it fires. The trigger lives in the
+ * boundary's own state, so boundaries work the same inside islands, which
+ * hydrate as separate roots. The event that starts an `interaction`
+ * hydration is not replayed.
+ */
+export function LazyHydrate({
+  when,
+  children,
+}: PropsWithChildren<{ when: HydrationStrategy }>) {
+  const [trigger] = useState(() => createTrigger(when));
+  return React.createElement(
+    "schorle-lazy",
+    { ref: trigger.start, style: { display: "contents" } },
+    <Suspense fallback={null}>
+      <Gate trigger={trigger}>{children}</Gate>
+    </Suspense>,
+  );
+}
@@ -0,0 +1,163 @@
+"""
+Admission control for renders.
+
+`Schorle(admission=AdmissionController(max_concurrent=8))` caps how many Bun
+renders run at once. Further renders wait in a bounded queue; when the queue
+is full or the wait times out the render is rejected and the client gets a
+503 with `Retry-After` instead of the host collapsing under load. Cached pages
+are served without a slot.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import AsyncGenerator, AsyncIterator
+
+from fastapi.responses import Response, StreamingResponse
+from starlette.types import Send
+
+
+class RenderOverloaded(RuntimeError):
+    """Raised when a render is not admitted because the renderer is saturated."""
+
+    def __init__(self, message: str, retry_after: int) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Limit concurrent renders, with a bounded and time-limited wait queue."""
+
+    def __init__(
+        self,
+        max_concurrent: int,
+        max_queue: int = 100,
+        queue_timeout: float = 5.0,
+        retry_after: int = 1,
+    ) -> None:
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._in_flight = 0
+        self._queued = 0
+        self._admitted = 0
+        self._rejected = 0
+        self._timed_out = 0
+
+    async def acquire(self) -> None:
+        """Take a render slot, waiting in the queue if none is free."""
+        if self._slots.locked():
+            if self._queued >= self.max_queue:
+                self._rejected += 1
+                raise RenderOverloaded("Render queue is full", self.retry_after)
+            self._queued += 1
+            # not `wait_for`, which can time out after the slot was taken
+            waiter = asyncio.ensure_future(self._slots.acquire())
+            try:
+                await asyncio.wait({waiter}, timeout=self.queue_timeout)
+            except BaseException:
+                self._abandon(waiter)
+                raise
+            finally:
+                self._queued -= 1
+            if not waiter.done():
+                self._abandon(waiter)
+                self._rejected += 1
+                self._timed_out += 1
+                raise RenderOverloaded(
+                    f"No render slot freed up within {self.queue_timeout}s",
+                    self.retry_after,
+                )
+        else:
+            await self._slots.acquire()
+        self._in_flight += 1
+        self._admitted += 1
+
+    def release(self) -> None:
+        self._in_flight -= 1
+        self._slots.release()
+
+    def _abandon(self, waiter: asyncio.Task) -> None:
+        """Stop waiting for a slot, giving it back if it was taken meanwhile."""
+
+        def give_back(waiter: asyncio.Task) -> None:
+            if not waiter.cancelled() and waiter.exception() is None:
+                self._slots.release()
+
+        waiter.cancel()
+        waiter.add_done_callback(give_back)
+
+    async def admit(self, stream: AsyncIterator[bytes]) -> AsyncGenerator[bytes, None]:
+        """Run a render stream while holding a slot."""
+        await self.acquire()
+        try:
+            async for chunk in stream:
+                yield chunk
+        finally:
+            if isinstance(stream, AsyncGenerator):
+                await stream.aclose()
+            self.release()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "in_flight": self._in_flight,
+            "queued": self._queued,
+            "admitted": self._admitted,
+            "rejected": self._rejected,
+            "timed_out": self._timed_out,
+        }
+
+
+def overloaded_response(error: RenderOverloaded) -> Response:
+    return Response(
+        str(error),
+        status_code=503,
+        headers={"Retry-After": str(error.retry_after)},
+        media_type="text/plain",
+    )
+
+
+class RenderResponse(StreamingResponse):
+    """Streaming response that waits for the first chunk before sending headers.
+
+    A render rejected by admission control thus still becomes a proper 503,
+    and the render is closed as soon as the client disconnects.
+    """
+
+    body_iterator: AsyncIterator[bytes]
+
+    async def stream_response(self, send: Send) -> None:
+        try:
+            first_chunk = await anext(self.body_iterator)
+        except StopAsyncIteration:
+            first_chunk = b""
+        except RenderOverloaded as error:
+            response = overloaded_response(error)
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": response.status_code,
+                    "headers": response.raw_headers,
+                }
+            )
+            await send({"type": "http.response.body", "body": response.body})
+            return
+
+        rest = self.body_iterator
+
+        async def body() -> AsyncGenerator[bytes, None]:
+            if first_chunk:
+                yield first_chunk
+            async for chunk in rest:
+                yield chunk
+
+        self.body_iterator = body()
+        try:
+            await super().stream_response(send)
+        finally:
+            # on a client disconnect, stop the render instead of leaving it
+            # to the garbage collector
+            if isinstance(rest, AsyncGenerator):
+                await rest.aclose()
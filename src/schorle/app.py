@@ -1,25 +1,124 @@
+import asyncio
+import inspect
 import json
+import logging
+from dataclasses import replace
 from types import ModuleType
 from fastapi import FastAPI, Request
 from fastapi.datastructures import Headers
-from fastapi.responses import StreamingResponse
+from fastapi.responses import Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
-from schorle.cli import build, generate_api_client, generate_models
+from schorle.cli import build_project, generate_api_client, generate_models
 from schorle.dev import DevManager
 from schorle.pages import PagesAccessor, PageReference
 import schorle.pages as pages_module
-from schorle.render import render
-from schorle.utils import cwd, define_if_dev, keys_to_camel_case
+from schorle.render import render_async, render_pooled
+from schorle.render_pool import RenderPool, RenderProps
+from schorle.daemon import DaemonClient
+from schorle.deferred import Deferred, DeferredProps
+from schorle.registry import PageRecord
+from schorle.batch import (
+    BatchReport,
+    BatchSink,
+    RenderJob,
+    RenderResult,
+    drain,
+    render_many,
+)
+from schorle.admission import (
+    AdmissionController,
+    RenderOverloaded,
+    RenderResponse,
+    overloaded_response,
+)
+from schorle.coalesce import SingleFlight
+from schorle.cache import (
+    CachePolicy,
+    RenderCacheBackend,
+    Revalidator,
+    cache_stream,
+    cached_body,
+    call_cache,
+    render_cache_key,
+)
+from schorle.streaming import (
+    FlushPolicy,
+    build_head_injection,
+    build_prelude,
+    client_shell,
+    flush_chunks,
+    preload_links,
+    strip_prelude,
+    with_deadline,
+)
+from schorle.utils import cwd, define_if_dev, pack_props
 from schorle.manifest import find_schorle_project
 from pathlib import Path
-from typing import Any, Union
-import msgpack
+from typing import (
+    Any,
+    AsyncGenerator,
+    AsyncIterable,
+    Awaitable,
+    Callable,
+    Iterable,
+    Union,
+    cast,
+)
 from fastapi.routing import _merge_lifespan_context
 
+logger = logging.getLogger(__name__)
+
+PropsValue = Union[dict, BaseModel, None]
+# props may also be an awaitable, an async loader function or a dict whose
+# values are awaitables or loaders; they are loaded while the render starts
+Props = Union[PropsValue, Awaitable[PropsValue], Callable[[], Awaitable[PropsValue]]]
+
+
+def _is_loader(value: Any) -> bool:
+    return callable(value) or inspect.isawaitable(value)
+
+
+def _is_lazy(props: Props) -> bool:
+    if isinstance(props, dict):
+        return any(_is_loader(value) for value in props.values())
+    return _is_loader(props)
+
+
+async def _load(value: Any) -> Any:
+    if callable(value):
+        value = value()
+    if inspect.isawaitable(value):
+        value = await value
+    return value
+
+
+async def _resolve_props(props: Props) -> PropsValue:
+    """Run the loaders of `props`, named loaders concurrently."""
+    if isinstance(props, dict):
+        if not _is_lazy(props):
+            return props
+        values = await asyncio.gather(*(_load(value) for value in props.values()))
+        return dict(zip(props, values))
+    return await _load(props)
+
+
+async def _load_props(props: Props) -> bytes | None:
+    return pack_props(await _resolve_props(props))
+
 
 class Schorle:
-    def __init__(self, dev: bool | None = None) -> None:
+    def __init__(
+        self,
+        dev: bool | None = None,
+        render_workers: int | None = None,
+        render_cache: RenderCacheBackend | None = None,
+        coalesce_renders: bool = True,
+        admission: AdmissionController | None = None,
+        render_deadline: float | None = None,
+        render_daemon: str | Path | None = None,
+        flush_policy: FlushPolicy | None = None,
+    ) -> None:
         self.project = find_schorle_project(Path.cwd())
 
         self._model_registry: list[ModuleType] = []
@@ -28,6 +127,30 @@ class Schorle:
         self.project.dev = dev if dev is not None else define_if_dev()
         self.dev_manager: DevManager | None = None
         self._pages: PagesAccessor | None = None
+        # warm Bun render workers, started in the lifespan merged by mount();
+        # with `render_daemon` they are shared by every process on the host
+        self.render_pool: RenderPool | DaemonClient = (
+            DaemonClient(self.project, render_daemon)
+            if render_daemon is not None
+            else RenderPool(self.project, size=render_workers)
+        )
+        # storage for renders opted into caching with `cache=CachePolicy(...)`
+        self.render_cache = render_cache
+        # background refreshes of entries served stale under stale_while_revalidate
+        self.revalidator = (
+            Revalidator(render_cache) if render_cache is not None else None
+        )
+        # identical concurrent renders share one in-flight render
+        self.single_flight = SingleFlight() if coalesce_renders else None
+        # caps concurrent renders, overflowing requests get a 503
+        self.admission = admission
+        # seconds after which a render is aborted, overridable per render
+        self.render_deadline = render_deadline
+        # opt-in re-chunking of streamed HTML before it reaches the ASGI server;
+        # without one, chunks are written as the render produces them
+        self.flush_policy = flush_policy
+        # documents of prerendered pages, read once from the build
+        self._prerendered_bodies: dict[Path, bytes] = {}
         print(f"[schorle] running in {'dev' if self.project.dev else 'prod'} mode")
         if not self.project.dev:
             # check if the manifest exists, raise an error if it doesn't
@@ -38,15 +161,18 @@ class Schorle:
 
     def _build(self):
         with cwd(self.project.root_path):
-            build(dev=self.project.dev)
+            build_project(self.project)
         # Invalidate cached page info after build to pick up new manifest
         self._invalidate_cache()
+        # Render workers hold the previous server bundles in their module cache
+        self.render_pool.recycle()
 
     def _invalidate_cache(self):
         """Invalidate cached page info to force fresh reads from the manifest."""
         self.project._invalidate_page_cache()
         # Also invalidate pages accessor cache
         self._pages = None
+        self._prerendered_bodies.clear()
 
     def _generate_models(self):
         for module in self._model_registry:
@@ -73,8 +199,10 @@ class Schorle:
             StaticFiles(directory=self.project.schorle_dir),
             name="schorle",
         )
-        # Page infos are now cached at the project level
-        # and loaded on-demand in resolve_page_info()
+        # Pages are compiled into the project's page registry. In prod the
+        # manifest is final, so compile it now instead of on the first request
+        if not self.project.dev:
+            logger.info(f"Compiled {len(self.project.page_registry)} pages")
 
         if self.project.dev:
             # Initialize DevManager once and wire websocket + lifespan
@@ -94,41 +222,491 @@ class Schorle:
                 app.router.lifespan_context, self.dev_manager.lifespan
             )
 
-    def render(
+        # merged last, so the workers start after the dev build has completed
+        app.router.lifespan_context = _merge_lifespan_context(
+            app.router.lifespan_context, self.render_pool.lifespan
+        )
+        if self.revalidator is not None:
+            # nested inside the pool, so refreshes stop before the workers do
+            app.router.lifespan_context = _merge_lifespan_context(
+                app.router.lifespan_context, self.revalidator.lifespan
+            )
+
+    def _open_stream(
+        self,
+        page: Union[Path, PageReference],
+        props: Props,
+        req: Request | None,
+        headers: Headers | None,
+        cookies: dict[str, str] | None,
+        cache: CachePolicy | None,
+        cache_tags: Iterable[str],
+        deadline: float | None,
+        early_head: bool,
+        deferred: Deferred | None,
+    ) -> tuple[AsyncGenerator[bytes, None], dict[str, str]]:
+        """Start a render, returning its stream and extra response headers."""
+        if deferred and cache is not None and self.render_cache is not None:
+            raise ValueError("Deferred props cannot be combined with a render cache")
+        if props is None and not deferred:
+            prerendered = self.project.page_registry.resolve(page)
+            if prerendered.html_path is not None:
+                return self._prerendered(prerendered, req, headers)
+        if not early_head and not _is_lazy(props) and not deferred:
+            stream = self._render_stream(
+                page,
+                cast(PropsValue, props),
+                req,
+                headers,
+                cookies,
+                cache,
+                cache_tags,
+                deadline,
+            )
+            return stream, {}
+
+        record = self.project.page_registry.resolve(page)
+        response_headers = {}
+        if early_head and (
+            links := preload_links(record.css, record.js, record.chunks)
+        ):
+            response_headers["Link"] = links
+        stream = self._lazy_stream(
+            record,
+            page,
+            props,
+            req,
+            headers,
+            cookies,
+            cache,
+            cache_tags,
+            deadline,
+            early_head,
+            DeferredProps(deferred) if deferred else None,
+        )
+        return stream, response_headers
+
+    def _prerendered(
+        self, record: PageRecord, req: Request | None, headers: Headers | None
+    ) -> tuple[AsyncGenerator[bytes, None], dict[str, str]]:
+        """Serve the document prerendered at build time, gzipped if accepted."""
+        path = record.html_path
+        response_headers = {}
+        if record.html_gzip_path is not None:
+            response_headers["Vary"] = "Accept-Encoding"
+            _headers, _ = _request_data(req, headers, None)
+            if _accepts_gzip(_headers.get("accept-encoding", "")):
+                path = record.html_gzip_path
+                response_headers["Content-Encoding"] = "gzip"
+        assert path is not None
+        body = self._prerendered_bodies.get(path)
+        if body is None:
+            body = self._prerendered_bodies[path] = path.read_bytes()
+        return cached_body(body), response_headers
+
+    async def _lazy_stream(
+        self,
+        record: PageRecord,
+        page: Union[Path, PageReference],
+        props: Props,
+        req: Request | None,
+        headers: Headers | None,
+        cookies: dict[str, str] | None,
+        cache: CachePolicy | None,
+        cache_tags: Iterable[str],
+        deadline: float | None,
+        early_head: bool,
+        deferred: DeferredProps | None,
+    ) -> AsyncGenerator[bytes, None]:
+        """Send the head prelude if asked to, then render with loaded props.
+
+        Without a cache policy, loaders run concurrently with acquiring a
+        worker and sending it the render request. Such renders are not
+        coalesced, since their key is only known once the props are loaded.
+        Deferred props start resolving right away and are sent to the render
+        as they resolve.
+        """
+        if deferred is not None:
+            deferred.start()
+        if early_head:
+            yield build_prelude(record.css, record.js, record.chunks)
+        packed: asyncio.Future[bytes | None]
+        if (_is_lazy(props) or deferred is not None) and (
+            cache is None or self.render_cache is None
+        ):
+            packed = asyncio.ensure_future(_load_props(props))
+            _headers, _cookies = _request_data(req, headers, cookies)
+            stream = self._limit(
+                self._start_render(record, packed, _headers, _cookies, deferred),
+                record,
+                packed,
+                dict(_headers),
+                _cookies,
+                deadline,
+            )
+        else:
+            # the cache key depends on the props, so they are loaded first
+            resolved = await _resolve_props(props)
+            packed = asyncio.get_running_loop().create_future()
+            packed.set_result(pack_props(resolved))
+            stream = self._render_stream(
+                page, resolved, req, headers, cookies, cache, cache_tags, deadline
+            )
+        if early_head:
+            stream = strip_prelude(stream, record.css)
+        started = False
+        try:
+            async for chunk in stream:
+                started = True
+                yield chunk
+        except RenderOverloaded:
+            if not early_head or started or record.js is None:
+                raise
+            # the status line is out already, let the client render the page
+            logger.warning(f"Render of {record.key} not admitted, rendering on client")
+            _headers, _cookies = _request_data(req, headers, cookies)
+            fallback = _client_shell(
+                replace(record, css=None), await packed, dict(_headers), _cookies
+            )
+            yield fallback.removeprefix(b"<!DOCTYPE html>")
+        finally:
+            await stream.aclose()
+            if deferred is not None:
+                deferred.cancel()
+            if not packed.done():
+                packed.cancel()
+            elif not packed.cancelled():
+                # failed loaders were raised by the render already
+                packed.exception()
+
+    def _render_stream(
         self,
         page: Union[Path, PageReference],
         props: dict | BaseModel | None = None,
         req: Request | None = None,
         headers: Headers | None = None,
         cookies: dict[str, str] | None = None,
-    ) -> StreamingResponse:
-        # Handle PageReference objects by extracting the path
-        if isinstance(page, PageReference):
-            page_path = page.page_path.relative_to(self.project.pages_path)
-        else:
-            page_path = page
+        cache: CachePolicy | None = None,
+        cache_tags: Iterable[str] = (),
+        deadline: float | None = None,
+    ) -> AsyncGenerator[bytes, None]:
+        record = self.project.page_registry.resolve(page)
+        _bytes = pack_props(props)
+        headers, cookies = _request_data(req, headers, cookies)
 
-        page_info = self.project.resolve_page_info(page_path)
+        if cache is None or self.render_cache is None:
 
-        if props is not None:
-            if isinstance(props, BaseModel):
-                _props = props.model_dump()
-            elif isinstance(props, dict):
-                _props = props
-            _props = keys_to_camel_case(_props)
-            _bytes = msgpack.packb(_props)
-        else:
-            _bytes = None
+            def start() -> AsyncGenerator[bytes, None]:
+                return self._start_render(record, _bytes, headers, cookies)
+
+            if headers or cookies:
+                # the page may read any of the request data, which requests
+                # rarely share; a `CachePolicy` narrows it to an allowlist
+                stream = start()
+            else:
+                stream = self._coalesce(render_cache_key(record.key, _bytes), start)
+            return self._limit(stream, record, _bytes, dict(headers), cookies, deadline)
+
+        # only the allowlisted request data reaches the render and the key
+        _headers = cache.select_headers(headers)
+        _cookies = cache.select_cookies(cookies)
+        key = render_cache_key(record.key, _bytes, _headers, _cookies)
+        return self._cached_stream(
+            key, record, _bytes, _headers, _cookies, cache, cache_tags, deadline
+        )
+
+    async def _cached_stream(
+        self,
+        key: str,
+        record: PageRecord,
+        props: bytes | None,
+        headers: dict[str, str],
+        cookies: dict[str, str],
+        cache: CachePolicy,
+        cache_tags: Iterable[str],
+        deadline: float | None,
+    ) -> AsyncGenerator[bytes, None]:
+        """Serve `key` from the render cache, or render the page and store it.
+
+        The lookup happens once the body is sent rather than in `render()`,
+        which sync endpoints call from a threadpool thread without an event
+        loop, and runs in a thread for blocking backends.
+        """
+        render_cache = self.render_cache
+        assert render_cache is not None
+        entry = await call_cache(render_cache, render_cache.get, key)
+        if entry is not None:
+            if entry.expired() and self.revalidator is not None:
+                # stale but within its window: serve it and refresh in background
+                self.revalidator.refresh(
+                    key,
+                    lambda: self._start_render(
+                        record, props, Headers(headers), cookies
+                    ),
+                    cache.ttl,
+                    cache.stale_while_revalidate,
+                    cache_tags,
+                )
+            yield entry.body
+            return
+        stream = self._coalesce(
+            key,
+            lambda: cache_stream(
+                self._start_render(record, props, Headers(headers), cookies),
+                render_cache,
+                key,
+                cache.ttl,
+                cache.stale_while_revalidate,
+                cache_tags,
+            ),
+        )
+        stream = self._limit(stream, record, props, headers, cookies, deadline)
+        try:
+            async for chunk in stream:
+                yield chunk
+        finally:
+            await stream.aclose()
+
+    def _limit(
+        self,
+        stream: AsyncGenerator[bytes, None],
+        record: PageRecord,
+        props: bytes | None | asyncio.Future[bytes | None],
+        headers: dict[str, str],
+        cookies: dict[str, str],
+        deadline: float | None,
+    ) -> AsyncGenerator[bytes, None]:
+        """Apply the render deadline and the flush policy to a render stream.
+
+        A render missing its deadline before sending anything is replaced by
+        a client-only shell, unless its props are still loading or the page
+        does not hydrate.
+        """
+        deadline = deadline if deadline is not None else self.render_deadline
+        if deadline is not None:
+
+            def fallback() -> bytes | None:
+                if record.js is None:
+                    # a page without client JS cannot render in the browser
+                    return None
+                if not isinstance(props, asyncio.Future):
+                    return _client_shell(record, props, headers, cookies)
+                if props.done() and not props.cancelled() and not props.exception():
+                    return _client_shell(record, props.result(), headers, cookies)
+                return None
 
-        if req is not None:
-            headers = headers or req.headers
-            cookies = cookies or req.cookies
+            stream = with_deadline(stream, deadline, fallback, record.key)
+        if self.flush_policy is not None:
+            stream = flush_chunks(stream, self.flush_policy)
+        return stream
+
+    def _coalesce(
+        self, key: str, start: Callable[[], AsyncGenerator[bytes, None]]
+    ) -> AsyncGenerator[bytes, None]:
+        if self.single_flight is None:
+            return start()
+        return self.single_flight.stream(key, start)
+
+    def _start_render(
+        self,
+        record: PageRecord,
+        props: RenderProps,
+        headers: Headers,
+        cookies: dict[str, str],
+        deferred: DeferredProps | None = None,
+    ) -> AsyncGenerator[bytes, None]:
+        if self.render_pool.running:
+            stream = render_pooled(
+                self.render_pool,
+                self.project,
+                record,
+                props,
+                headers,
+                cookies,
+                deferred=deferred,
+            )
         else:
-            headers = headers or Headers()
-            cookies = cookies or {}
+            stream = render_async(
+                self.project, record, props, headers, cookies, deferred=deferred
+            )
+        if self.admission is not None:
+            return self.admission.admit(stream)
+        return stream
+
+    def render(
+        self,
+        page: Union[Path, PageReference],
+        props: Props = None,
+        req: Request | None = None,
+        headers: Headers | None = None,
+        cookies: dict[str, str] | None = None,
+        cache: CachePolicy | None = None,
+        cache_tags: Iterable[str] = (),
+        deadline: float | None = None,
+        early_head: bool = False,
+        deferred: Deferred | None = None,
+    ) -> StreamingResponse:
+        """Render a page into a streaming response.
+
+        The render runs on the event loop when the response is sent, so it does
+        not hold a threadpool thread while streaming. Pass a `CachePolicy` as
+        `cache` to serve repeated renders from the `render_cache`, and
+        `cache_tags` to purge them later with `invalidate`. Renders rejected by
+        the `admission` controller are answered with a 503. A render taking
+        longer than `deadline` seconds (default `render_deadline`) is aborted
+        and replaced by a client-only shell if nothing was sent yet.
+
+        Identical concurrent renders share one render, unless the app was
+        created with `coalesce_renders=False`. With a `cache` policy they are
+        matched on its allowlisted headers and cookies; without one, only
+        renders given no request data are shared, as the page may read all of
+        it.
+
+        `props` may also be an awaitable or an async loader function. With
+        `early_head` the document head with the page's stylesheet and module
+        preloads is sent before they resolve, so the browser fetches assets
+        while the data is gathered. The status is then sent before the render
+        runs: a render rejected by admission control falls back to rendering
+        on the client.
+
+        `deferred` maps names to awaitables or async iterables that the page
+        reads with `useDeferredProp` inside a `<Suspense>` boundary. The render
+        starts without them and each value is streamed into it, and into the
+        HTML for hydration, as it resolves. Such renders are not cached.
+
+        Pages exporting `prerender = true` are rendered by `slx build` and served
+        from the build output when rendered without props, whatever the request
+        data, precompressed if the client accepts gzip.
+        """
+        stream, response_headers = self._open_stream(
+            page,
+            props,
+            req,
+            headers,
+            cookies,
+            cache,
+            cache_tags,
+            deadline,
+            early_head,
+            deferred,
+        )
+        return RenderResponse(stream, status_code=200, headers=response_headers)
+
+    async def render_async(
+        self,
+        page: Union[Path, PageReference],
+        props: Props = None,
+        req: Request | None = None,
+        headers: Headers | None = None,
+        cookies: dict[str, str] | None = None,
+        cache: CachePolicy | None = None,
+        cache_tags: Iterable[str] = (),
+        deadline: float | None = None,
+        early_head: bool = False,
+        deferred: Deferred | None = None,
+    ) -> Response:
+        """Render a page from an async endpoint.
+
+        Starts the render right away and waits for its first chunk, so render
+        failures are raised here instead of after the response has started.
+        With `early_head` the first chunk is the head prelude, so only errors
+        resolving the page are raised.
+        """
+        stream, response_headers = self._open_stream(
+            page,
+            props,
+            req,
+            headers,
+            cookies,
+            cache,
+            cache_tags,
+            deadline,
+            early_head,
+            deferred,
+        )
+        try:
+            first_chunk = await anext(stream)
+        except StopAsyncIteration:
+            return StreamingResponse(
+                iter(()), status_code=200, headers=response_headers
+            )
+        except RenderOverloaded as error:
+            return overloaded_response(error)
+
+        async def body() -> AsyncGenerator[bytes, None]:
+            try:
+                yield first_chunk
+                async for chunk in stream:
+                    yield chunk
+            finally:
+                await stream.aclose()
+
+        return RenderResponse(body(), status_code=200, headers=response_headers)
+
+    async def render_many(
+        self,
+        jobs: Iterable[RenderJob] | AsyncIterable[RenderJob],
+        ordered: bool = True,
+        concurrency: int | None = None,
+    ) -> AsyncGenerator[RenderResult, None]:
+        """Render many pages for offline generation, yielding their results.
+
+        The jobs share the warm render pool, which is started for the batch
+        if the app is not serving. At most `concurrency` renders (default:
+        the pool size) are held at once, so memory stays bounded however many
+        jobs there are. Results follow the job order when `ordered`, else
+        the order they complete in. A failed job yields a result with its
+        `error` and the batch goes on.
+        """
+        started = not self.render_pool.running
+        if started:
+            await self.render_pool.start()
+        results = render_many(
+            self.render_pool, self.project, jobs, ordered, concurrency
+        )
+        try:
+            async for result in results:
+                yield result
+        finally:
+            await results.aclose()
+            if started:
+                await self.render_pool.stop()
+
+    async def render_to(
+        self,
+        jobs: Iterable[RenderJob] | AsyncIterable[RenderJob],
+        sink: BatchSink,
+        ordered: bool = True,
+        concurrency: int | None = None,
+    ) -> BatchReport:
+        """Render many pages into `sink`, a directory or a callback.
+
+        A directory receives a `<name>.html` file per successful job, named
+        after `RenderJob.name` or the job's position. A callback, sync or
+        async, is called with every `RenderResult`.
+        """
+        results = self.render_many(jobs, ordered, concurrency)
+        try:
+            return await drain(results, sink)
+        finally:
+            await results.aclose()
+
+    def invalidate(self, tags: Iterable[str]) -> int:
+        """Purge cached pages rendered with any of `tags`.
+
+        Renders of those tags already in flight are not stored either. Returns
+        the number of purged pages. Use `invalidate_async` from async code.
+        """
+        if self.render_cache is None:
+            return 0
+        return self.render_cache.invalidate_tags(tags)
 
-        return StreamingResponse(
-            render(self.project, page_info, _bytes, headers, cookies), status_code=200
+    async def invalidate_async(self, tags: Iterable[str]) -> int:
+        """`invalidate`, without blocking the event loop on the cache backend."""
+        if self.render_cache is None:
+            return 0
+        return await call_cache(
+            self.render_cache, self.render_cache.invalidate_tags, tuple(tags)
         )
 
     @property
@@ -137,3 +715,38 @@ class Schorle:
         if self._pages is None:
             self._pages = pages_module.create_pages_accessor(self.project)
         return self._pages
+
+
+def _request_data(
+    req: Request | None, headers: Headers | None, cookies: dict[str, str] | None
+) -> tuple[Headers, dict[str, str]]:
+    """The headers and cookies a render sees, taken from `req` unless given."""
+    if req is not None:
+        return headers or req.headers, cookies or req.cookies
+    return headers or Headers(), cookies or {}
+
+
+def _accepts_gzip(accept_encoding: str) -> bool:
+    for coding in accept_encoding.split(","):
+        name, _, params = coding.partition(";")
+        if name.strip().lower() in ("gzip", "*"):
+            quality = params.strip().removeprefix("q=").strip()
+            try:
+                return float(quality or 1) > 0
+            except ValueError:
+                return False
+    return False
+
+
+def _client_shell(
+    record: PageRecord,
+    props: bytes | None,
+    headers: dict[str, str],
+    cookies: dict[str, str],
+) -> bytes:
+    render_request = {
+        "css": record.css or "",
+        "headers": headers or None,
+        "cookies": cookies or None,
+    }
+    return client_shell(record.js, build_head_injection(render_request, props))
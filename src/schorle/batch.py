@@ -0,0 +1,202 @@
+"""
+Batch rendering for offline generation.
+
+`Schorle.render_many(jobs)` renders an iterable of `RenderJob`s on the warm
+render pool, keeping every worker busy while holding at most `concurrency`
+renders in memory. Results come back as an async iterator, either in job
+order or as they complete, and `render_to` hands them to a sink: a directory
+of HTML files or a callback. `slx render-many` does the same for a JSON lines
+file of jobs.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import inspect
+import json
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import AsyncGenerator, AsyncIterable, Awaitable, Callable, Iterable, Union
+
+from fastapi.datastructures import Headers
+from pydantic import BaseModel
+
+from schorle.daemon import DaemonClient
+from schorle.export import output_file
+from schorle.manifest import SchorleProject
+from schorle.pages import PageReference
+from schorle.render import render_pooled
+from schorle.render_pool import RenderPool
+from schorle.utils import pack_props
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class RenderJob:
+    """One page to render, named after its output file."""
+
+    page: Union[str, Path, PageReference]
+    props: Union[dict, BaseModel, None] = None
+    name: str | None = None
+    headers: dict[str, str] = field(default_factory=dict)
+    cookies: dict[str, str] = field(default_factory=dict)
+
+
+@dataclass(frozen=True, slots=True)
+class RenderResult:
+    """The rendered HTML of a job, or the error that failed it."""
+
+    index: int
+    job: RenderJob
+    body: bytes = b""
+    error: Exception | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def name(self) -> str:
+        return self.job.name or str(self.index)
+
+
+@dataclass(frozen=True, slots=True)
+class BatchReport:
+    rendered: int
+    failed: int
+    seconds: float
+
+
+BatchCallback = Callable[[RenderResult], Union[Awaitable[None], None]]
+# a directory to write `<name>/index.html` files to, like `slx export`, or a
+# callback per result
+BatchSink = Union[str, Path, BatchCallback]
+
+
+def read_jobs(path: Path) -> Iterable[RenderJob]:
+    """Read jobs from a JSON lines file, one `{"page", "props", "name"}` per line."""
+    with path.open(encoding="utf-8") as lines:
+        for line in lines:
+            if line.strip():
+                data = json.loads(line)
+                yield RenderJob(
+                    page=data["page"],
+                    props=data.get("props"),
+                    name=data.get("name"),
+                    headers=data.get("headers") or {},
+                    cookies=data.get("cookies") or {},
+                )
+
+
+async def _render(
+    pool: RenderPool | DaemonClient,
+    project: SchorleProject,
+    index: int,
+    job: RenderJob,
+) -> RenderResult:
+    try:
+        if job.name is not None:
+            # fail jobs that a directory sink could not write, before rendering
+            output_file(Path(), job.name)
+        record = project.page_registry.resolve(job.page)
+        stream = render_pooled(
+            pool,
+            project,
+            record,
+            pack_props(job.props),
+            Headers(job.headers),
+            job.cookies,
+        )
+        body = b"".join([chunk async for chunk in stream])
+    except Exception as e:
+        logger.warning(f"Batch render {job.name or index} failed: {e!r}")
+        return RenderResult(index, job, error=e)
+    return RenderResult(index, job, body)
+
+
+async def _jobs(
+    jobs: Iterable[RenderJob] | AsyncIterable[RenderJob],
+) -> AsyncGenerator[RenderJob, None]:
+    if isinstance(jobs, AsyncIterable):
+        async for job in jobs:
+            yield job
+    else:
+        for job in jobs:
+            yield job
+
+
+async def render_many(
+    pool: RenderPool | DaemonClient,
+    project: SchorleProject,
+    jobs: Iterable[RenderJob] | AsyncIterable[RenderJob],
+    ordered: bool = True,
+    concurrency: int | None = None,
+) -> AsyncGenerator[RenderResult, None]:
+    """Render `jobs` on a running pool, yielding a result per job.
+
+    Jobs are read lazily and at most `concurrency` renders (default: the pool
+    size, or the worker count of a render daemon) are in flight or waiting to
+    be yielded. With `ordered`, results
+    follow the job order; otherwise they are yielded as they complete. Failed
+    renders are yielded with their error instead of ending the batch.
+    """
+    limit = max(1, concurrency or pool.size)
+    source = _jobs(jobs)
+    tasks: deque[asyncio.Task[RenderResult]] = deque()
+    index = 0
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(tasks) < limit:
+                job = await anext(source, None)
+                if job is None:
+                    exhausted = True
+                    break
+                tasks.append(asyncio.create_task(_render(pool, project, index, job)))
+                index += 1
+            if not tasks:
+                return
+            if ordered:
+                yield await tasks.popleft()
+                continue
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                tasks.remove(task)
+                yield task.result()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await source.aclose()
+
+
+def _directory_sink(directory: Path) -> BatchCallback:
+    directory.mkdir(parents=True, exist_ok=True)
+
+    async def write(result: RenderResult) -> None:
+        if result.ok:
+            path = output_file(directory, result.name)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            await asyncio.to_thread(path.write_bytes, result.body)
+
+    return write
+
+
+async def drain(results: AsyncIterable[RenderResult], sink: BatchSink) -> BatchReport:
+    """Hand every result to `sink`, counting rendered and failed jobs."""
+    started = time.monotonic()
+    callback = _directory_sink(Path(sink)) if isinstance(sink, (str, Path)) else sink
+    rendered = failed = 0
+    async for result in results:
+        outcome = callback(result)
+        if inspect.isawaitable(outcome):
+            await outcome
+        if result.ok:
+            rendered += 1
+        else:
+            failed += 1
+    return BatchReport(rendered, failed, time.monotonic() - started)
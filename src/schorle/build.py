@@ -1,5 +1,9 @@
+import asyncio
+import gzip
 import json
 import os
+import posixpath
+import re
 from pathlib import Path
 import subprocess
 import shutil
@@ -9,6 +13,7 @@ from rich.console import Console
 from rich.text import Text
 from rich.panel import Panel
 
+from schorle.batch import RenderJob, render_many
 from schorle.manifest import (
     PageInfo,
     BuildManifest,
@@ -16,6 +21,7 @@ from schorle.manifest import (
     BuildManifestAssets,
     SchorleProject,
 )
+from schorle.render_pool import WORKER_COMMAND, RenderPool
 
 console = Console()
 
@@ -88,6 +94,10 @@ server_template_path: Path = (
     importlib.resources.files("schorle") / "templates" / "server-entry.tsx.jinja"  # type: ignore
 )
 
+island_template_path: Path = (
+    importlib.resources.files("schorle") / "templates" / "island-entry.tsx.jinja"  # type: ignore
+)
+
 
 def get_client_template() -> jinja2.Template:
     template = jinja2.Environment(
@@ -103,11 +113,181 @@ def get_server_template() -> jinja2.Template:
     return template
 
 
+def get_island_template() -> jinja2.Template:
+    template = jinja2.Environment(
+        loader=jinja2.FileSystemLoader(str(island_template_path.parent))
+    ).get_template(island_template_path.name)
+    return template
+
+
 # Legacy function for backward compatibility
 def get_template() -> jinja2.Template:
     return get_client_template()
 
 
+# `import"./x.js"` and `from"./x.js"` in (minified) ESM, not dynamic `import()`
+STATIC_IMPORT = re.compile(rb"""(?:\bfrom|\bimport)\s*["'](\.{1,2}/[^"']+)["']""")
+
+
+def collect_static_imports(client_dist: Path, entry: str, known: set[str]) -> list[str]:
+    """Return the client chunks `entry` loads before it can run, transitively.
+
+    Paths are relative to `client_dist`; only files in `known` (the build
+    artifacts) are followed.
+    """
+    chunks: list[str] = []
+    pending = [entry]
+    seen = {entry}
+    while pending:
+        path = pending.pop()
+        try:
+            source = (client_dist / path).read_bytes()
+        except OSError:
+            continue
+        for match in STATIC_IMPORT.finditer(source):
+            target = posixpath.normpath(
+                posixpath.join(posixpath.dirname(path), match.group(1).decode())
+            )
+            if target in known and target not in seen:
+                seen.add(target)
+                chunks.append(target)
+                pending.append(target)
+    return chunks
+
+
+# `export const prerender = true` in a page opts it into build-time rendering
+PRERENDER_EXPORT = re.compile(r"^export\s+const\s+prerender\s*=\s*true\b", re.MULTILINE)
+# `export const hydrate = false` ships a page without client JS
+NO_HYDRATE_EXPORT = re.compile(r"^export\s+const\s+hydrate\s*=\s*false\b", re.MULTILINE)
+
+
+def _exports(page: Path, pattern: re.Pattern[str]) -> bool:
+    try:
+        return pattern.search(page.read_text(encoding="utf-8")) is not None
+    except OSError:
+        return False
+
+
+def wants_prerender(page: Path) -> bool:
+    return _exports(page, PRERENDER_EXPORT)
+
+
+def wants_hydration(page: Path) -> bool:
+    return not _exports(page, NO_HYDRATE_EXPORT)
+
+
+def prerender_pages(
+    project: SchorleProject,
+    precompress: bool = True,
+    command: tuple[str, ...] = WORKER_COMMAND,
+) -> int:
+    """Render the pages exporting `prerender = true` to HTML files.
+
+    The export declares that a page renders the same for every request, so
+    its document is served whatever headers and cookies a request carries.
+    A page failing to render without props fails the build. Returns the
+    number of prerendered pages.
+    """
+    records = [
+        record
+        for record in project.page_registry
+        if record.server_js_path is not None and wants_prerender(record.page)
+    ]
+    if not records:
+        return 0
+    out_dir = project.dist_path / "prerendered"
+
+    async def run() -> dict[str, tuple[str, str | None]]:
+        size = min(len(records), os.cpu_count() or 1)
+        pool = RenderPool(project, size=size, command=command)
+        await pool.start()
+        documents: dict[str, tuple[str, str | None]] = {}
+        try:
+            jobs = [RenderJob(record.page, name=record.key) for record in records]
+            async for result in render_many(pool, project, jobs, ordered=False):
+                if not result.ok:
+                    raise RuntimeError(
+                        f"Failed to prerender {result.name}: {result.error}"
+                    )
+                path = out_dir / f"{result.name}.html"
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_bytes(result.body)
+                html = f"/{path.relative_to(project.root_path).as_posix()}"
+                html_gzip = None
+                if precompress:
+                    path.with_suffix(".html.gz").write_bytes(
+                        gzip.compress(result.body, compresslevel=9, mtime=0)
+                    )
+                    html_gzip = f"{html}.gz"
+                documents[result.name] = (html, html_gzip)
+        finally:
+            await pool.stop()
+        return documents
+
+    documents = asyncio.run(run())
+    manifest = project.manifest
+    # entries are matched on their server bundle, page names are not unique
+    bundles = {record.server_js: record.key for record in records}
+    for entry in manifest.entries:
+        if (key := bundles.get(entry.assets.server_js)) in documents:
+            entry.assets.html, entry.assets.html_gzip = documents[key]
+    project.manifest_path.write_text(manifest.model_dump_json(indent=2))
+    project.invalidate_manifest_cache()
+    return len(documents)
+
+
+# a `"use island"` directive before any other statement marks a client island
+ISLAND_DIRECTIVE = re.compile(
+    r"""\A(?:\s+|//[^\n]*|/\*.*?\*/)*["']use island["']""", re.DOTALL
+)
+ISLAND_SUFFIXES = {".tsx", ".jsx", ".ts", ".js"}
+# generated island hydrators, next to the page entries of the client build
+ISLANDS_DIR = "__islands"
+
+
+def find_islands(project: SchorleProject) -> dict[str, Path]:
+    """Map island ids (paths under the project root) to their files."""
+    islands: dict[str, Path] = {}
+    for directory, dirs, files in os.walk(project.project_root):
+        # pages are never islands; skip dependencies and hidden directories
+        dirs[:] = sorted(
+            d
+            for d in dirs
+            if d != "node_modules"
+            and not d.startswith(".")
+            and Path(directory, d) != project.pages_path
+        )
+        for name in sorted(files):
+            path = Path(directory, name)
+            if path.suffix not in ISLAND_SUFFIXES or name.endswith(".d.ts"):
+                continue
+            try:
+                source = path.read_text(encoding="utf-8")
+            except OSError:
+                continue
+            if ISLAND_DIRECTIVE.match(source):
+                island_id = path.relative_to(project.project_root).with_suffix("")
+                islands[island_id.as_posix()] = path
+    return islands
+
+
+def collect_island_assets(artifacts: list[dict]) -> dict[str, str]:
+    """Map island ids to the client entries built for their hydrators."""
+    prefix = f"pages/{ISLANDS_DIR}/"
+    islands = {}
+    for artifact in artifacts:
+        path = artifact["path"]
+        if (
+            artifact.get("target", "client") == "client"
+            and artifact["kind"] in ["entry", "entry-point"]
+            and path.startswith(prefix)
+            and path.endswith(".js")
+        ):
+            island_id = posixpath.dirname(path.removeprefix(prefix))
+            islands[island_id] = f"/.schorle/dist/client/{path}"
+    return islands
+
+
 def transform_artifacts_to_manifest(
     artifacts: list[dict], page_infos: list[PageInfo], project: SchorleProject
 ) -> list[BuildManifestEntry]:
@@ -123,6 +303,8 @@ def transform_artifacts_to_manifest(
         a for a in artifacts if a.get("target") == "client" or "target" not in a
     ]
     server_artifacts = [a for a in artifacts if a.get("target") == "server"]
+    client_paths = {a["path"] for a in client_artifacts}
+    client_dist = project.dist_path / "client"
 
     # Group client artifacts by their source entry directory
     client_entry_artifacts: dict[str, list[dict]] = {}
@@ -165,12 +347,19 @@ def transform_artifacts_to_manifest(
         # Find client JS and CSS assets
         js_asset = None
         css_asset = None
+        chunk_assets: list[str] = []
 
         for artifact in client_artifacts_for_page:
             if artifact["kind"] in ["entry", "entry-point"] and artifact[
                 "path"
             ].endswith(".js"):
                 js_asset = f"/.schorle/dist/client/{artifact['path']}"
+                chunk_assets = [
+                    f"/.schorle/dist/client/{chunk}"
+                    for chunk in collect_static_imports(
+                        client_dist, artifact["path"], client_paths
+                    )
+                ]
             elif artifact["path"].endswith(".css"):
                 css_asset = f"/.schorle/dist/client/{artifact['path']}"
 
@@ -199,8 +388,13 @@ def transform_artifacts_to_manifest(
             for layout in page_info.layouts
         ]
 
+        hydrate = wants_hydration(page_info.page)
         assets = BuildManifestAssets(
-            js=js_asset, css=css_asset, server_js=server_js_asset
+            js=js_asset,
+            css=css_asset,
+            server_js=server_js_asset,
+            chunks=chunk_assets if hydrate else [],
+            hydrate=hydrate,
         )
         entry = BuildManifestEntry(page=page_path, layouts=layout_paths, assets=assets)
         manifest_entries.append(entry)
@@ -269,6 +463,7 @@ def build_entrypoints(command: tuple[str, ...], project: SchorleProject):
                 client_template.render(
                     import_statements=import_statements_str,
                     layout_components=layout_components_str,
+                    hydrate=wants_hydration(page_info.page),
                 )
             )
         client_entrypoints.append(client_output_path)
@@ -284,14 +479,35 @@ def build_entrypoints(command: tuple[str, ...], project: SchorleProject):
                 server_template.render(
                     import_statements=import_statements_str,
                     layout_components=layout_components_str,
+                    hydrate=wants_hydration(page_info.page),
                 )
             )
         server_entrypoints.append(server_output_path)
 
+    # Generate a hydrator per island, for pages that do not hydrate as a whole
+    islands = find_islands(project)
+    island_template = get_island_template()
+    islands_dir = project.schorle_dir / ".gen" / "client" / ISLANDS_DIR
+    for island_id, island_path in islands.items():
+        island_output_path = islands_dir / f"{island_id}.tsx"
+        island_output_path.parent.mkdir(parents=True, exist_ok=True)
+        island_output_path.write_text(
+            island_template.render(
+                island_import=island_path.relative_to(project.project_root).with_suffix(
+                    ""
+                ),
+                island_id=island_id,
+            )
+        )
+        client_entrypoints.append(island_output_path)
+
     # Create build config with both client and server entrypoints
     build_config = {
         "client": [str(p) for p in client_entrypoints],
         "server": [str(p) for p in server_entrypoints],
+        "islands": {
+            str(path.resolve()): island_id for island_id, path in islands.items()
+        },
     }
 
     base_env = os.environ.copy()
@@ -348,10 +564,13 @@ def build_entrypoints(command: tuple[str, ...], project: SchorleProject):
 
     # Create the manifest and write it
     manifest = BuildManifest(
-        entries=manifest_entries, mode="development" if project.dev else "production"
+        entries=manifest_entries,
+        mode="development" if project.dev else "production",
+        islands=collect_island_assets(artifacts),
     )
     manifest_path = project.manifest_path
     manifest_path.parent.mkdir(parents=True, exist_ok=True)
 
     with open(manifest_path, "w") as f:
         f.write(manifest.model_dump_json(indent=2))
+    project.invalidate_manifest_cache()
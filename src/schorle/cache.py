@@ -0,0 +1,617 @@
+"""
+Full-page render cache.
+
+Caching is opt-in per render: `Schorle(render_cache=MemoryRenderCache())`
+provides the storage and `ui.render(..., cache=CachePolicy(...))` enables it for
+a page. Entries are keyed by page, props bytes and an allowlisted subset of
+headers and cookies, and hold the complete HTML.
+
+Storage is pluggable through `RenderCacheBackend`. `MemoryRenderCache` keeps
+entries per process; `SqliteRenderCache` keeps them in a SQLite file under
+`.schorle/cache`, shared by every worker process on the host.
+
+With `stale_while_revalidate` set, an entry past its TTL is still served for
+that many seconds while a background render refreshes it.
+
+Entries can carry tags (`ui.render(..., cache_tags=["post:1"])`) and are purged
+by tag with `ui.invalidate(tags=["post:1"])` when the data behind them changes.
+
+Backends that block, like `SqliteRenderCache`, are called through
+`asyncio.to_thread` from async code so the event loop never waits on them.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import (
+    AsyncGenerator,
+    AsyncIterator,
+    Callable,
+    Iterable,
+    Mapping,
+    TypeVar,
+)
+
+from schorle.manifest import find_schorle_project
+
+logger = logging.getLogger(__name__)
+T = TypeVar("T")
+
+# how long tag invalidations are remembered to reject renders already in flight
+INVALIDATION_HORIZON = 300.0
+
+
+@dataclass(frozen=True, slots=True)
+class CachePolicy:
+    """How a page render is cached.
+
+    Only the listed headers and cookies are passed to the render when caching
+    is enabled, so the cached HTML never embeds another user's request data.
+    """
+
+    ttl: float = 60.0
+    # seconds past `ttl` during which the stale page is served while refreshing
+    stale_while_revalidate: float = 0.0
+    vary_headers: tuple[str, ...] = ()
+    vary_cookies: tuple[str, ...] = ()
+
+    def select_headers(self, headers: Mapping[str, str]) -> dict[str, str]:
+        lowered = {name.lower(): value for name, value in headers.items()}
+        return {
+            name.lower(): lowered[name.lower()]
+            for name in self.vary_headers
+            if name.lower() in lowered
+        }
+
+    def select_cookies(self, cookies: Mapping[str, str]) -> dict[str, str]:
+        return {name: cookies[name] for name in self.vary_cookies if name in cookies}
+
+
+@dataclass(slots=True)
+class CacheEntry:
+    body: bytes
+    created_at: float
+    expires_at: float
+    stale_until: float | None = None  # defaults to expires_at
+    tags: tuple[str, ...] = ()
+
+    @property
+    def size(self) -> int:
+        return len(self.body)
+
+    def expired(self, now: float | None = None) -> bool:
+        return (time.time() if now is None else now) >= self.expires_at
+
+    def unusable(self, now: float | None = None) -> bool:
+        """Whether the entry is past its stale window and must not be served."""
+        stale_until = self.expires_at if self.stale_until is None else self.stale_until
+        return (time.time() if now is None else now) >= stale_until
+
+
+def render_cache_key(
+    page: str,
+    props: bytes | None,
+    headers: Mapping[str, str] | None = None,
+    cookies: Mapping[str, str] | None = None,
+) -> str:
+    """Build the cache key of a render from its page and inputs."""
+    digest = hashlib.sha256(props or b"")
+    digest.update(b"\0")
+    digest.update(json.dumps(headers or {}, sort_keys=True).encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(json.dumps(cookies or {}, sort_keys=True).encode("utf-8"))
+    return f"{page}:{digest.hexdigest()}"
+
+
+class RenderCacheBackend(ABC):
+    """Storage of rendered pages.
+
+    Backends bound their total size by `max_bytes`, skip pages larger than
+    `max_entry_bytes`, and keep an entry servable until its stale window ends.
+
+    Tags invalidated after a render started are remembered, so a render that
+    was already in flight when its data changed is not stored.
+
+    Methods are called from the event loop and from threadpool threads. Set
+    `blocking` on backends doing I/O to have async callers run them in a thread.
+    """
+
+    blocking = False
+
+    def __init__(
+        self, max_bytes: int = 64 * 1024 * 1024, max_entry_bytes: int | None = None
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes or max_bytes // 8
+
+    @abstractmethod
+    def get(self, key: str) -> CacheEntry | None:
+        """Return a servable entry; check `expired()` to tell if it is stale."""
+
+    @abstractmethod
+    def set(
+        self,
+        key: str,
+        body: bytes,
+        ttl: float,
+        stale: float = 0.0,
+        tags: Iterable[str] = (),
+        started_at: float | None = None,
+    ) -> None:
+        """Store a page for `ttl` seconds, plus `stale` seconds of staleness.
+
+        `started_at` is when the render began; the page is dropped if one of
+        its tags has been invalidated since.
+        """
+
+    @abstractmethod
+    def delete(self, key: str) -> None: ...
+
+    @abstractmethod
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        """Delete every entry carrying one of `tags`; return how many were deleted."""
+
+    @abstractmethod
+    def clear(self) -> None: ...
+
+    @abstractmethod
+    def stats(self) -> dict[str, int]: ...
+
+
+class MemoryRenderCache(RenderCacheBackend):
+    """In-process LRU cache of rendered pages with per-entry TTL and a byte budget.
+
+    A lock guards the entries, so threadpool threads can share the cache.
+    """
+
+    def __init__(
+        self, max_bytes: int = 64 * 1024 * 1024, max_entry_bytes: int | None = None
+    ) -> None:
+        super().__init__(max_bytes, max_entry_bytes)
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._tags: dict[str, set[str]] = {}
+        self._invalidated_at: dict[str, float] = {}
+        self._size = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._lock = threading.RLock()
+
+    def get(self, key: str) -> CacheEntry | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.unusable():
+                if entry is not None:
+                    self.delete(key)
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry
+
+    def set(
+        self,
+        key: str,
+        body: bytes,
+        ttl: float,
+        stale: float = 0.0,
+        tags: Iterable[str] = (),
+        started_at: float | None = None,
+    ) -> None:
+        with self._lock:
+            tags = tuple(tags)
+            if len(body) > self.max_entry_bytes:
+                return
+            if started_at is not None and any(
+                self._invalidated_at.get(tag, 0.0) >= started_at for tag in tags
+            ):
+                return
+            self.delete(key)
+            now = time.time()
+            self._entries[key] = CacheEntry(
+                body,
+                created_at=now,
+                expires_at=now + ttl,
+                stale_until=now + ttl + stale,
+                tags=tags,
+            )
+            self._size += len(body)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while self._size > self.max_bytes:
+                evicted_key, evicted = self._entries.popitem(last=False)
+                self._forget(evicted_key, evicted)
+                self._evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._forget(key, entry)
+
+    def _forget(self, key: str, entry: CacheEntry) -> None:
+        self._size -= entry.size
+        for tag in entry.tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        with self._lock:
+            now = time.time()
+            self._invalidated_at = {
+                tag: at
+                for tag, at in self._invalidated_at.items()
+                if at > now - INVALIDATION_HORIZON
+            }
+            deleted = 0
+            for tag in tags:
+                self._invalidated_at[tag] = now
+                for key in list(self._tags.get(tag, ())):
+                    self.delete(key)
+                    deleted += 1
+            return deleted
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+            self._size = 0
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+            }
+
+
+class SqliteRenderCache(RenderCacheBackend):
+    """Render cache in a SQLite database shared by the processes of a host.
+
+    The database runs in WAL mode so readers never wait on a writer. Every
+    write is a single transaction that stores the page and evicts expired and
+    least recently used entries until the store fits in `max_bytes`, so other
+    processes only ever see complete pages and a bounded file. Hit, miss and
+    eviction counters are per process.
+
+    The database defaults to `.schorle/cache/render.sqlite` in the project
+    found from the working directory. Threads of a process share one
+    connection, used by one thread at a time.
+    """
+
+    blocking = True
+
+    def __init__(
+        self,
+        path: str | Path | None = None,
+        max_bytes: int = 256 * 1024 * 1024,
+        max_entry_bytes: int | None = None,
+        timeout: float = 5.0,
+    ) -> None:
+        super().__init__(max_bytes, max_entry_bytes)
+        if path is None:
+            project = find_schorle_project(Path.cwd())
+            path = project.schorle_dir / "cache" / "render.sqlite"
+        self.path = Path(path)
+        self.timeout = timeout
+        self._connection: sqlite3.Connection | None = None
+        self._pid: int | None = None
+        # sqlite3 connections are not safe to use from several threads at once
+        self._lock = threading.RLock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        # connections must not cross a fork, so each process opens its own
+        with self._lock:
+            if self._connection is None or self._pid != os.getpid():
+                self._connection = self._connect()
+                self._pid = os.getpid()
+            return self._connection
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(
+            self.path,
+            timeout=self.timeout,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute("PRAGMA foreign_keys=ON")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, body BLOB NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, expires_at REAL NOT NULL, "
+            "stale_until REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at)"
+        )
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS tags ("
+            "tag TEXT NOT NULL, "
+            "key TEXT NOT NULL REFERENCES entries (key) ON DELETE CASCADE, "
+            "PRIMARY KEY (tag, key))"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS tags_key ON tags (key)")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS invalidations ("
+            "tag TEXT PRIMARY KEY, invalidated_at REAL NOT NULL)"
+        )
+        return connection
+
+    def get(self, key: str) -> CacheEntry | None:
+        now = time.time()
+        with self._lock:
+            connection = self.connection
+            row = connection.execute(
+                "SELECT body, created_at, expires_at, stale_until FROM entries "
+                "WHERE key = ? AND stale_until > ?",
+                (key, now),
+            ).fetchone()
+            if row is None:
+                self._misses += 1
+                return None
+            # refresh the LRU position at most once a second to keep hits read-only
+            connection.execute(
+                "UPDATE entries SET accessed_at = ? WHERE key = ? AND accessed_at < ?",
+                (now, key, now - 1),
+            )
+            self._hits += 1
+        body, created_at, expires_at, stale_until = row
+        return CacheEntry(body, created_at, expires_at, stale_until)
+
+    def set(
+        self,
+        key: str,
+        body: bytes,
+        ttl: float,
+        stale: float = 0.0,
+        tags: Iterable[str] = (),
+        started_at: float | None = None,
+    ) -> None:
+        tags = tuple(tags)
+        if len(body) > self.max_entry_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            connection = self.connection
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                if started_at is not None and tags:
+                    invalidated = connection.execute(
+                        "SELECT 1 FROM invalidations WHERE invalidated_at >= ? "
+                        f"AND tag IN ({', '.join('?' * len(tags))}) LIMIT 1",
+                        (started_at, *tags),
+                    ).fetchone()
+                    if invalidated is not None:
+                        connection.execute("ROLLBACK")
+                        return
+                # delete rather than replace, so the old entry's tags cascade away
+                connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+                connection.execute(
+                    "INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, body, len(body), now, now + ttl, now + ttl + stale, now),
+                )
+                connection.executemany(
+                    "INSERT OR IGNORE INTO tags VALUES (?, ?)",
+                    [(tag, key) for tag in tags],
+                )
+                connection.execute("DELETE FROM entries WHERE stale_until <= ?", (now,))
+                evicted = connection.execute(
+                    "DELETE FROM entries WHERE key IN ("
+                    "SELECT key FROM (SELECT key, SUM(size) OVER "
+                    "(ORDER BY accessed_at DESC, key) AS total FROM entries) "
+                    "WHERE total > ?)",
+                    (self.max_bytes,),
+                ).rowcount
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            self._evictions += evicted
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self.connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        tags = tuple(tags)
+        if not tags:
+            return 0
+        now = time.time()
+        with self._lock:
+            connection = self.connection
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.execute(
+                    "DELETE FROM invalidations WHERE invalidated_at <= ?",
+                    (now - INVALIDATION_HORIZON,),
+                )
+                connection.executemany(
+                    "INSERT OR REPLACE INTO invalidations VALUES (?, ?)",
+                    [(tag, now) for tag in tags],
+                )
+                deleted = connection.execute(
+                    "DELETE FROM entries WHERE key IN (SELECT key FROM tags "
+                    f"WHERE tag IN ({', '.join('?' * len(tags))}))",
+                    tags,
+                ).rowcount
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        return deleted
+
+    def clear(self) -> None:
+        with self._lock:
+            self.connection.execute("DELETE FROM entries")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None and self._pid == os.getpid():
+                self._connection.close()
+            self._connection = None
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            entries, size = self.connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+        return {
+            "entries": entries,
+            "bytes": size,
+            "hits": self._hits,
+            "misses": self._misses,
+            "evictions": self._evictions,
+        }
+
+
+async def call_cache(cache: RenderCacheBackend, method: Callable[..., T], *args) -> T:
+    """Call a method of `cache` from async code, in a thread if it blocks."""
+    if cache.blocking:
+        return await asyncio.to_thread(method, *args)
+    return method(*args)
+
+
+async def cache_stream(
+    stream: AsyncIterator[bytes],
+    cache: RenderCacheBackend,
+    key: str,
+    ttl: float,
+    stale: float = 0.0,
+    tags: Iterable[str] = (),
+) -> AsyncGenerator[bytes, None]:
+    """Pass a render stream through and store the complete HTML once it finished.
+
+    Failed or abandoned renders are not stored, and buffering stops as soon as
+    the page grows past the cache's per-entry limit.
+    """
+    started_at = time.time()
+    buffer: list[bytes] | None = []
+    size = 0
+    try:
+        async for chunk in stream:
+            if buffer is not None:
+                size += len(chunk)
+                if size > cache.max_entry_bytes:
+                    buffer = None
+                else:
+                    buffer.append(chunk)
+            yield chunk
+    finally:
+        if isinstance(stream, AsyncGenerator):
+            await stream.aclose()
+    if buffer is not None:
+        await call_cache(
+            cache, cache.set, key, b"".join(buffer), ttl, stale, tags, started_at
+        )
+
+
+async def cached_body(body: bytes) -> AsyncGenerator[bytes, None]:
+    """Serve a cached page as a single chunk."""
+    yield body
+
+
+class Revalidator:
+    """Refresh stale cache entries in background tasks, at most one per key.
+
+    Refreshes run on the event loop next to regular renders and never delay
+    the response serving the stale page. Failures are logged and leave the
+    stale entry in place until its stale window ends.
+    """
+
+    def __init__(self, cache: RenderCacheBackend) -> None:
+        self.cache = cache
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._refreshes = 0
+        self._failures = 0
+        self._last_duration = 0.0
+        self._total_duration = 0.0
+
+    def refresh(
+        self,
+        key: str,
+        start: Callable[[], AsyncIterator[bytes]],
+        ttl: float,
+        stale: float = 0.0,
+        tags: Iterable[str] = (),
+    ) -> bool:
+        """Schedule a re-render of `key` unless one is already running."""
+        if key in self._tasks:
+            return False
+        self._tasks[key] = asyncio.create_task(
+            self._refresh(key, start, ttl, stale, tuple(tags))
+        )
+        return True
+
+    async def _refresh(
+        self,
+        key: str,
+        start: Callable[[], AsyncIterator[bytes]],
+        ttl: float,
+        stale: float,
+        tags: tuple[str, ...],
+    ) -> None:
+        started_at = time.time()
+        started = time.perf_counter()
+        try:
+            body = b"".join([chunk async for chunk in start()])
+            await call_cache(
+                self.cache, self.cache.set, key, body, ttl, stale, tags, started_at
+            )
+            self._refreshes += 1
+        except Exception:
+            self._failures += 1
+            logger.exception(f"Background refresh of {key} failed")
+        finally:
+            duration = time.perf_counter() - started
+            self._last_duration = duration
+            self._total_duration += duration
+            del self._tasks[key]
+            logger.debug(f"Refresh of {key} took {duration * 1000:.1f}ms")
+
+    async def aclose(self) -> None:
+        """Cancel refreshes still running, e.g. on shutdown."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    @asynccontextmanager
+    async def lifespan(self, app):
+        try:
+            yield
+        finally:
+            await self.aclose()
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "refreshing": len(self._tasks),
+            "refreshes": self._refreshes,
+            "failures": self._failures,
+            "last_duration": self._last_duration,
+            "total_duration": self._total_duration,
+        }
@@ -1,8 +1,10 @@
+import asyncio
 import json
 from pathlib import Path
 import subprocess
 import shutil
 import time
+from typing import Callable
 from fastapi import FastAPI
 import typer
 import importlib.metadata
@@ -11,12 +13,16 @@ from rich.console import Console
 from rich.spinner import Spinner
 from rich.live import Live
 from rich.text import Text
-from schorle.build import build_entrypoints
+from schorle.batch import drain, read_jobs, render_many
+from schorle.build import build_entrypoints, prerender_pages
+from schorle.daemon import DEFAULT_SOCKET_PATH, RenderDaemon
+from schorle.export import export_app
+from schorle.render_pool import RenderPool
 from schorle.bun import check_and_prepare_bun
 from schorle.json_schema import generate_schemas
 from schorle.page_system import generate_python_stubs
 from schorle.utils import schema_to_ts, templates_path
-from schorle.manifest import find_schorle_project
+from schorle.manifest import SchorleProject, find_schorle_project
 
 __version__ = importlib.metadata.version("schorle")
 
@@ -141,10 +147,36 @@ def init(
     console.print("[blue]●[/blue] [green]Project initialized successfully[/green]")
 
 
+def build_project(
+    project: SchorleProject,
+    with_stubs: bool = True,
+    precompress: bool = True,
+    progress: Callable[[str], None] | None = None,
+) -> int:
+    """Build the bundles, prerender static pages outside dev mode, and generate
+    the Python stubs. Returns the number of prerendered pages."""
+    report = progress or (lambda text: None)
+    build_entrypoints(("bun", "run", "slx-ipc", "build"), project)
+
+    # static pages are served from HTML files rendered once, here
+    prerendered = 0
+    if not project.dev:
+        report("Prerendering static pages...")
+        prerendered = prerender_pages(project, precompress=precompress)
+
+    if with_stubs:
+        report("Generating Python stubs...")
+        generate_python_stubs(project)
+    return prerendered
+
+
 @app.command(name="build", help="Build the project")
 def build(
     dev: bool = typer.Option(False, help="Build in dev mode"),
     with_stubs: bool = typer.Option(True, help="Generate Python stubs for pages"),
+    precompress: bool = typer.Option(
+        True, help="Store a gzip copy of every prerendered page"
+    ),
 ):
     project = find_schorle_project(Path.cwd())
     project.dev = dev
@@ -156,15 +188,12 @@ def build(
 
     with Live(spinner, console=console, refresh_per_second=10):
         start_time = time.time()
-
-        # Build entrypoints
-        build_entrypoints(("bun", "run", "slx-ipc", "build"), project)
-
-        # Generate Python stubs if requested
-        if with_stubs:
-            spinner.update(text="Generating Python stubs...")
-            generate_python_stubs(project)
-
+        prerendered = build_project(
+            project,
+            with_stubs,
+            precompress,
+            progress=lambda text: spinner.update(text=text),
+        )
         end_time = time.time()
         build_time_ms = (end_time - start_time) * 1000
         spinner.update(text="Build completed successfully", style="green")
@@ -178,10 +207,127 @@ def build(
     # show the manifest path
     console.print(f"Manifest file generated at: {project.manifest_path}", style="blue")
     console.print(f"Total pages: {len(project.manifest.entries)}", style="blue")
+    if prerendered:
+        console.print(f"Prerendered pages: {prerendered}", style="blue")
     # tell how many pages are in the manifest
     console.print(success_text)
 
 
+@app.command(
+    "render-daemon",
+    help="Serve renders to every app process on this host over a Unix socket",
+)
+def render_daemon(
+    socket: Path = typer.Option(
+        DEFAULT_SOCKET_PATH, help="Path of the Unix socket to listen on"
+    ),
+    workers: int | None = typer.Option(None, help="Number of Bun render workers"),
+    max_renders: int = typer.Option(
+        1000, help="Replace a worker after this many renders"
+    ),
+    max_rss: int | None = typer.Option(
+        None, help="Replace a worker once its RSS exceeds this many bytes"
+    ),
+):
+    project = find_schorle_project(Path.cwd())
+    project.dev = False
+    if not project.manifest_path.exists():
+        console.print("[red]✗[/red] No build found. Please run `slx build` first.")
+        raise typer.Exit(code=1)
+
+    pool = RenderPool(project, size=workers, max_renders=max_renders, max_rss=max_rss)
+    daemon = RenderDaemon(pool, socket)
+    console.print(
+        f"[blue]●[/blue] Render daemon with {pool.size} workers listening on {socket}"
+    )
+    try:
+        asyncio.run(daemon.serve_forever())
+    except KeyboardInterrupt:
+        console.print("[blue]●[/blue] Render daemon stopped")
+
+
+@app.command("render-many", help="Render a JSON lines file of pages into a directory")
+def render_many_command(
+    jobs: Path = typer.Argument(
+        help='JSON lines file with one {"page", "props", "name"} job per line',
+    ),
+    out: Path = typer.Option(Path("rendered"), help="Directory to write pages to"),
+    workers: int | None = typer.Option(None, help="Number of Bun render workers"),
+    concurrency: int | None = typer.Option(
+        None, help="Renders held at once, defaults to the number of workers"
+    ),
+    ordered: bool = typer.Option(
+        True, help="Write pages in job order instead of as they complete"
+    ),
+):
+    project = find_schorle_project(Path.cwd())
+    project.dev = False
+    if not project.manifest_path.exists():
+        console.print("[red]✗[/red] No build found. Please run `slx build` first.")
+        raise typer.Exit(code=1)
+
+    pool = RenderPool(project, size=workers)
+
+    async def run():
+        await pool.start()
+        try:
+            results = render_many(pool, project, read_jobs(jobs), ordered, concurrency)
+            return await drain(results, out)
+        finally:
+            await pool.stop()
+
+    spinner = Spinner("dots", text=f"Rendering {jobs}...", style="blue")
+    with Live(spinner, console=console, refresh_per_second=10):
+        report = asyncio.run(run())
+
+    console.print(
+        f"[blue]●[/blue] [green]Rendered {report.rendered} pages into {out} "
+        f"in {report.seconds:.1f}s[/green]"
+    )
+    if report.failed:
+        console.print(f"[red]✗[/red] {report.failed} pages failed to render")
+        raise typer.Exit(code=1)
+
+
+@app.command("export", help="Export the app's pages as a static site")
+def export(
+    app: str = typer.Argument(
+        help="The FastAPI app to export, in format of uvicorn pkg.module:app",
+    ),
+    out: Path = typer.Option(Path("dist"), help="Directory to write the site to"),
+    path: list[str] | None = typer.Option(
+        None,
+        help="Path to export, repeatable, without a query string; defaults to "
+        "every GET route without path parameters",
+    ),
+    concurrency: int = typer.Option(8, help="Requests in flight at once"),
+):
+    project = find_schorle_project(Path.cwd())
+    if not project.manifest_path.exists():
+        console.print("[red]✗[/red] No build found. Please run `slx build` first.")
+        raise typer.Exit(code=1)
+
+    module = importlib.import_module(app.split(":")[0])
+    instance: FastAPI = getattr(module, app.split(":")[1])
+
+    spinner = Spinner("dots", text=f"Exporting {app}...", style="blue")
+    try:
+        with Live(spinner, console=console, refresh_per_second=10):
+            report = asyncio.run(export_app(instance, project, out, path, concurrency))
+    except ValueError as e:
+        console.print(f"[red]✗[/red] {e}")
+        raise typer.Exit(code=1)
+
+    for page in report.failed:
+        console.print(f"[red]✗[/red] {page.path} answered with {page.status}")
+    console.print(
+        f"[blue]●[/blue] [green]Exported {len(report.written)} pages into {out} "
+        f"in {report.seconds:.1f}s[/green]"
+    )
+    if report.failed:
+        raise typer.Exit(code=1)
+
+
 @app.command("codegen", help="Generate models from the project")
 def generate_models(
     module_name: str = typer.Argument(
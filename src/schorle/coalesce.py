@@ -0,0 +1,102 @@
+"""
+Single-flight coalescing of identical concurrent renders.
+
+While a render for a key is in flight, further requests for the same key
+subscribe to it instead of starting their own. The render runs in its own
+task and its chunks fan out to every subscriber, so a cancelled request
+(e.g. a disconnected client) does not abort the render for the others. The
+render is cancelled once its last subscriber is gone.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import AsyncGenerator, Callable
+
+
+class _Flight:
+    __slots__ = ("chunks", "done", "error", "subscribers", "task", "updated")
+
+    def __init__(self) -> None:
+        self.chunks: list[bytes] = []
+        self.done = False
+        self.error: BaseException | None = None
+        self.subscribers = 0
+        self.task: asyncio.Task | None = None
+        self.updated = asyncio.Event()
+
+    def notify(self) -> None:
+        updated, self.updated = self.updated, asyncio.Event()
+        updated.set()
+
+
+class SingleFlight:
+    """Share one in-flight render per key between concurrent requests."""
+
+    def __init__(self) -> None:
+        self._flights: dict[str, _Flight] = {}
+        self._leaders = 0
+        self._followers = 0
+
+    def stream(
+        self, key: str, start: Callable[[], AsyncGenerator[bytes, None]]
+    ) -> AsyncGenerator[bytes, None]:
+        """Stream the render for `key`, calling `start` only if none is in flight."""
+
+        async def subscribe() -> AsyncGenerator[bytes, None]:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = _Flight()
+                self._flights[key] = flight
+                flight.task = asyncio.create_task(self._run(key, flight, start()))
+                self._leaders += 1
+            else:
+                self._followers += 1
+
+            flight.subscribers += 1
+            index = 0
+            try:
+                while True:
+                    updated = flight.updated
+                    while index < len(flight.chunks):
+                        yield flight.chunks[index]
+                        index += 1
+                    if flight.done:
+                        if flight.error is not None:
+                            raise flight.error
+                        return
+                    await updated.wait()
+            finally:
+                flight.subscribers -= 1
+                if flight.subscribers == 0 and not flight.done:
+                    # forget the flight right away: a request arriving before
+                    # the task unwinds must not join a cancelled render
+                    if self._flights.get(key) is flight:
+                        del self._flights[key]
+                    assert flight.task is not None
+                    flight.task.cancel()
+
+        return subscribe()
+
+    async def _run(
+        self, key: str, flight: _Flight, stream: AsyncGenerator[bytes, None]
+    ) -> None:
+        try:
+            async for chunk in stream:
+                flight.chunks.append(chunk)
+                flight.notify()
+        except Exception as e:
+            flight.error = e
+        finally:
+            await stream.aclose()
+            flight.done = True
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            flight.notify()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "in_flight": len(self._flights),
+            "leaders": self._leaders,
+            "followers": self._followers,
+        }
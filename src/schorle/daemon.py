@@ -0,0 +1,410 @@
+"""
+Render daemon shared by the Python processes of a host.
+
+`slx render-daemon` runs one supervised `RenderPool` behind a Unix domain
+socket. Every `Schorle(render_daemon=...)` instance talks to it through a
+`DaemonClient`, so SSR memory scales with the render pool size rather than
+with the number of uvicorn workers.
+
+The socket speaks the framed protocol of `schorle.protocol`. The daemon
+greets each connection with a READY frame carrying its worker count as JSON.
+A connection carries many renders at once: the client picks the request ids,
+a RENDER frame (JSON request including `server_js` and `page`) starts a
+render on a worker, the matching PROPS frame may follow once the props are
+loaded, DEFER frames carry deferred props, ABORT cancels it, and the daemon
+answers with CHUNK frames and a final END or ERROR.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import logging
+from contextlib import asynccontextmanager
+from functools import partial
+from pathlib import Path
+from typing import Any, AsyncGenerator, AsyncIterable
+
+from schorle.manifest import SchorleProject
+from schorle.protocol import (
+    WORKER_FRAME_ID,
+    FrameKind,
+    ProtocolError,
+    encode_frame,
+    encode_json_frame,
+    read_frame,
+)
+from schorle.render_pool import RenderError, RenderPool, RenderProps
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET_PATH = Path(".schorle") / "render.sock"
+# frames buffered per render on the client before the render is aborted
+MAX_QUEUED_FRAMES = 1024
+
+
+class _Connection:
+    """Write side of a socket shared by concurrent renders."""
+
+    def __init__(self, writer: asyncio.StreamWriter) -> None:
+        self.writer = writer
+        self._lock = asyncio.Lock()
+
+    async def send(self, frame: bytes) -> None:
+        async with self._lock:
+            self.writer.write(frame)
+            await self.writer.drain()
+
+
+async def _send(connection: _Connection, frame: bytes) -> bool:
+    """Send a frame to a client, returning False if it is gone."""
+    try:
+        await connection.send(frame)
+    except ConnectionError:
+        return False
+    return True
+
+
+def _forget(tables: tuple[dict[int, Any], ...], request_id: int, _: Any) -> None:
+    for table in tables:
+        table.pop(request_id, None)
+
+
+def _clear(queue: asyncio.Queue) -> None:
+    while not queue.empty():
+        queue.get_nowait()
+
+
+async def _queued(
+    queue: asyncio.Queue[bytes], count: int
+) -> AsyncGenerator[bytes, None]:
+    for _ in range(count):
+        yield await queue.get()
+
+
+class RenderDaemon:
+    """Serve renders from a single render pool over a Unix socket."""
+
+    def __init__(
+        self, pool: RenderPool, socket_path: str | Path = DEFAULT_SOCKET_PATH
+    ) -> None:
+        self.pool = pool
+        self.socket_path = Path(socket_path)
+        self._server: asyncio.AbstractServer | None = None
+
+    async def start(self) -> None:
+        await self.pool.start()
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        self.socket_path.unlink(missing_ok=True)
+        self._server = await asyncio.start_unix_server(
+            self._handle, path=str(self.socket_path)
+        )
+        logger.info(f"Render daemon listening on {self.socket_path}")
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        self.socket_path.unlink(missing_ok=True)
+        await self.pool.stop()
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await self.stop()
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        connection = _Connection(writer)
+        loop = asyncio.get_running_loop()
+        # props of renders that are already waiting for a worker
+        pending: dict[int, asyncio.Future[bytes | None]] = {}
+        deferreds: dict[int, asyncio.Queue[bytes]] = {}
+        renders: dict[int, asyncio.Task[None]] = {}
+        try:
+            # the worker count lets clients size their batches like a pool's
+            ready = {"workers": self.pool.size}
+            await connection.send(
+                encode_json_frame(FrameKind.READY, WORKER_FRAME_ID, ready)
+            )
+            while True:
+                try:
+                    kind, request_id, payload = await read_frame(reader)
+                except asyncio.IncompleteReadError:
+                    return
+                if kind == FrameKind.RENDER:
+                    request = json.loads(payload)
+                    props = pending[request_id] = loop.create_future()
+                    deferred = None
+                    if names := request.get("deferred"):
+                        queue = deferreds[request_id] = asyncio.Queue()
+                        deferred = _queued(queue, len(names))
+                    task = asyncio.create_task(
+                        self._render(connection, request_id, request, props, deferred)
+                    )
+                    renders[request_id] = task
+                    task.add_done_callback(
+                        partial(_forget, (renders, deferreds), request_id)
+                    )
+                elif kind == FrameKind.PROPS:
+                    if (future := pending.pop(request_id, None)) is None:
+                        raise ProtocolError(f"Props for unknown render {request_id}")
+                    future.set_result(payload or None)
+                elif kind == FrameKind.DEFER:
+                    if (values := deferreds.get(request_id)) is not None:
+                        values.put_nowait(payload)
+                elif kind == FrameKind.ABORT:
+                    pending.pop(request_id, None)
+                    if (running := renders.get(request_id)) is not None:
+                        running.cancel()
+                else:
+                    raise ProtocolError(f"Unexpected frame from client: {kind.name}")
+        except (ConnectionError, ProtocolError) as e:
+            logger.warning(f"Dropping render daemon client: {e}")
+        finally:
+            # the client is gone, nobody reads the renders it started
+            for task in list(renders.values()):
+                task.cancel()
+            writer.close()
+
+    async def _render(
+        self,
+        connection: _Connection,
+        request_id: int,
+        request: dict[str, Any],
+        props: asyncio.Future[bytes | None],
+        deferred: AsyncIterable[bytes] | None,
+    ) -> None:
+        server_js = Path(request.pop("server_js"))
+        page = request.pop("page", None)
+        stream = self.pool.render(server_js, request, props, page, deferred)
+        try:
+            async for chunk in stream:
+                if not await _send(
+                    connection, encode_frame(FrameKind.CHUNK, request_id, chunk)
+                ):
+                    return
+            frame = encode_frame(FrameKind.END, request_id)
+        except RenderError as e:
+            frame = encode_frame(FrameKind.ERROR, request_id, str(e).encode("utf-8"))
+        except Exception:
+            # e.g. a misbehaving worker or a pool shutting down; the client
+            # must still hear about it instead of waiting forever
+            logger.exception(f"Render {request_id} failed in the render daemon")
+            frame = encode_frame(
+                FrameKind.ERROR, request_id, b"Render failed in the render daemon"
+            )
+        finally:
+            await stream.aclose()
+        await _send(connection, frame)
+
+
+class _ClientConnection:
+    """One multiplexed socket to the daemon, dispatching frames by request id."""
+
+    def __init__(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        self.reader = reader
+        self.connection = _Connection(writer)
+        self.requests: dict[int, asyncio.Queue[tuple[FrameKind, bytes] | None]] = {}
+        self._request_ids = itertools.count(1)
+        self._reader_task = asyncio.create_task(self._dispatch())
+
+    @property
+    def alive(self) -> bool:
+        return not self._reader_task.done()
+
+    async def _dispatch(self) -> None:
+        try:
+            while True:
+                kind, request_id, payload = await read_frame(self.reader)
+                queue = self.requests.get(request_id)
+                if queue is None:
+                    continue
+                try:
+                    queue.put_nowait((kind, payload))
+                except asyncio.QueueFull:
+                    self._overflow(request_id, queue)
+        except (asyncio.IncompleteReadError, ConnectionError, ProtocolError):
+            pass
+        finally:
+            # wake up every render waiting on this connection
+            for queue in self.requests.values():
+                _clear(queue)
+                queue.put_nowait(None)
+
+    def _overflow(
+        self, request_id: int, queue: asyncio.Queue[tuple[FrameKind, bytes] | None]
+    ) -> None:
+        """Abort a render whose reader fell `MAX_QUEUED_FRAMES` frames behind."""
+        del self.requests[request_id]
+        _clear(queue)
+        queue.put_nowait(
+            (FrameKind.ERROR, b"Render aborted, its reader fell too far behind")
+        )
+        self.connection.writer.write(encode_frame(FrameKind.ABORT, request_id))
+
+    async def render(
+        self,
+        request: dict[str, Any],
+        props: RenderProps,
+        deferred: AsyncIterable[bytes] | None = None,
+    ) -> AsyncGenerator[bytes, None]:
+        request_id = next(self._request_ids)
+        queue: asyncio.Queue[tuple[FrameKind, bytes] | None] = asyncio.Queue(
+            MAX_QUEUED_FRAMES
+        )
+        self.requests[request_id] = queue
+        finished = False
+        sender: asyncio.Task[None] | None = None
+        try:
+            if not self.alive:
+                raise RenderError("Lost the connection to the render daemon")
+            await self.connection.send(
+                encode_json_frame(FrameKind.RENDER, request_id, request)
+            )
+            if not isinstance(props, (bytes, type(None))):
+                props = await props
+            await self.connection.send(
+                encode_frame(FrameKind.PROPS, request_id, props or b"")
+            )
+            if deferred is not None:
+                sender = asyncio.create_task(self._send_deferred(request_id, deferred))
+            while True:
+                frame = await queue.get()
+                if frame is None:
+                    raise RenderError("Lost the connection to the render daemon")
+                kind, payload = frame
+                if kind == FrameKind.CHUNK:
+                    yield payload
+                elif kind == FrameKind.END:
+                    finished = True
+                    return
+                elif kind == FrameKind.ERROR:
+                    finished = True
+                    raise RenderError(payload.decode("utf-8", errors="replace"))
+                else:
+                    raise ProtocolError(f"Unexpected frame from daemon: {kind.name}")
+        finally:
+            self.requests.pop(request_id, None)
+            if sender is not None:
+                sender.cancel()
+                await asyncio.gather(sender, return_exceptions=True)
+            if not finished and self.alive:
+                self.connection.writer.write(encode_frame(FrameKind.ABORT, request_id))
+
+    async def _send_deferred(
+        self, request_id: int, deferred: AsyncIterable[bytes]
+    ) -> None:
+        async for payload in deferred:
+            await self.connection.send(
+                encode_frame(FrameKind.DEFER, request_id, payload)
+            )
+
+    async def close(self) -> None:
+        self.connection.writer.close()
+        await asyncio.gather(self._reader_task, return_exceptions=True)
+
+
+class DaemonClient:
+    """Render through a render daemon, with the interface of `RenderPool`.
+
+    Keeps `connections` sockets open and spreads renders over them; the
+    daemon balances them over its Bun workers. Broken sockets are reopened on
+    the next render. Once connected, `size` is the daemon's worker count.
+    """
+
+    def __init__(
+        self,
+        project: SchorleProject,
+        socket_path: str | Path = DEFAULT_SOCKET_PATH,
+        connections: int = 2,
+    ) -> None:
+        self.project = project
+        self.socket_path = Path(socket_path)
+        self.connections = connections
+        self.size = connections
+        self._connections: list[_ClientConnection | None] | None = None
+        self._next = itertools.count()
+        self._connect_lock = asyncio.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._connections is not None
+
+    async def start(self) -> None:
+        if self._connections is not None:
+            return
+        self._connections = [await self._connect() for _ in range(self.connections)]
+        logger.info(f"Connected to the render daemon at {self.socket_path}")
+
+    async def stop(self) -> None:
+        connections, self._connections = self._connections or [], None
+        await asyncio.gather(
+            *(connection.close() for connection in connections if connection),
+            return_exceptions=True,
+        )
+
+    def recycle(self) -> None:
+        """Workers belong to the daemon, which is restarted to pick up a build."""
+
+    def stats(self) -> dict[str, Any]:
+        connections = self._connections or []
+        return {
+            "connections": sum(1 for c in connections if c is not None and c.alive),
+            "in_flight": sum(len(c.requests) for c in connections if c is not None),
+        }
+
+    @asynccontextmanager
+    async def lifespan(self, app):
+        await self.start()
+        try:
+            yield
+        finally:
+            await self.stop()
+
+    async def _connect(self) -> _ClientConnection:
+        reader, writer = await asyncio.open_unix_connection(str(self.socket_path))
+        kind, _, payload = await read_frame(reader)
+        if kind != FrameKind.READY:
+            writer.close()
+            raise ProtocolError(f"Expected READY frame from daemon, got {kind.name}")
+        if payload:
+            self.size = json.loads(payload)["workers"]
+        return _ClientConnection(reader, writer)
+
+    async def _connection(self) -> _ClientConnection:
+        if self._connections is None:
+            raise RuntimeError("Render daemon client is not running")
+        index = next(self._next) % len(self._connections)
+        connection = self._connections[index]
+        if connection is None or not connection.alive:
+            async with self._connect_lock:
+                connection = self._connections[index]
+                if connection is None or not connection.alive:
+                    connection = await self._connect()
+                    self._connections[index] = connection
+        return connection
+
+    async def render(
+        self,
+        server_js: Path,
+        render_request: dict[str, Any],
+        props: RenderProps,
+        page: str | None = None,
+        deferred: AsyncIterable[bytes] | None = None,
+    ) -> AsyncGenerator[bytes, None]:
+        connection = await self._connection()
+        request = {"server_js": str(server_js), "page": page, **render_request}
+        stream = connection.render(request, props, deferred)
+        try:
+            async for chunk in stream:
+                yield chunk
+        finally:
+            await stream.aclose()
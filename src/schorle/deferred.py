@@ -0,0 +1,101 @@
+"""
+Deferred props, delivered into a render after it started.
+
+`Schorle.render(page, props, deferred={"comments": load_comments()})` starts
+the render with `props` and sends every deferred value to the render worker
+as soon as it resolves. Pages read them with `useDeferredProp("comments")`
+inside a `<Suspense>` boundary, so the rest of the page streams without
+waiting for slow data. The worker also appends each value to the HTML as a
+hydration script.
+
+Async iterables are collected whole and sent as one list once exhausted,
+rather than streamed item by item into the render.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, AsyncGenerator, AsyncIterable, Awaitable, Mapping, Union
+
+import msgpack
+from pydantic import BaseModel
+
+from schorle.utils import keys_to_camel_case
+
+logger = logging.getLogger(__name__)
+
+# sent to the page in place of a failed value's exception
+DEFERRED_ERROR = "Failed to load deferred prop"
+
+# an async iterable is collected into a list
+Deferred = Mapping[str, Union[Awaitable[Any], AsyncIterable[Any]]]
+
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    return value
+
+
+def encode_deferred(name: str, value: Any = None, error: str | None = None) -> bytes:
+    """Encode a DEFER frame payload."""
+    if error is not None:
+        return msgpack.packb({"name": name, "error": error})
+    return msgpack.packb({"name": name, "value": keys_to_camel_case(_plain(value))})
+
+
+async def _resolve(value: Awaitable[Any] | AsyncIterable[Any]) -> Any:
+    if isinstance(value, AsyncIterable):
+        return [item async for item in value]
+    return await value
+
+
+class DeferredProps:
+    """The deferred props of one render, resolved concurrently."""
+
+    def __init__(self, values: Deferred) -> None:
+        self.values = dict(values)
+        self._tasks: dict[asyncio.Future[Any], str] | None = None
+
+    @property
+    def names(self) -> list[str]:
+        return list(self.values)
+
+    def start(self) -> None:
+        """Start resolving the values, if not done already."""
+        if self._tasks is None:
+            self._tasks = {
+                asyncio.ensure_future(_resolve(value)): name
+                for name, value in self.values.items()
+            }
+
+    def cancel(self) -> None:
+        for task in self._tasks or ():
+            task.cancel()
+
+    async def payloads(self) -> AsyncGenerator[bytes, None]:
+        """Yield the encoded values in the order they resolve.
+
+        A value that fails is sent as a generic error, raised by
+        `useDeferredProp` to the page's error boundary. The error ends up in
+        the public HTML, so its details are only logged.
+        """
+        self.start()
+        assert self._tasks is not None
+        pending = set(self._tasks)
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                name = self._tasks[task]
+                try:
+                    value = task.result()
+                except Exception:
+                    logger.exception(f"Deferred prop {name} failed")
+                    yield encode_deferred(name, error=DEFERRED_ERROR)
+                else:
+                    yield encode_deferred(name, value)
@@ -0,0 +1,190 @@
+"""
+Static export of a Schorle app.
+
+`slx export pkg.module:app --out dist/` runs the app's lifespan, so its render
+pool starts as it would under uvicorn, then requests every parameterless GET
+route (or the given paths) in-process through ASGI, several at once. Each
+HTML response is written as `<path>/index.html`, and the client build is
+copied next to the pages. The result can be served by any static file server.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import shutil
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterable, Mapping
+from urllib.parse import urlsplit
+
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+from starlette.types import Message
+
+from schorle.manifest import SchorleProject
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class ExportedPage:
+    path: str
+    status: int
+    file: Path | None = None  # None unless the response was a written HTML page
+
+
+@dataclass(frozen=True, slots=True)
+class ExportReport:
+    pages: list[ExportedPage]
+    seconds: float
+
+    @property
+    def written(self) -> list[ExportedPage]:
+        return [page for page in self.pages if page.file is not None]
+
+    @property
+    def failed(self) -> list[ExportedPage]:
+        return [page for page in self.pages if page.status >= 400]
+
+
+def export_paths(app: FastAPI) -> list[str]:
+    """The paths of the app's GET routes that take no path parameters."""
+    skipped = {app.openapi_url, app.docs_url, app.redoc_url}
+    paths = []
+    for route in app.routes:
+        if (
+            isinstance(route, APIRoute)
+            and "GET" in (route.methods or ())
+            and not route.param_convertors
+            and route.path not in skipped
+        ):
+            paths.append(route.path)
+    return paths
+
+
+def output_file(out: Path, path: str) -> Path:
+    """`/` is written to `index.html`, `/docs/intro` to `docs/intro/index.html`.
+
+    Shared by `slx export` and `slx render-many`, whose job names are paths
+    in the same tree; the leading slash is optional. Paths with a query
+    string are rejected, since a static server could not tell them apart
+    from the path without it, and so are paths leaving `out`.
+    """
+    url = urlsplit(path.replace("\\", "/"))
+    if url.query:
+        raise ValueError(f"Cannot export path with a query string: {path}")
+    parts = [part for part in url.path.split("/") if part]
+    if any(part in (".", "..") for part in parts):
+        raise ValueError(f"Cannot export path outside the output directory: {path}")
+    return out.joinpath(*parts, "index.html")
+
+
+async def request(
+    app: FastAPI, path: str, state: Mapping[str, Any] | None = None
+) -> tuple[int, dict[str, str], bytes]:
+    """Send a GET request for `path` through the app, in-process."""
+    url = urlsplit(path)
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": url.path or "/",
+        "raw_path": (url.path or "/").encode(),
+        "query_string": url.query.encode(),
+        "root_path": "",
+        "headers": [(b"host", b"localhost"), (b"accept", b"text/html")],
+        "client": ("127.0.0.1", 0),
+        "server": ("localhost", 80),
+        "state": dict(state or {}),
+    }
+    status = 500
+    headers: dict[str, str] = {}
+    body: list[bytes] = []
+    requested = False
+    finished = asyncio.Event()
+
+    async def receive() -> Message:
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # streaming responses listen for a disconnect until they are done
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: Message) -> None:
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            headers.update(
+                (key.decode("latin-1").lower(), value.decode("latin-1"))
+                for key, value in message.get("headers", [])
+            )
+        elif message["type"] == "http.response.body":
+            body.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                finished.set()
+
+    try:
+        await app(scope, receive, send)
+    except Exception:
+        # Starlette re-raises after sending its 500; keep exporting the rest
+        logger.exception(f"Export of {path} raised")
+        status = 500
+    finally:
+        finished.set()
+    return status, headers, b"".join(body)
+
+
+def _is_html(headers: dict[str, str], body: bytes) -> bool:
+    content_type = headers.get("content-type")
+    if content_type is not None:
+        return content_type.startswith("text/html")
+    # rendered pages are streamed without a content type
+    return body.lstrip()[:15].lower() == b"<!doctype html>"
+
+
+async def export_app(
+    app: FastAPI,
+    project: SchorleProject,
+    out: Path,
+    paths: Iterable[str] | None = None,
+    concurrency: int = 8,
+) -> ExportReport:
+    """Export the HTML responses of `paths` (default: `export_paths`) to `out`.
+
+    Responses that are not HTML, such as JSON API routes, are requested but
+    not written. A route raising an exception is reported as a 500 failure.
+    """
+    started = time.monotonic()
+    paths = list(paths) if paths is not None else export_paths(app)
+    for path in paths:
+        output_file(out, path)  # reject paths that cannot be written first
+    out.mkdir(parents=True, exist_ok=True)
+    slots = asyncio.Semaphore(concurrency)
+
+    async with app.router.lifespan_context(app) as state:
+
+        async def export(path: str) -> ExportedPage:
+            async with slots:
+                status, headers, body = await request(app, path, state)
+            if status != 200 or not _is_html(headers, body):
+                if status >= 400:
+                    logger.warning(f"Export of {path} failed with status {status}")
+                return ExportedPage(path, status)
+            file = output_file(out, path)
+            file.parent.mkdir(parents=True, exist_ok=True)
+            await asyncio.to_thread(file.write_bytes, body)
+            return ExportedPage(path, status, file)
+
+        pages = await asyncio.gather(*(export(path) for path in paths))
+
+    client_dist = project.dist_path / "client"
+    if client_dist.exists():
+        target = out / client_dist.relative_to(project.root_path)
+        shutil.copytree(client_dist, target, dirs_exist_ok=True)
+    return ExportReport(list(pages), time.monotonic() - started)
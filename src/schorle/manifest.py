@@ -4,9 +4,14 @@ from pathlib import Path
 import json
 import logging
 
+from typing import TYPE_CHECKING
+
 from tomlkit import parse
 from schorle.utils import templates_path
 
+if TYPE_CHECKING:
+    from schorle.registry import PageRegistry
+
 logger = logging.getLogger(__name__)
 
 
@@ -42,7 +47,12 @@ class SchorleProject(BaseModel):
     root_path: Path
     project_root: Path
     dev: bool | None = None
-    _page_infos: list[PageInfo] | None = None
+    _page_registry: PageRegistry | None = None
+    _manifest: BuildManifest | None = None
+    _manifest_index: dict[str, BuildManifestEntry] | None = None
+    _manifest_stamp: tuple[int, int, int] | None = None
+    _manifest_hits: int = 0
+    _manifest_misses: int = 0
 
     @property
     def schorle_dir(self) -> Path:
@@ -85,13 +95,35 @@ class SchorleProject(BaseModel):
     def default_orval_config_path(self) -> Path:
         return self.api_client_temp_path / "orval.config.ts"
 
+    def _stat_manifest(self) -> tuple[int, int, int]:
+        stat = self.manifest_path.stat()
+        return stat.st_mtime_ns, stat.st_ino, stat.st_size
+
     @property
     def manifest(self) -> BuildManifest:
-        """Read the manifest file fresh every time to avoid caching issues."""
+        """Return the build manifest, cached in memory.
+
+        The cached copy is revalidated against the file's mtime, inode and size.
+        In prod mode the manifest never changes after boot, so the cache is only
+        dropped through `invalidate_manifest_cache`.
+        """
+        return self._load_manifest()[0]
+
+    def _load_manifest(self) -> tuple[BuildManifest, dict[str, BuildManifestEntry]]:
+        if (
+            self._manifest is not None
+            and self._manifest_index is not None
+            and (self.dev is False or self._manifest_stamp == self._stat_manifest())
+        ):
+            self._manifest_hits += 1
+            return self._manifest, self._manifest_index
+
+        self._manifest_misses += 1
         if not self.manifest_path.exists():
             raise FileNotFoundError(f"Manifest file not found: {self.manifest_path}")
 
-        # Always read the file fresh to ensure we get the latest content
+        # stat before reading, a write racing with the read is caught on next access
+        stamp = self._stat_manifest()
         manifest_content = self.manifest_path.read_text()
         manifest = BuildManifest.model_validate_json(manifest_content)
 
@@ -106,7 +138,20 @@ class SchorleProject(BaseModel):
                 f"Read manifest from {self.manifest_path} - entries: {asset_info}"
             )
 
-        return manifest
+        self._manifest = manifest
+        self._manifest_index = {entry.page: entry for entry in manifest.entries}
+        self._manifest_stamp = stamp
+        return manifest, self._manifest_index
+
+    def invalidate_manifest_cache(self) -> None:
+        """Drop the cached manifest, e.g. after a rebuild."""
+        self._manifest = None
+        self._manifest_index = None
+        self._manifest_stamp = None
+
+    def manifest_cache_info(self) -> dict[str, int]:
+        """Return the manifest cache hit and miss counters."""
+        return {"hits": self._manifest_hits, "misses": self._manifest_misses}
 
     def collect_page_infos(self, require_manifest: bool = True) -> list[PageInfo]:
         """
@@ -129,7 +174,6 @@ class SchorleProject(BaseModel):
         manifest_lookup: dict[str, BuildManifestAssets] = {}
         if require_manifest:
             try:
-                # Always read the manifest fresh to avoid caching issues
                 manifest = self.manifest
                 for entry in manifest.entries:
                     manifest_lookup[entry.page] = entry.assets
@@ -170,9 +214,13 @@ class SchorleProject(BaseModel):
                     PageInfo(
                         page=tsx_file,
                         layouts=layouts,
-                        js=assets.js,
+                        # pages that do not hydrate have no client JS to load
+                        js=assets.js if assets.hydrate else None,
                         css=assets.css,
                         server_js=assets.server_js,
+                        chunks=assets.chunks,
+                        html=assets.html,
+                        html_gzip=assets.html_gzip,
                     )
                 )
             else:
@@ -196,18 +244,12 @@ class SchorleProject(BaseModel):
         return self.collect_page_infos(require_manifest=True)
 
     def get_manifest_entry(self, page_name: str) -> BuildManifestEntry | None:
-        """Get a manifest entry by page name (e.g., 'Index').
-
-        Always reads the manifest fresh to avoid caching issues between dev/prod modes.
-        """
+        """Get a manifest entry by page name (e.g., 'Index')."""
         try:
-            # Always read the manifest fresh to ensure we get the latest content
-            for entry in self.manifest.entries:
-                if entry.page == page_name:
-                    return entry
-            return None
+            _, index = self._load_manifest()
         except (FileNotFoundError, json.JSONDecodeError):
             return None
+        return index.get(page_name)
 
     def find_page_file(self, page_name: str) -> Path | None:
         """Find the actual page file by page name."""
@@ -241,37 +283,27 @@ class SchorleProject(BaseModel):
 
         return layouts
 
+    @property
+    def page_registry(self) -> PageRegistry:
+        """The compiled page registry, rebuilt whenever the manifest is reloaded."""
+        from schorle.registry import PageRegistry
+
+        try:
+            manifest: BuildManifest | None = self.manifest
+        except FileNotFoundError:
+            manifest = None
+        if self._page_registry is None or self._page_registry.manifest is not manifest:
+            self._page_registry = PageRegistry.build(self)
+        return self._page_registry
+
     def _invalidate_page_cache(self):
         """Invalidate cached page info to force fresh reads from the manifest."""
-        self._page_infos = None
+        self._page_registry = None
+        self.invalidate_manifest_cache()
 
     def resolve_page_info(self, page: Path) -> PageInfo:
         """Resolve a page path to its PageInfo, including assets and layouts."""
-        if self._page_infos is None:
-            self._page_infos = self.collect_page_infos()
-
-        # Normalize to project-relative pages path
-        if page.is_absolute():
-            try:
-                rel_to_project = page.relative_to(self.project_root)
-            except ValueError:
-                rel_to_project = page
-        else:
-            rel_to_project = page
-
-        # If not prefixed with pages/, assume it is relative to pages/
-        if rel_to_project.parts and rel_to_project.parts[0] == "pages":
-            candidate = Path(*rel_to_project.parts[1:])
-        else:
-            candidate = rel_to_project
-
-        # Match by filepath under pages (case-sensitive) ignoring extension
-        for info in self._page_infos or []:
-            rel = info.page.relative_to(self.pages_path)
-            if rel.with_suffix("") == candidate.with_suffix(""):
-                return info
-
-        raise FileNotFoundError(f"Page not found: {page}")
+        return self.page_registry.resolve(page).to_page_info()
 
 
 class PageInfo(BaseModel):
@@ -280,6 +312,11 @@ class PageInfo(BaseModel):
     js: str | None = None
     css: str | None = None
     server_js: str | None = None
+    # client chunks statically imported by `js`, preloaded with it
+    chunks: list[str] = []
+    # document prerendered at build time, and its gzip-compressed copy
+    html: str | None = None
+    html_gzip: str | None = None
 
     def __str__(self):
         layout_str = " -> ".join(
@@ -294,6 +331,12 @@ class BuildManifestAssets(BaseModel):
     js: str
     css: str | None = None
     server_js: str | None = None
+    chunks: list[str] = []
+    html: str | None = None
+    html_gzip: str | None = None
+    # False for pages exporting `hydrate = false`: `js` is only built for
+    # their CSS and never sent to the browser
+    hydrate: bool = True
 
 
 class BuildManifestEntry(BaseModel):
@@ -305,3 +348,5 @@ class BuildManifestEntry(BaseModel):
 class BuildManifest(BaseModel):
     entries: list[BuildManifestEntry]
     mode: str
+    # client entries hydrating the `"use island"` components, by island id
+    islands: dict[str, str] = {}
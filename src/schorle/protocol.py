@@ -0,0 +1,60 @@
+"""
+Framed IPC protocol spoken between Python and long-lived Bun render workers.
+
+Every message is a frame with a fixed 9-byte header followed by the payload:
+
+    kind (uint8) | request id (uint32, big endian) | payload length (uint32, big endian)
+
+The matching TypeScript implementation lives in `packages/server/src/protocol.ts`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import struct
+from enum import IntEnum
+from typing import Any
+
+HEADER = struct.Struct(">BII")
+
+# Request id used for worker-level frames that are not bound to a render
+WORKER_FRAME_ID = 0
+
+
+class FrameKind(IntEnum):
+    # Python -> Bun
+    RENDER = 1  # JSON render request (server_js, js, css, headers, cookies)
+    PROPS = 2  # msgpack props bytes, may be empty; starts the render
+    ABORT = 3  # the client is gone, stop the render and drop its output
+    PRELOAD = 4  # JSON list of server bundles to import ahead of renders
+    DEFER = 5  # msgpack {name, value} or {name, error} of a deferred prop
+    # Bun -> Python
+    CHUNK = 16  # a piece of the streamed HTML
+    END = 17  # render finished successfully, payload is JSON worker stats
+    ERROR = 18  # render failed, payload is a utf-8 error message
+    READY = 19  # worker is up and accepts requests
+    PRELOADED = 20  # PRELOAD done, payload is JSON worker stats
+
+
+class ProtocolError(RuntimeError):
+    """Raised when the peer sends a malformed or unexpected frame."""
+
+
+def encode_frame(kind: FrameKind, request_id: int, payload: bytes = b"") -> bytes:
+    return HEADER.pack(kind, request_id, len(payload)) + payload
+
+
+def encode_json_frame(kind: FrameKind, request_id: int, payload: Any) -> bytes:
+    return encode_frame(kind, request_id, json.dumps(payload).encode("utf-8"))
+
+
+async def read_frame(reader: asyncio.StreamReader) -> tuple[FrameKind, int, bytes]:
+    """Read a single frame, raising `asyncio.IncompleteReadError` on EOF."""
+    header = await reader.readexactly(HEADER.size)
+    kind, request_id, length = HEADER.unpack(header)
+    payload = await reader.readexactly(length) if length else b""
+    try:
+        return FrameKind(kind), request_id, payload
+    except ValueError:
+        raise ProtocolError(f"Unknown frame kind: {kind}") from None
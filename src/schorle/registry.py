@@ -0,0 +1,173 @@
+"""
+Compiled page registry.
+
+Resolving a page at request time used to glob the pages tree, probe candidate
+files and build fresh `PageInfo` models. The registry does that work once per
+manifest and maps page names, relative paths and page files to immutable
+records holding everything a render needs.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Iterator
+
+from schorle.manifest import BuildManifest, PageInfo
+from schorle.page_system import PageReference
+
+if TYPE_CHECKING:
+    from schorle.manifest import SchorleProject
+
+
+def built_file(project: SchorleProject, url: str | None) -> Path | None:
+    """The local path of a build artifact URL like `/.schorle/dist/...`, if it exists."""
+    if not url:
+        return None
+    candidate = project.root_path / url.lstrip("/")
+    return candidate if candidate.exists() else None
+
+
+@dataclass(frozen=True, slots=True)
+class PageRecord:
+    """Everything needed to render a page, resolved at registry build time."""
+
+    name: str  # manifest page name, e.g. "Index"
+    key: str  # path under pages/ without suffix, e.g. "dashboard/About"
+    page: Path
+    layouts: tuple[Path, ...]
+    js: str | None
+    css: str | None
+    server_js: str | None
+    server_js_path: Path | None  # absolute path of the server bundle, if built
+    chunks: tuple[str, ...] = ()  # client chunks statically imported by js
+    html: str | None = None  # document prerendered at build time
+    html_path: Path | None = None
+    html_gzip: str | None = None
+    html_gzip_path: Path | None = None
+    # hydrators of the islands a page without client JS may contain, by id
+    islands: tuple[tuple[str, str], ...] = ()
+
+    @property
+    def prerendered(self) -> bool:
+        return self.html_path is not None
+
+    def to_page_info(self) -> PageInfo:
+        return PageInfo(
+            page=self.page,
+            layouts=list(self.layouts),
+            js=self.js,
+            css=self.css,
+            server_js=self.server_js,
+            chunks=list(self.chunks),
+            html=self.html,
+            html_gzip=self.html_gzip,
+        )
+
+
+class PageRegistry:
+    """Lookup tables from page names, relative paths and files to `PageRecord`s."""
+
+    def __init__(
+        self,
+        project: SchorleProject,
+        records: Iterable[PageRecord],
+        manifest: BuildManifest | None = None,
+    ) -> None:
+        self.project = project
+        self.manifest = manifest
+        self._by_key: dict[str, PageRecord] = {}
+        self._by_file: dict[Path, PageRecord] = {}
+        named: dict[str, list[PageRecord]] = {}
+        for record in records:
+            self._by_key[record.key] = record
+            self._by_file[record.page] = record
+            named.setdefault(record.name, []).append(record)
+        self._by_name = {
+            name: found[0] for name, found in named.items() if len(found) == 1
+        }
+        # names shared by several pages, which only resolve by their key
+        self._ambiguous = {
+            name: sorted(record.key for record in found)
+            for name, found in named.items()
+            if len(found) > 1
+        }
+
+    @classmethod
+    def build(cls, project: SchorleProject) -> PageRegistry:
+        """Compile the registry from the pages tree and the current manifest."""
+        try:
+            manifest: BuildManifest | None = project.manifest
+        except FileNotFoundError:
+            manifest = None
+
+        islands = tuple(manifest.islands.items()) if manifest is not None else ()
+        records = []
+        for info in project.collect_page_infos():
+            records.append(
+                PageRecord(
+                    name=info.page.stem,
+                    key=info.page.relative_to(project.pages_path)
+                    .with_suffix("")
+                    .as_posix(),
+                    page=info.page,
+                    layouts=tuple(info.layouts),
+                    js=info.js,
+                    css=info.css,
+                    server_js=info.server_js,
+                    server_js_path=built_file(project, info.server_js),
+                    chunks=tuple(info.chunks),
+                    html=info.html,
+                    html_path=built_file(project, info.html),
+                    html_gzip=info.html_gzip,
+                    html_gzip_path=built_file(project, info.html_gzip),
+                    islands=islands if info.js is None else (),
+                )
+            )
+        return cls(project, records, manifest)
+
+    def __len__(self) -> int:
+        return len(self._by_key)
+
+    def __iter__(self) -> Iterator[PageRecord]:
+        return iter(self._by_key.values())
+
+    def get(self, name: str) -> PageRecord | None:
+        """Look up a page by its path under pages/ or by manifest name.
+
+        Raises `ValueError` for a name shared by several pages, e.g.
+        `dashboard/Index` and `admin/Index`, which need their full key.
+        """
+        record = (
+            self._by_key.get(name)
+            or self._by_name.get(name)
+            or self._by_key.get(f"{name}/index")
+        )
+        if record is None and name in self._ambiguous:
+            keys = ", ".join(self._ambiguous[name])
+            raise ValueError(f"Page name {name} is ambiguous, use one of: {keys}")
+        return record
+
+    def resolve(self, page: str | Path | PageReference) -> PageRecord:
+        """Resolve a page name, a path (relative to pages/ or absolute) or a reference."""
+        if isinstance(page, str):
+            record = self.get(page)
+        elif isinstance(page, PageReference):
+            record = self._by_file.get(page.page_path)
+        else:
+            record = self._by_file.get(page) or self._by_key.get(self._key_for(page))
+        if record is None:
+            raise FileNotFoundError(f"Page not found: {page}")
+        return record
+
+    def _key_for(self, page: Path) -> str:
+        # Normalize to project-relative pages path
+        if page.is_absolute():
+            try:
+                page = page.relative_to(self.project.project_root)
+            except ValueError:
+                pass
+        # If not prefixed with pages/, assume it is relative to pages/
+        if page.parts and page.parts[0] == "pages":
+            page = Path(*page.parts[1:])
+        return page.with_suffix("").as_posix()
@@ -1,20 +1,41 @@
+import asyncio
 import base64
+import itertools
 import json
 import logging
 import os
 import subprocess
 from pathlib import Path
 import time
-from typing import IO, Generator, Union
+from typing import (
+    IO,
+    Any,
+    AsyncGenerator,
+    AsyncIterable,
+    Callable,
+    Generator,
+    Union,
+)
 
 from fastapi.datastructures import Headers
 from pydantic import BaseModel
 
+from schorle.daemon import DaemonClient
+from schorle.deferred import DeferredProps
 from schorle.manifest import SchorleProject
 from schorle.manifest import PageInfo
+from schorle.registry import PageRecord, built_file
+from schorle.render_pool import RenderError, RenderPool, RenderProps
+from schorle.streaming import ainject_head, build_head_injection, inject_head
+from schorle.worker_logs import StderrLogger, drain_file, drain_stream
 
 logger = logging.getLogger(__name__)
 
+RENDER_COMMAND = ("bun", "run", "slx-ipc", "render")
+
+# ids of one-shot renders, attached to the stderr lines they log
+_request_ids = itertools.count(1)
+
 
 def _compute_import_uris(
     project: SchorleProject, page_info: PageInfo
@@ -29,100 +50,58 @@ def _compute_import_uris(
 
 
 def _resolve_page_info(project: SchorleProject, page: Path) -> PageInfo:
-    """Resolve a `Path` to a `PageInfo` by scanning the prepared manifest mapping.
-
-    Always reads the manifest fresh to avoid caching issues between dev/prod modes.
-    """
-    # Always get fresh page infos to ensure we have the latest manifest data
-    page_infos = project.collect_page_infos()
-
-    if page.is_absolute():
-        try:
-            rel_to_project = page.relative_to(project.project_root)
-        except ValueError:
-            rel_to_project = page
-    else:
-        rel_to_project = page
-
-    # If not prefixed with pages/, assume it is relative to pages/
-    if rel_to_project.parts and rel_to_project.parts[0] == "pages":
-        candidate = Path(*rel_to_project.parts[1:])
-    else:
-        candidate = rel_to_project
-
-    for info in page_infos:
-        rel = info.page.relative_to(project.pages_path)
-        if rel.with_suffix("") == candidate.with_suffix(""):
-            return info
-
-    raise FileNotFoundError(f"Page not found: {page}")
+    """Resolve a `Path` to a `PageInfo` through the compiled page registry."""
+    return project.page_registry.resolve(page).to_page_info()
+
+
+def _record_from_page_info(project: SchorleProject, page_info: PageInfo) -> PageRecord:
+    return PageRecord(
+        name=page_info.page.stem,
+        key=page_info.page.with_suffix("").as_posix(),
+        page=page_info.page,
+        layouts=tuple(page_info.layouts),
+        js=page_info.js,
+        css=page_info.css,
+        server_js=page_info.server_js,
+        # server_js format: "/.schorle/dist/server/pages/Index/hash.js"
+        server_js_path=built_file(project, page_info.server_js),
+        chunks=tuple(page_info.chunks),
+        html=page_info.html,
+        html_path=built_file(project, page_info.html),
+        html_gzip=page_info.html_gzip,
+        html_gzip_path=built_file(project, page_info.html_gzip),
+    )
 
 
-def render(
+def _prepare_render(
     project: SchorleProject,
-    page: Union[str, Path, PageInfo],
-    props: bytes | None = None,
+    page: Union[str, Path, PageInfo, PageRecord],
     headers: Headers | BaseModel | None = None,
     cookies: dict[str, str] | BaseModel | None = None,
-) -> Generator[bytes, None, None]:
-    """Render a built page using precomputed PageInfo (with js/css URLs).
-
-    Args:
-        project: The Schorle project
-        page: Page to render - can be:
-            - str: Page name (e.g., "Index" for Index.tsx) - uses BuildManifest
-            - Path: Path to page file - uses legacy path resolution
-            - PageInfo: Pre-computed page info object
-        props: Optional props to pass to the page
+) -> tuple[PageRecord, Path, dict[str, Any]]:
+    """Resolve the page and build the render request shared by all render paths.
 
     Returns:
-        Generator yielding rendered page bytes
+        The page record, the local server bundle path and the render request
     """
-    start_time = time.time()
-
     # Handle different input types
-    if isinstance(page, PageInfo):
-        page_info = page
-    elif isinstance(page, str):
-        # String page name - use BuildManifest approach (preferred)
-        manifest_entry = project.get_manifest_entry(page)
-        if manifest_entry is None:
-            raise FileNotFoundError(f"Page not found in manifest: {page}")
-
-        # Debug logging to track what assets are being used for rendering
-        logger.debug(
-            f"Rendering page '{page}' with assets: js={manifest_entry.assets.js}, css={manifest_entry.assets.css}"
-        )
-
-        page_file = project.find_page_file(page)
-        if page_file is None:
-            raise FileNotFoundError(f"Page file not found: {page}")
-
-        layouts = project.get_page_layouts(page_file)
-
-        # Create a PageInfo object
-        page_info = PageInfo(
-            page=page_file,
-            layouts=layouts,
-            js=manifest_entry.assets.js,
-            css=manifest_entry.assets.css,
-            server_js=manifest_entry.assets.server_js,
-        )
+    if isinstance(page, PageRecord):
+        record = page
+    elif isinstance(page, PageInfo):
+        record = _record_from_page_info(project, page)
     else:
-        # Path - use legacy path resolution
-        page_info = _resolve_page_info(project, page)
+        # Page name or path - use the compiled page registry
+        record = project.page_registry.resolve(page)
 
     # Check if we have a built server JS file
-    if not page_info.server_js:
-        raise RuntimeError(f"No server-side build available for page: {page_info.page}")
-
-    # Convert server_js URL to local file path
-    # server_js format: "/.schorle/dist/server/pages/Index/hash.js"
-    server_js_path = page_info.server_js.lstrip("/")  # Remove leading /
-    server_js_file = project.root_path / server_js_path
+    if not record.server_js:
+        raise RuntimeError(f"No server-side build available for page: {record.page}")
 
-    if not server_js_file.exists():
-        raise FileNotFoundError(f"Server JS file not found: {server_js_file}")
+    server_js_file = record.server_js_path
+    if server_js_file is None:
+        raise FileNotFoundError(
+            f"Server JS file not found: {project.root_path / record.server_js.lstrip('/')}"
+        )
 
     # convert headers and cookies to dicts
     _headers = {}
@@ -142,19 +121,83 @@ def render(
     render_request = {
         "headers": _headers if _headers else None,
         "cookies": _cookies if _cookies else None,
-        "js": page_info.js or "",
-        "css": page_info.css or "",
+        "js": record.js or "",
+        "css": record.css or "",
     }
+    return record, server_js_file, render_request
+
+
+async def _with_head(
+    start: Callable[[RenderProps], AsyncIterable[bytes]],
+    render_request: dict[str, Any],
+    props: RenderProps,
+    islands: tuple[tuple[str, str], ...] = (),
+) -> AsyncGenerator[bytes, None]:
+    """Inject the head into the render started by `start(props)`.
+
+    Awaitable props are wrapped in a future once the render is iterated, since
+    both the render and the injection await them. A future created here is
+    cancelled if the render ends before the props resolved.
+    """
+    if isinstance(props, (bytes, type(None))):
+        injection = build_head_injection(render_request, props, islands)
+        injected = ainject_head(start(props), injection)
+        future = None
+    else:
+        future = asyncio.ensure_future(props)
+
+        async def load_injection() -> bytes:
+            return build_head_injection(render_request, await future, islands)
+
+        injected = ainject_head(start(future), load_injection())
+    try:
+        async for chunk in injected:
+            yield chunk
+    finally:
+        await injected.aclose()
+        if future is not None and future is not props:
+            future.cancel()
+
+
+async def _read_chunks(stream: asyncio.StreamReader) -> AsyncGenerator[bytes, None]:
+    while chunk := await stream.read(65536):
+        yield chunk
+
+
+def render(
+    project: SchorleProject,
+    page: Union[str, Path, PageInfo, PageRecord],
+    props: bytes | None = None,
+    headers: Headers | BaseModel | None = None,
+    cookies: dict[str, str] | BaseModel | None = None,
+    command: tuple[str, ...] = RENDER_COMMAND,
+) -> Generator[bytes, None, None]:
+    """Render a built page using precomputed PageInfo (with js/css URLs).
+
+    Spawns a one-shot Bun process for the render and reads it synchronously.
+    Inside an event loop prefer `render_async`, or `render_pooled` which
+    reuses warm render workers.
+
+    Args:
+        project: The Schorle project
+        page: Page to render - can be:
+            - str: Page name (e.g., "Index" for Index.tsx) - uses the page registry
+            - Path: Path to page file - uses the page registry
+            - PageInfo: Pre-computed page info object
+            - PageRecord: Record from the compiled page registry
+        props: Optional props to pass to the page
+
+    Returns:
+        Generator yielding rendered page bytes
+    """
+    start_time = time.time()
+
+    record, server_js_file, render_request = _prepare_render(
+        project, page, headers, cookies
+    )
 
     # Execute bun command to run the built server module
-    full_cmd = [
-        "bun",
-        "run",
-        "slx-ipc",
-        "render",
-        str(server_js_file),
-        json.dumps(render_request),
-    ]
+    full_cmd = [*command, str(server_js_file), json.dumps(render_request)]
 
     base_env = os.environ.copy()
     base_env["NODE_ENV"] = "development" if project.dev else "production"
@@ -168,8 +211,14 @@ def render(
         env=base_env,
     )
 
-    if completed.stdout is None:
-        raise RuntimeError("Failed to render: stdout is None")
+    if completed.stdout is None or completed.stderr is None:
+        raise RuntimeError("Failed to render: stdout or stderr is None")
+
+    request_id = str(next(_request_ids))
+    drain_file(
+        completed.stderr,
+        StderrLogger(lambda: (record.key, request_id), pid=completed.pid),
+    )
 
     # Stream props (if provided) into the bun process via stdin
     if completed.stdin is None:
@@ -184,33 +233,137 @@ def render(
     else:
         completed.stdin.close()
 
-    # transform stream by decoding it and injecting CSS before </head>
-    def injector(stream: IO[bytes]) -> Generator[bytes, None, None]:
-        for line in stream:
-            decoded = line.decode("utf-8")
-            injection = ""
+    # read whatever is available instead of waiting for newlines,
+    # React's stream has almost none
+    def read_chunks(stream: IO[bytes]) -> Generator[bytes, None, None]:
+        fd = stream.fileno()
+        try:
+            while chunk := os.read(fd, 65536):
+                yield chunk
+        finally:
+            stream.close()
+            # reap the process, killing it if the reader gave up early
+            if completed.poll() is None:
+                completed.kill()
+            completed.wait()
+
+    end_time = time.time()
+    logger.debug(f"Rendered page {record.page} in {(end_time - start_time) * 1000}ms")
+
+    injection = build_head_injection(render_request, props, record.islands)
+    return inject_head(read_chunks(completed.stdout), injection)
 
-            if render_request["css"]:
-                injection += (
-                    f"<link rel='stylesheet' href='{render_request['css']}' />\n"
+
+def render_async(
+    project: SchorleProject,
+    page: Union[str, Path, PageInfo, PageRecord],
+    props: RenderProps = None,
+    headers: Headers | BaseModel | None = None,
+    cookies: dict[str, str] | BaseModel | None = None,
+    command: tuple[str, ...] = RENDER_COMMAND,
+    deferred: DeferredProps | None = None,
+) -> AsyncGenerator[bytes, None]:
+    """Render a built page in a one-shot Bun process using asyncio streams.
+
+    Accepts the same arguments as `render`. The page is resolved eagerly, the
+    process is spawned once the returned generator is first iterated, and it
+    is killed if the generator is closed before the render finished. `props`
+    may be an awaitable, which is awaited once the process is spawned.
+    `deferred` props cannot reach a one-shot process after it started, so
+    they are all resolved before it is spawned.
+
+    Returns:
+        Async generator yielding rendered page bytes
+    """
+    record, server_js_file, render_request = _prepare_render(
+        project, page, headers, cookies
+    )
+
+    base_env = os.environ.copy()
+    base_env["NODE_ENV"] = "development" if project.dev else "production"
+
+    async def stream(props: RenderProps) -> AsyncGenerator[bytes, None]:
+        start_time = time.time()
+        if deferred is not None:
+            render_request["deferred"] = deferred.names
+            render_request["deferred_values"] = [
+                base64.b64encode(payload).decode("ascii")
+                async for payload in deferred.payloads()
+            ]
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            str(server_js_file),
+            json.dumps(render_request),
+            cwd=str(project.root_path),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=base_env,
+        )
+        assert process.stdin is not None and process.stdout is not None
+        assert process.stderr is not None
+        request_id = str(next(_request_ids))
+        stderr_task = asyncio.create_task(
+            drain_stream(
+                process.stderr,
+                StderrLogger(lambda: (record.key, request_id), pid=process.pid),
+            )
+        )
+        try:
+            _props = props if isinstance(props, (bytes, type(None))) else await props
+            if _props is not None:
+                process.stdin.write(_props)
+                await process.stdin.drain()
+            process.stdin.close()
+
+            async for chunk in _read_chunks(process.stdout):
+                yield chunk
+
+            if await process.wait() != 0:
+                raise RenderError(
+                    f"Render of {record.page} failed with exit code {process.returncode}"
                 )
+        finally:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            await stderr_task
+
+        logger.debug(
+            f"Rendered page {record.page} in {(time.time() - start_time) * 1000}ms"
+        )
 
-            if props:
-                props_b64 = base64.b64encode(props).decode("utf-8")
-                injection += f"<script id='__SCHORLE_PROPS__' type='application/msgpack'>{props_b64}</script>\n"
+    return _with_head(stream, render_request, props, record.islands)
 
-            if render_request["headers"]:
-                injection += f"<script id='__SCHORLE_HEADERS__' type='application/json'>{json.dumps(render_request['headers'])}</script>\n"
 
-            if render_request["cookies"]:
-                injection += f"<script id='__SCHORLE_COOKIES__' type='application/json'>{json.dumps(render_request['cookies'])}</script>\n"
+def render_pooled(
+    pool: RenderPool | DaemonClient,
+    project: SchorleProject,
+    page: Union[str, Path, PageInfo, PageRecord],
+    props: RenderProps = None,
+    headers: Headers | BaseModel | None = None,
+    cookies: dict[str, str] | BaseModel | None = None,
+    deferred: DeferredProps | None = None,
+) -> AsyncGenerator[bytes, None]:
+    """Render a built page on a warm worker from the render pool.
 
-            injected = decoded.replace("</head>", f"{injection}</head>")
-            yield injected.encode("utf-8")
+    Accepts the same arguments as `render`, but streams the HTML from a
+    long-lived Bun worker instead of spawning a process per render. Awaitable
+    `props` resolve while a worker is acquired and loads the page's bundle.
+    `deferred` props are sent to the worker as they resolve.
 
-    end_time = time.time()
-    logger.debug(
-        f"Rendered page {page_info.page} in {(end_time - start_time) * 1000}ms"
+    Returns:
+        Async generator yielding rendered page bytes
+    """
+    record, server_js_file, render_request = _prepare_render(
+        project, page, headers, cookies
     )
 
-    return injector(completed.stdout)
+    if deferred is not None:
+        render_request["deferred"] = deferred.names
+
+    def start(props: RenderProps) -> AsyncGenerator[bytes, None]:
+        payloads = deferred.payloads() if deferred is not None else None
+        return pool.render(server_js_file, render_request, props, record.key, payloads)
+
+    return _with_head(start, render_request, props, record.islands)
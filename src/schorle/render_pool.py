@@ -0,0 +1,493 @@
+"""
+Pool of long-lived Bun render workers.
+
+Every worker is a `slx-ipc worker` process that imports server bundles once and
+serves many renders over the framed protocol defined in `schorle.protocol`,
+streaming the HTML back chunk by chunk. Worker stderr is drained into
+`logging` and attributed to the render in progress.
+
+The pool supervises its workers: they import every server bundle of the
+manifest before taking traffic, are replaced after `max_renders` renders, when
+their RSS passes `max_rss` or when they crash, and finish in-flight renders on
+shutdown.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import (
+    Any,
+    AsyncGenerator,
+    AsyncIterable,
+    Awaitable,
+    Optional,
+    Sequence,
+    Union,
+)
+
+from schorle.manifest import SchorleProject
+from schorle.protocol import (
+    WORKER_FRAME_ID,
+    FrameKind,
+    ProtocolError,
+    encode_frame,
+    encode_json_frame,
+    read_frame,
+)
+from schorle.worker_logs import StderrLogger, drain_stream
+
+logger = logging.getLogger(__name__)
+
+WORKER_COMMAND = ("bun", "run", "slx-ipc", "worker")
+
+# Props of a render: msgpack bytes, or an awaitable resolving to them while the
+# render request is already on its way. Must be awaitable more than once, e.g.
+# a future, since a crashed render is retried.
+RenderProps = Union[bytes, None, Awaitable[Optional[bytes]]]
+DEFAULT_POOL_SIZE = min(4, os.cpu_count() or 1)
+
+
+class RenderError(RuntimeError):
+    """Raised when a render worker fails to render a page."""
+
+
+class WorkerCrashed(RenderError):
+    """Raised when a render worker exits in the middle of a render."""
+
+
+class RenderWorker:
+    """A single long-lived Bun process serving renders one at a time."""
+
+    def __init__(
+        self,
+        project: SchorleProject,
+        generation: int = 0,
+        command: tuple[str, ...] = WORKER_COMMAND,
+    ) -> None:
+        self.project = project
+        self.generation = generation
+        self.command = command
+        self._process: asyncio.subprocess.Process | None = None
+        self._request_ids = itertools.count(1)
+        self._stderr_task: asyncio.Task | None = None
+        # page and request id of the render in progress, for stderr lines
+        self._current: tuple[str | None, str | None] = (None, None)
+        self.started_at: float | None = None
+        self.renders = 0
+        self.rss: int | None = None  # as last reported by the worker
+
+    @property
+    def pid(self) -> int | None:
+        return self._process.pid if self._process is not None else None
+
+    @property
+    def alive(self) -> bool:
+        return self._process is not None and self._process.returncode is None
+
+    @property
+    def age(self) -> float:
+        return 0.0 if self.started_at is None else time.monotonic() - self.started_at
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "pid": self.pid,
+            "generation": self.generation,
+            "age": self.age,
+            "renders": self.renders,
+            "rss": self.rss,
+        }
+
+    def _record_stats(self, payload: bytes) -> dict[str, Any]:
+        if not payload:
+            return {}
+        stats = json.loads(payload)
+        self.rss = stats.get("rss", self.rss)
+        return stats
+
+    async def start(self, preload: Sequence[Path] = ()) -> None:
+        """Spawn the worker and import the `preload` bundles before returning."""
+        env = os.environ.copy()
+        env["NODE_ENV"] = "development" if self.project.dev else "production"
+        self._process = await asyncio.create_subprocess_exec(
+            *self.command,
+            cwd=str(self.project.root_path),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=env,
+        )
+        assert self._process.stdout is not None and self._process.stderr is not None
+        self._stderr_task = asyncio.create_task(
+            drain_stream(
+                self._process.stderr,
+                StderrLogger(lambda: self._current, pid=self._process.pid),
+            )
+        )
+        try:
+            kind, _, _ = await read_frame(self._process.stdout)
+        except asyncio.IncompleteReadError:
+            await self.stop()
+            raise RenderError("Render worker exited during startup") from None
+        if kind != FrameKind.READY:
+            await self.stop()
+            raise ProtocolError(f"Expected READY frame from worker, got {kind.name}")
+        if preload:
+            await self._preload(preload)
+        self.started_at = time.monotonic()
+
+    async def _preload(self, server_js_paths: Sequence[Path]) -> None:
+        process = self._process
+        assert process is not None
+        assert process.stdin is not None and process.stdout is not None
+        process.stdin.write(
+            encode_json_frame(
+                FrameKind.PRELOAD,
+                WORKER_FRAME_ID,
+                [str(path) for path in server_js_paths],
+            )
+        )
+        await process.stdin.drain()
+        try:
+            kind, _, payload = await read_frame(process.stdout)
+        except asyncio.IncompleteReadError:
+            await self.stop()
+            raise RenderError("Render worker exited while preloading") from None
+        if kind != FrameKind.PRELOADED:
+            await self.stop()
+            raise ProtocolError(f"Expected PRELOADED frame, got {kind.name}")
+        stats = self._record_stats(payload)
+        logger.debug(
+            f"Render worker {self.pid} preloaded {len(server_js_paths)} bundles"
+            f" ({stats.get('failed', 0)} failed)"
+        )
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """Close stdin so the worker exits after in-flight renders, kill it on timeout."""
+        if self._process is None:
+            return
+        if self._process.stdin is not None:
+            self._process.stdin.close()
+        if self._process.returncode is None:
+            try:
+                await asyncio.wait_for(self._process.wait(), timeout)
+            except asyncio.TimeoutError:
+                self._process.kill()
+                await self._process.wait()
+        if self._stderr_task is not None:
+            await self._stderr_task
+            self._stderr_task = None
+
+    async def render(
+        self,
+        server_js: Path,
+        render_request: dict[str, Any],
+        props: RenderProps,
+        page: str | None = None,
+        deferred: AsyncIterable[bytes] | None = None,
+    ) -> AsyncGenerator[bytes, None]:
+        """Send a render request and yield the HTML chunks as they arrive.
+
+        The request is sent right away, so the worker can load the page's
+        bundle while awaitable `props` are still resolving. Payloads from
+        `deferred` are sent as DEFER frames while the render runs.
+        """
+        process = self._process
+        if process is None or process.stdin is None or process.stdout is None:
+            raise RenderError("Render worker is not running")
+
+        request_id = next(self._request_ids)
+        self.renders += 1
+        self._current = (page or server_js.stem, f"{process.pid}-{request_id}")
+        request = {"server_js": str(server_js), **render_request}
+        process.stdin.write(encode_json_frame(FrameKind.RENDER, request_id, request))
+
+        finished = False
+        sender: asyncio.Task[None] | None = None
+        try:
+            if not isinstance(props, (bytes, type(None))):
+                await process.stdin.drain()
+                props = await props
+            process.stdin.write(encode_frame(FrameKind.PROPS, request_id, props or b""))
+            await process.stdin.drain()
+            if deferred is not None:
+                sender = asyncio.create_task(
+                    self._send_deferred(process.stdin, request_id, deferred)
+                )
+            while True:
+                try:
+                    kind, frame_id, payload = await read_frame(process.stdout)
+                except asyncio.IncompleteReadError:
+                    # reap it, so the pool sees the worker as dead
+                    await process.wait()
+                    raise WorkerCrashed(
+                        f"Render worker {self.pid} exited while rendering {server_js}"
+                    ) from None
+                # Frames of a previously abandoned render are skipped
+                if frame_id != request_id:
+                    continue
+                if kind == FrameKind.CHUNK:
+                    yield payload
+                elif kind == FrameKind.END:
+                    finished = True
+                    self._record_stats(payload)
+                    return
+                elif kind == FrameKind.ERROR:
+                    finished = True
+                    raise RenderError(payload.decode("utf-8", errors="replace"))
+                else:
+                    raise ProtocolError(f"Unexpected frame from worker: {kind.name}")
+        finally:
+            if sender is not None:
+                sender.cancel()
+                await asyncio.gather(sender, return_exceptions=True)
+            if not finished and self.alive and not process.stdin.is_closing():
+                # the consumer went away: stop the render instead of finishing it
+                process.stdin.write(encode_frame(FrameKind.ABORT, request_id))
+
+    async def _send_deferred(
+        self,
+        stdin: asyncio.StreamWriter,
+        request_id: int,
+        deferred: AsyncIterable[bytes],
+    ) -> None:
+        async for payload in deferred:
+            if stdin.is_closing():
+                return
+            stdin.write(encode_frame(FrameKind.DEFER, request_id, payload))
+            await stdin.drain()
+
+
+class RenderPool:
+    """A fixed-size pool of warm render workers.
+
+    Start it with `start()` or through `lifespan`, which `Schorle.mount` merges
+    into the FastAPI lifespan.
+
+    Args:
+        project: The Schorle project
+        size: Number of workers, defaults to `DEFAULT_POOL_SIZE`
+        command: Command starting a worker
+        max_renders: Replace a worker after this many renders
+        max_rss: Replace a worker once its resident memory exceeds this many bytes
+        drain_timeout: Seconds `stop()` waits for in-flight renders to finish
+    """
+
+    def __init__(
+        self,
+        project: SchorleProject,
+        size: int | None = None,
+        command: tuple[str, ...] = WORKER_COMMAND,
+        max_renders: int | None = 1000,
+        max_rss: int | None = None,
+        drain_timeout: float = 10.0,
+    ) -> None:
+        self.project = project
+        self.size = size or DEFAULT_POOL_SIZE
+        self.command = command
+        self.max_renders = max_renders
+        self.max_rss = max_rss
+        self.drain_timeout = drain_timeout
+        # `None` entries wake renders waiting for a worker when the pool stops
+        self._idle: asyncio.Queue[RenderWorker | None] | None = None
+        self._waiting = 0
+        self._workers: set[RenderWorker] = set()
+        self._retiring: set[asyncio.Task] = set()
+        self._generation = 0
+        self._busy = 0
+        self._drained = asyncio.Event()
+        self._recycled = 0
+        self._crashed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._idle is not None
+
+    async def start(self) -> None:
+        if self._idle is not None:
+            return
+        workers = await asyncio.gather(*(self._spawn() for _ in range(self.size)))
+        self._idle = asyncio.Queue()
+        for worker in workers:
+            self._idle.put_nowait(worker)
+        logger.info(f"Started {self.size} render workers")
+
+    async def stop(self) -> None:
+        """Stop taking renders, let in-flight ones finish, then stop the workers.
+
+        Renders still waiting for a worker fail with a `RuntimeError`.
+        """
+        idle, self._idle = self._idle, None
+        if idle is not None:
+            for _ in range(self._waiting):
+                idle.put_nowait(None)
+        if self._busy:
+            self._drained.clear()
+            try:
+                await asyncio.wait_for(self._drained.wait(), self.drain_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(
+                    f"{self._busy} renders still running after {self.drain_timeout}s"
+                )
+        workers = list(self._workers)
+        self._workers.clear()
+        await asyncio.gather(
+            *(worker.stop() for worker in workers), return_exceptions=True
+        )
+        # replacements still spawning retire their worker once they are done
+        while self._retiring:
+            await asyncio.gather(*self._retiring, return_exceptions=True)
+
+    def recycle(self) -> None:
+        """Replace every worker on its next use, e.g. after a rebuild."""
+        self._generation += 1
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "workers": [worker.stats() for worker in self._workers],
+            "busy": self._busy,
+            "idle": self._idle.qsize() if self._idle is not None else 0,
+            "recycled": self._recycled,
+            "crashed": self._crashed,
+        }
+
+    @asynccontextmanager
+    async def lifespan(self, app):
+        await self.start()
+        try:
+            yield
+        finally:
+            await self.stop()
+
+    def _preload_paths(self) -> list[Path]:
+        try:
+            registry = self.project.page_registry
+        except FileNotFoundError:
+            return []
+        return [
+            record.server_js_path
+            for record in registry
+            if record.server_js_path is not None
+        ]
+
+    async def _spawn(self) -> RenderWorker:
+        worker = RenderWorker(self.project, self._generation, self.command)
+        await worker.start(preload=self._preload_paths())
+        self._workers.add(worker)
+        return worker
+
+    def _retire(self, worker: RenderWorker) -> None:
+        self._workers.discard(worker)
+        self._track(worker.stop())
+
+    def _track(self, coroutine) -> None:
+        task = asyncio.create_task(coroutine)
+        self._retiring.add(task)
+        task.add_done_callback(self._retiring.discard)
+
+    def _worn_out(self, worker: RenderWorker) -> bool:
+        if self.max_renders is not None and worker.renders >= self.max_renders:
+            return True
+        return (
+            self.max_rss is not None
+            and worker.rss is not None
+            and worker.rss > self.max_rss
+        )
+
+    async def _acquire(self) -> RenderWorker:
+        idle = self._idle
+        if idle is None:
+            raise RuntimeError("Render pool is not running")
+        self._waiting += 1
+        try:
+            worker = await idle.get()
+        finally:
+            self._waiting -= 1
+        if worker is None or self._idle is not idle:
+            if worker is not None:
+                self._retire(worker)
+            raise RuntimeError("Render pool is not running")
+        if worker.alive and worker.generation == self._generation:
+            return worker
+        if not worker.alive and worker in self._workers:
+            self._crashed += 1
+            logger.warning(f"Render worker {worker.pid} died, replacing it")
+        # Crashed or outdated worker: replace it before use
+        try:
+            fresh = await self._spawn()
+        except BaseException:
+            # keep the slot, the next acquire retries the spawn
+            idle.put_nowait(worker)
+            raise
+        self._retire(worker)
+        return fresh
+
+    def _release(self, worker: RenderWorker) -> None:
+        if self._idle is None:
+            self._retire(worker)
+        elif worker.alive and self._worn_out(worker):
+            self._recycled += 1
+            logger.info(
+                f"Recycling render worker {worker.pid} after {worker.renders} renders"
+                f" (rss {worker.rss})"
+            )
+            self._retire(worker)
+            self._track(self._replace(worker))
+        else:
+            self._idle.put_nowait(worker)
+
+    async def _replace(self, worker: RenderWorker) -> None:
+        """Spawn the successor of a recycled worker off the request path."""
+        try:
+            fresh = await self._spawn()
+        except Exception:
+            logger.exception("Failed to spawn a replacement render worker")
+            # the stopped worker holds the slot, the next acquire respawns it
+            fresh = worker
+        if self._idle is None:
+            self._retire(fresh)
+        else:
+            self._idle.put_nowait(fresh)
+
+    async def render(
+        self,
+        server_js: Path,
+        render_request: dict[str, Any],
+        props: RenderProps,
+        page: str | None = None,
+        deferred: AsyncIterable[bytes] | None = None,
+    ) -> AsyncGenerator[bytes, None]:
+        """Render on the next idle worker, waiting for one if all are busy.
+
+        A render whose worker crashes before sending any HTML is retried once
+        on another worker, unless it has `deferred` props, which are sent
+        only once.
+        """
+        for attempt in range(2):
+            worker = await self._acquire()
+            self._busy += 1
+            stream = worker.render(server_js, render_request, props, page, deferred)
+            sent = False
+            try:
+                async for chunk in stream:
+                    sent = True
+                    yield chunk
+                return
+            except WorkerCrashed:
+                if sent or attempt or deferred is not None:
+                    raise
+                logger.warning(f"Render worker {worker.pid} crashed, retrying")
+            finally:
+                # close the worker's stream first, so an abandoned render is
+                # aborted before the worker takes the next one
+                await stream.aclose()
+                self._busy -= 1
+                if not self._busy:
+                    self._drained.set()
+                self._release(worker)
@@ -0,0 +1,323 @@
+"""
+Byte-level transformations applied to the HTML streamed out of Bun.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import inspect
+import json
+import logging
+from dataclasses import dataclass
+from typing import (
+    Any,
+    AsyncGenerator,
+    AsyncIterable,
+    Awaitable,
+    Callable,
+    Generator,
+    Iterable,
+)
+
+logger = logging.getLogger(__name__)
+
+HEAD_CLOSE = b"</head>"
+DOCTYPE = b"<!doctype html>"
+
+
+def island_loader(islands: Iterable[tuple[str, str]]) -> str:
+    """A script importing the hydrators of the islands found in the document.
+
+    Module scripts run once the document is parsed, so every island is in the
+    DOM by then.
+    """
+    hydrators = json.dumps(dict(islands), separators=(",", ":"))
+    return (
+        f'<script type="module">const h={hydrators};'
+        'for(const e of document.querySelectorAll("schorle-island"))'
+        "h[e.dataset.island]&&import(h[e.dataset.island])</script>\n"
+    )
+
+
+def stylesheet_link(css: str) -> str:
+    return f"<link rel='stylesheet' href='{css}' />\n"
+
+
+def build_head_injection(
+    render_request: dict[str, Any],
+    props: bytes | None,
+    islands: Iterable[tuple[str, str]] = (),
+) -> bytes:
+    """Build the CSS link and hydration scripts inserted before </head>.
+
+    `islands` are the hydrators of a page that does not hydrate as a whole.
+    """
+    injection = ""
+
+    if render_request["css"]:
+        injection += stylesheet_link(render_request["css"])
+
+    if props:
+        props_b64 = base64.b64encode(props).decode("utf-8")
+        injection += f"<script id='__SCHORLE_PROPS__' type='application/msgpack'>{props_b64}</script>\n"
+
+    if render_request["headers"]:
+        injection += f"<script id='__SCHORLE_HEADERS__' type='application/json'>{json.dumps(render_request['headers'])}</script>\n"
+
+    if render_request["cookies"]:
+        injection += f"<script id='__SCHORLE_COOKIES__' type='application/json'>{json.dumps(render_request['cookies'])}</script>\n"
+
+    if islands := tuple(islands):
+        injection += island_loader(islands)
+
+    return injection.encode("utf-8")
+
+
+def build_prelude(css: str | None, js: str | None, chunks: Iterable[str] = ()) -> bytes:
+    """Build the start of a document that lets the browser fetch page assets.
+
+    Sent before the page renders. The tags land in the implicit <head>; the
+    `<html>` and `<head>` tags React renders later are merged into it.
+    """
+    prelude = '<!DOCTYPE html><meta charset="utf-8">'
+    if css:
+        prelude += f'<link rel="stylesheet" href="{css}">'
+    for module in [js, *chunks] if js else chunks:
+        prelude += f'<link rel="modulepreload" href="{module}">'
+    return prelude.encode("utf-8")
+
+
+def preload_links(css: str | None, js: str | None, chunks: Iterable[str] = ()) -> str:
+    """The `Link` header announcing the assets of `build_prelude`."""
+    links = [f"<{css}>; rel=preload; as=style"] if css else []
+    links += [f"<{module}>; rel=modulepreload" for module in [js, *chunks] if module]
+    return ", ".join(links)
+
+
+async def strip_prelude(
+    stream: AsyncGenerator[bytes, None], css: str | None = None
+) -> AsyncGenerator[bytes, None]:
+    """Drop what a render repeats of a prelude that was already sent.
+
+    The leading doctype goes, and so does the link to `css` that the head
+    injection adds, so the stylesheet is requested once. The document is
+    held back until its </head> is complete.
+    """
+    link = stylesheet_link(css).encode("utf-8") if css else None
+
+    def strip(head: bytes) -> bytes:
+        if head[: len(DOCTYPE)].lower() == DOCTYPE:
+            head = head[len(DOCTYPE) :]
+        return head.replace(link, b"", 1) if link else head
+
+    head: bytes | None = b""
+    try:
+        async for chunk in stream:
+            if head is None:
+                yield chunk
+                continue
+            head += chunk
+            if HEAD_CLOSE not in head:
+                continue
+            if head := strip(head):
+                yield head
+            head = None
+        if head and (head := strip(head)):
+            yield head
+    finally:
+        await stream.aclose()
+
+
+class HeadInjector:
+    """Insert a precomputed payload before the first </head> of a byte stream.
+
+    The closing tag is found even when it is split across chunks: only the
+    trailing bytes that could start a </head> are held back. Once the tag has
+    been seen, chunks are passed through untouched.
+    """
+
+    __slots__ = ("_injection", "_pending", "done")
+
+    def __init__(self, injection: bytes) -> None:
+        self._injection = injection
+        self._pending = b""
+        self.done = not injection
+
+    def feed(self, chunk: bytes) -> bytes:
+        if self.done:
+            return chunk
+
+        data = self._pending + chunk if self._pending else chunk
+        index = data.find(HEAD_CLOSE)
+        if index != -1:
+            self.done = True
+            self._pending = b""
+            return data[:index] + self._injection + data[index:]
+
+        # hold back the longest suffix that is a prefix of </head>
+        for size in range(min(len(data), len(HEAD_CLOSE) - 1), 0, -1):
+            if data.endswith(HEAD_CLOSE[:size]):
+                self._pending = data[-size:]
+                return data[:-size]
+        self._pending = b""
+        return data
+
+    def flush(self) -> bytes:
+        """Return bytes still held back once the stream has ended."""
+        pending, self._pending = self._pending, b""
+        return pending
+
+
+def inject_head(
+    stream: Iterable[bytes], injection: bytes
+) -> Generator[bytes, None, None]:
+    injector = HeadInjector(injection)
+    for chunk in stream:
+        if out := injector.feed(chunk):
+            yield out
+    if tail := injector.flush():
+        yield tail
+
+
+async def ainject_head(
+    stream: AsyncIterable[bytes], injection: bytes | Awaitable[bytes]
+) -> AsyncGenerator[bytes, None]:
+    """Async `inject_head`; an awaitable `injection` is awaited on the first chunk."""
+    injector: HeadInjector | None = None
+    try:
+        async for chunk in stream:
+            if injector is None:
+                if not isinstance(injection, bytes):
+                    injection = await injection
+                injector = HeadInjector(injection)
+            if out := injector.feed(chunk):
+                yield out
+        if injector is not None and (tail := injector.flush()):
+            yield tail
+    finally:
+        if inspect.iscoroutine(injection):
+            # never awaited, the render produced nothing
+            injection.close()
+        if isinstance(stream, AsyncGenerator):
+            await stream.aclose()
+
+
+def client_shell(js: str | None, injection: bytes) -> bytes:
+    """A document without server-rendered markup that renders on the client.
+
+    Served when a render misses its deadline: the page's bundle hydrates the
+    empty document, which React recovers from by rendering it on the client.
+    """
+    script = f'<script type="module" src="{js}"></script>' if js else ""
+    return (
+        b"<!DOCTYPE html><html><head>"
+        + injection
+        + f"</head><body>{script}</body></html>".encode("utf-8")
+    )
+
+
+async def with_deadline(
+    stream: AsyncGenerator[bytes, None],
+    deadline: float,
+    fallback: bytes | Callable[[], bytes | None],
+    page: str,
+) -> AsyncGenerator[bytes, None]:
+    """Abort a render that does not finish within `deadline` seconds.
+
+    If nothing was sent yet, `fallback` is served in its place; a callable is
+    only called then, and may return None when there is nothing to serve. A
+    render that already started streaming can only be cut short.
+    """
+    loop = asyncio.get_running_loop()
+    expires_at = loop.time() + deadline
+    started = False
+    try:
+        while True:
+            try:
+                chunk = await asyncio.wait_for(
+                    anext(stream), max(expires_at - loop.time(), 0)
+                )
+            except StopAsyncIteration:
+                return
+            except asyncio.TimeoutError:
+                shell = None
+                if not started:
+                    shell = fallback() if callable(fallback) else fallback
+                if shell is None:
+                    logger.warning(f"Render of {page} exceeded {deadline}s, aborted")
+                else:
+                    logger.warning(
+                        f"Render of {page} exceeded {deadline}s, "
+                        "serving the client-only shell"
+                    )
+                    yield shell
+                return
+            started = True
+            yield chunk
+    finally:
+        await stream.aclose()
+
+
+@dataclass(frozen=True, slots=True)
+class FlushPolicy:
+    """When HTML buffered from a render is written to the client.
+
+    The document up to and including `</head>` is flushed as soon as it is
+    complete, so the browser starts fetching CSS and scripts right away.
+    After that, chunks are coalesced until `min_bytes` are buffered or the
+    oldest buffered byte has waited `max_delay` seconds.
+    """
+
+    min_bytes: int = 8 * 1024
+    max_delay: float = 0.02
+
+
+async def flush_chunks(
+    stream: AsyncGenerator[bytes, None], policy: FlushPolicy
+) -> AsyncGenerator[bytes, None]:
+    """Re-chunk a render stream according to `policy`."""
+    loop = asyncio.get_running_loop()
+    buffer = bytearray()
+    buffered_at = 0.0
+    head_sent = False
+    # reading ahead while the consumer writes keeps the render moving
+    next_chunk: asyncio.Future[bytes | None] | None = None
+    try:
+        while True:
+            if next_chunk is None:
+                next_chunk = asyncio.ensure_future(anext(stream, None))
+            if buffer:
+                timeout = max(buffered_at + policy.max_delay - loop.time(), 0)
+                done, _ = await asyncio.wait({next_chunk}, timeout=timeout)
+                if not done:
+                    yield bytes(buffer)
+                    buffer.clear()
+                    continue
+            chunk = await next_chunk
+            next_chunk = None
+            if chunk is None:
+                break
+
+            if not buffer:
+                buffered_at = loop.time()
+            start = max(len(buffer) - len(HEAD_CLOSE) + 1, 0)
+            buffer += chunk
+            if not head_sent:
+                index = buffer.find(HEAD_CLOSE, start)
+                if index != -1:
+                    head_sent = True
+                    end = index + len(HEAD_CLOSE)
+                    yield bytes(buffer[:end])
+                    del buffer[:end]
+                    buffered_at = loop.time()
+            if len(buffer) >= policy.min_bytes:
+                yield bytes(buffer)
+                buffer.clear()
+        if buffer:
+            yield bytes(buffer)
+    finally:
+        if next_chunk is not None and not next_chunk.done():
+            next_chunk.cancel()
+            await asyncio.gather(next_chunk, return_exceptions=True)
+        await stream.aclose()
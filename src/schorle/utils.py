@@ -8,6 +8,9 @@ import sys
 from typing import Any, Generator, TypeVar
 import importlib.resources
 
+import msgpack
+from pydantic import BaseModel
+
 templates_path: Path = importlib.resources.files("schorle").joinpath("templates")  # type: ignore
 
 
@@ -77,3 +80,14 @@ def keys_to_camel_case(obj: T) -> T:
         return [keys_to_camel_case(item) for item in obj]
     else:
         return obj
+
+
+def pack_props(props: dict | BaseModel | None) -> bytes | None:
+    """Encode page props as msgpack with camelCase keys, as pages expect them."""
+    if props is None:
+        return None
+    if isinstance(props, BaseModel):
+        _props = props.model_dump()
+    else:
+        _props = props
+    return msgpack.packb(keys_to_camel_case(_props))
@@ -0,0 +1,101 @@
+"""
+Forwarding of Bun's stderr to `logging`.
+
+Server-side `console` output of pages is redirected to stderr. A pipe that
+nobody reads fills up after 64 KiB and blocks the renderer, so every render
+process gets its stderr drained concurrently and split into log records
+tagged with the page and request being rendered.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+from typing import IO, Callable
+
+logger = logging.getLogger(__name__)
+
+# longer lines are truncated, so a runaway log cannot grow the buffer unbounded
+MAX_LINE_BYTES = 8 * 1024
+READ_SIZE = 64 * 1024
+
+
+class StderrLogger:
+    """Split a process's stderr into lines and log each one.
+
+    `context` is called per line and returns the page and request id the
+    line is attributed to; a pooled worker changes them between renders.
+    """
+
+    __slots__ = ("_buffer", "_truncated", "context", "max_line_bytes", "pid")
+
+    def __init__(
+        self,
+        context: Callable[[], tuple[str | None, str | None]],
+        pid: int | None = None,
+        max_line_bytes: int = MAX_LINE_BYTES,
+    ) -> None:
+        self.context = context
+        self.pid = pid
+        self.max_line_bytes = max_line_bytes
+        self._buffer = b""
+        self._truncated = False
+
+    def feed(self, data: bytes) -> None:
+        lines = (self._buffer + data).split(b"\n")
+        self._buffer = lines.pop()
+        for line in lines:
+            self._emit(line)
+        if len(self._buffer) > self.max_line_bytes:
+            # keep what fits and drop the rest of the line
+            if not self._truncated:
+                self._emit(self._buffer, truncated=True)
+                self._truncated = True
+            self._buffer = b""
+
+    def flush(self) -> None:
+        if self._buffer:
+            self._emit(self._buffer)
+        self._buffer = b""
+
+    def _emit(self, line: bytes, truncated: bool = False) -> None:
+        if self._truncated:
+            # remainder of a line that was already logged truncated
+            self._truncated = False
+            return
+        if truncated or len(line) > self.max_line_bytes:
+            line = line[: self.max_line_bytes] + b"..."
+        text = line.rstrip(b"\r").decode("utf-8", errors="replace")
+        if not text:
+            return
+        page, request_id = self.context()
+        logger.info(
+            f"[{page or 'worker'} #{request_id or '-'}] {text}",
+            extra={"page": page, "request_id": request_id, "pid": self.pid},
+        )
+
+
+async def drain_stream(reader: asyncio.StreamReader, sink: StderrLogger) -> None:
+    """Log everything written to an asyncio stream until it is closed."""
+    while data := await reader.read(READ_SIZE):
+        sink.feed(data)
+    sink.flush()
+
+
+def drain_file(stream: IO[bytes], sink: StderrLogger) -> threading.Thread:
+    """Log everything written to a blocking pipe from a daemon thread."""
+
+    def drain() -> None:
+        fd = stream.fileno()
+        try:
+            while data := os.read(fd, READ_SIZE):
+                sink.feed(data)
+            sink.flush()
+        finally:
+            stream.close()
+
+    thread = threading.Thread(target=drain, name="schorle-stderr", daemon=True)
+    thread.start()
+    return thread
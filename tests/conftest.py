@@ -0,0 +1,63 @@
+import sys
+from pathlib import Path
+from typing import Any, Callable, Iterable, Mapping
+
+import pytest
+
+from schorle.manifest import (
+    BuildManifest,
+    BuildManifestAssets,
+    BuildManifestEntry,
+    SchorleProject,
+)
+
+# Render worker command running `fake_worker.py` instead of Bun
+FAKE_WORKER = (sys.executable, str(Path(__file__).parent / "fake_worker.py"))
+
+BuildPages = Callable[..., SchorleProject]
+
+
+@pytest.fixture
+def fake_worker() -> tuple[str, ...]:
+    return FAKE_WORKER
+
+
+@pytest.fixture
+def project(tmp_path: Path) -> SchorleProject:
+    return SchorleProject(root_path=tmp_path, project_root=tmp_path / "ui")
+
+
+@pytest.fixture
+def build_pages(project: SchorleProject) -> BuildPages:
+    """Write pages, empty server bundles and a manifest, like `slx build`.
+
+    Takes page names, or a mapping of page names to their source. Extra
+    assets of a page are passed by name, e.g. `Index={"html": "/i.html"}`.
+    The server bundle of `Index` is `pages/Index/index.js`.
+    """
+
+    def build(
+        pages: Iterable[str] | Mapping[str, str], **assets: dict[str, Any]
+    ) -> SchorleProject:
+        sources = pages if isinstance(pages, Mapping) else dict.fromkeys(pages, "")
+        project.pages_path.mkdir(parents=True, exist_ok=True)
+        entries = []
+        for page, source in sources.items():
+            (project.pages_path / f"{page}.tsx").write_text(source)
+            server_js = f"/.schorle/dist/server/pages/{page}/{page.lower()}.js"
+            bundle = project.root_path / server_js.lstrip("/")
+            bundle.parent.mkdir(parents=True, exist_ok=True)
+            bundle.write_text("")
+            page_assets = BuildManifestAssets(
+                js=f"/{page}.js", server_js=server_js, **assets.get(page, {})
+            )
+            entries.append(
+                BuildManifestEntry(page=page, layouts=[], assets=page_assets)
+            )
+        manifest = BuildManifest(entries=entries, mode="production")
+        project.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        project.manifest_path.write_text(manifest.model_dump_json())
+        project.invalidate_manifest_cache()
+        return project
+
+    return build
@@ -0,0 +1,136 @@
+"""Stand-in for `slx-ipc worker` speaking the framed render protocol.
+
+Used by the tests to exercise the Python side of the render pool without Bun.
+The rendered document echoes the server bundle path and the props length.
+Rendering a bundle named `chatty.js` first logs megabytes to stderr, like a
+page that calls `console.log` in a loop. A bundle named `slow.js` sends its
+first chunk and then waits for an ABORT frame, which it reports on stderr.
+An existing `crash.js` file is deleted and the worker exits mid-render. A
+render with deferred props sends its shell, then echoes each DEFER payload in
+the order it arrives. The reported RSS grows by 1000 bytes per render.
+"""
+
+import json
+import os
+import sys
+
+import msgpack
+
+from schorle.protocol import HEADER, WORKER_FRAME_ID, FrameKind, encode_frame
+
+
+def read_exactly(stream, size: int) -> bytes | None:
+    data = b""
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+def log_megabytes(size: int = 4 * 1024 * 1024) -> None:
+    line = b"x" * 1023 + b"\n"
+    for _ in range(size // len(line)):
+        sys.stderr.buffer.write(line)
+    sys.stderr.buffer.write(b"y" * 100_000 + b"\n")
+    sys.stderr.buffer.flush()
+
+
+def render_once() -> None:
+    """Stand-in for `slx-ipc render <server_js> <request>`."""
+    server_js = sys.argv[2]
+    sys.stdin.buffer.read()
+    if server_js.endswith("chatty.js"):
+        log_megabytes()
+    sys.stdout.buffer.write(
+        f"<!DOCTYPE html><html><head></head><body>{server_js}</body></html>".encode()
+    )
+
+
+def main() -> None:
+    stdin = sys.stdin.buffer
+    stdout = sys.stdout.buffer
+    pending: dict[int, dict] = {}
+    renders = 0
+
+    stdout.write(encode_frame(FrameKind.READY, WORKER_FRAME_ID))
+    stdout.flush()
+
+    while True:
+        header = read_exactly(stdin, HEADER.size)
+        if header is None:
+            return
+        kind, request_id, length = HEADER.unpack(header)
+        payload = read_exactly(stdin, length) if length else b""
+        if payload is None:
+            return
+
+        if kind == FrameKind.RENDER:
+            pending[request_id] = json.loads(payload)
+            continue
+        if kind in (FrameKind.ABORT, FrameKind.DEFER):
+            pending.pop(request_id, None)
+            continue
+        if kind == FrameKind.PRELOAD:
+            sys.stderr.write(f"preloaded {','.join(json.loads(payload))}\n")
+            sys.stderr.flush()
+            stats = json.dumps({"rss": 0, "failed": 0}).encode()
+            stdout.write(encode_frame(FrameKind.PRELOADED, WORKER_FRAME_ID, stats))
+            stdout.flush()
+            continue
+
+        request = pending.pop(request_id)
+        renders += 1
+        stats = json.dumps({"rss": renders * 1000}).encode()
+        if request["server_js"].endswith("crash.js") and os.path.exists(
+            request["server_js"]
+        ):
+            os.remove(request["server_js"])
+            os._exit(1)
+        if request["server_js"].endswith("chatty.js"):
+            log_megabytes()
+        if request["server_js"].endswith("slow.js"):
+            stdout.write(encode_frame(FrameKind.CHUNK, request_id, b"<html>"))
+            stdout.flush()
+            header = read_exactly(stdin, HEADER.size)
+            if header is None:
+                return
+            kind, abort_id, _ = HEADER.unpack(header)
+            if kind == FrameKind.ABORT and abort_id == request_id:
+                sys.stderr.write(f"aborted {request_id}\n")
+                sys.stderr.flush()
+            stdout.write(encode_frame(FrameKind.END, request_id, stats))
+        elif names := request.get("deferred"):
+            stdout.write(encode_frame(FrameKind.CHUNK, request_id, b"<html><body>"))
+            stdout.flush()
+            for _ in names:
+                header = read_exactly(stdin, HEADER.size)
+                if header is None:
+                    return
+                kind, defer_id, length = HEADER.unpack(header)
+                deferred = read_exactly(stdin, length)
+                if deferred is None:
+                    return
+                value = msgpack.unpackb(deferred)
+                assert kind == FrameKind.DEFER and defer_id == request_id
+                chunk = f"<script>{json.dumps(value)}</script>".encode()
+                stdout.write(encode_frame(FrameKind.CHUNK, request_id, chunk))
+                stdout.flush()
+            stdout.write(encode_frame(FrameKind.CHUNK, request_id, b"</body></html>"))
+            stdout.write(encode_frame(FrameKind.END, request_id, stats))
+        elif request["server_js"].endswith("broken.js"):
+            stdout.write(encode_frame(FrameKind.ERROR, request_id, b"boom"))
+        else:
+            body = f"<body>{request['server_js']}:{len(payload)}:{os.getpid()}</body>"
+            for part in ("<!DOCTYPE html><html><he", "ad></head>", body, "</html>"):
+                stdout.write(encode_frame(FrameKind.CHUNK, request_id, part.encode()))
+            stdout.write(encode_frame(FrameKind.END, request_id, stats))
+        stdout.flush()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["render"]:
+        render_once()
+    else:
+        main()
@@ -0,0 +1,124 @@
+import asyncio
+
+import pytest
+
+from schorle.admission import AdmissionController, RenderOverloaded, RenderResponse
+
+
+async def render(release: asyncio.Event):
+    yield b"<html>"
+    await release.wait()
+    yield b"</html>"
+
+
+async def collect(stream) -> bytes:
+    return b"".join([chunk async for chunk in stream])
+
+
+@pytest.mark.asyncio
+async def test_admission_limits_concurrent_renders():
+    admission = AdmissionController(max_concurrent=2, max_queue=10)
+    release = asyncio.Event()
+
+    tasks = [
+        asyncio.create_task(collect(admission.admit(render(release)))) for _ in range(5)
+    ]
+    await asyncio.sleep(0.01)
+    assert admission.stats()["in_flight"] == 2
+    assert admission.stats()["queued"] == 3
+
+    release.set()
+    assert await asyncio.gather(*tasks) == [b"<html></html>"] * 5
+    assert admission.stats() == {
+        "in_flight": 0,
+        "queued": 0,
+        "admitted": 5,
+        "rejected": 0,
+        "timed_out": 0,
+    }
+
+
+@pytest.mark.asyncio
+async def test_admission_rejects_when_queue_is_full():
+    admission = AdmissionController(max_concurrent=1, max_queue=1, retry_after=3)
+    release = asyncio.Event()
+
+    running = asyncio.create_task(collect(admission.admit(render(release))))
+    queued = asyncio.create_task(collect(admission.admit(render(release))))
+    await asyncio.sleep(0.01)
+
+    with pytest.raises(RenderOverloaded) as error:
+        await collect(admission.admit(render(release)))
+    assert error.value.retry_after == 3
+
+    release.set()
+    await asyncio.gather(running, queued)
+    assert admission.stats()["rejected"] == 1
+
+
+@pytest.mark.asyncio
+async def test_admission_queue_timeout():
+    admission = AdmissionController(max_concurrent=1, queue_timeout=0.01)
+    release = asyncio.Event()
+
+    running = asyncio.create_task(collect(admission.admit(render(release))))
+    await asyncio.sleep(0)
+    with pytest.raises(RenderOverloaded):
+        await collect(admission.admit(render(release)))
+
+    release.set()
+    await running
+    assert admission.stats()["timed_out"] == 1
+    assert admission.stats()["queued"] == 0
+
+
+@pytest.mark.asyncio
+async def test_slot_handed_to_a_cancelled_waiter_is_given_back():
+    admission = AdmissionController(max_concurrent=1)
+    await admission.acquire()
+    waiting = asyncio.create_task(admission.acquire())
+    await asyncio.sleep(0)
+
+    # the slot is handed to the queued render as it goes away
+    admission.release()
+    waiting.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+
+    await asyncio.wait_for(admission.acquire(), 1)
+    assert admission.stats()["in_flight"] == 1
+    assert admission.stats()["queued"] == 0
+
+
+@pytest.mark.asyncio
+async def test_render_response_turns_rejection_into_503():
+    async def rejected():
+        raise RenderOverloaded("Render queue is full", retry_after=2)
+        yield b""
+
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    await RenderResponse(rejected()).stream_response(send)
+
+    assert messages[0]["status"] == 503
+    assert (b"retry-after", b"2") in messages[0]["headers"]
+    assert messages[1]["body"] == b"Render queue is full"
+
+
+@pytest.mark.asyncio
+async def test_render_response_streams_admitted_render():
+    admission = AdmissionController(max_concurrent=1)
+    release = asyncio.Event()
+    release.set()
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    await RenderResponse(admission.admit(render(release))).stream_response(send)
+
+    assert messages[0]["status"] == 200
+    assert b"".join(m.get("body", b"") for m in messages[1:]) == b"<html></html>"
@@ -0,0 +1,71 @@
+import gzip
+from pathlib import Path
+
+import pytest
+from fastapi.datastructures import Headers
+
+from schorle.app import Schorle, _accepts_gzip
+from schorle.manifest import (
+    BuildManifest,
+    BuildManifestAssets,
+    BuildManifestEntry,
+    SchorleProject,
+)
+
+DOCUMENT = b"<!DOCTYPE html><html><body>prerendered</body></html>"
+
+
+@pytest.fixture
+def ui(tmp_path: Path, monkeypatch) -> Schorle:
+    (tmp_path / "pyproject.toml").write_text('[tool.schorle]\nproject_root = "ui"\n')
+    monkeypatch.chdir(tmp_path)
+    project = SchorleProject(root_path=tmp_path, project_root=tmp_path / "ui")
+    project.pages_path.mkdir(parents=True)
+    (project.pages_path / "Index.tsx").write_text("")
+    html = project.dist_path / "prerendered" / "Index.html"
+    html.parent.mkdir(parents=True)
+    html.write_bytes(DOCUMENT)
+    html.with_suffix(".html.gz").write_bytes(gzip.compress(DOCUMENT))
+    manifest = BuildManifest(
+        entries=[
+            BuildManifestEntry(
+                page="Index",
+                layouts=[],
+                assets=BuildManifestAssets(
+                    js="/index.js",
+                    server_js="/index-s.js",
+                    html="/.schorle/dist/prerendered/Index.html",
+                    html_gzip="/.schorle/dist/prerendered/Index.html.gz",
+                ),
+            )
+        ],
+        mode="production",
+    )
+    project.manifest_path.write_text(manifest.model_dump_json())
+    return Schorle(dev=False)
+
+
+async def body(response) -> bytes:
+    return b"".join([chunk async for chunk in response.body_iterator])
+
+
+def test_accepts_gzip():
+    assert _accepts_gzip("gzip, deflate, br")
+    assert _accepts_gzip("br;q=1.0, gzip;q=0.5")
+    assert _accepts_gzip("*")
+    assert not _accepts_gzip("")
+    assert not _accepts_gzip("br, deflate")
+    assert not _accepts_gzip("gzip;q=0")
+    assert not _accepts_gzip("gzip;q=oops")
+
+
+@pytest.mark.asyncio
+async def test_prerendered_pages_are_served_from_the_build(ui: Schorle):
+    response = ui.render(Path("Index"), headers=Headers({"accept-encoding": "br"}))
+    assert await body(response) == DOCUMENT
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert "content-encoding" not in response.headers
+
+    response = ui.render(Path("Index"), headers=Headers({"accept-encoding": "gzip"}))
+    assert gzip.decompress(await body(response)) == DOCUMENT
+    assert response.headers["content-encoding"] == "gzip"
@@ -0,0 +1,82 @@
+from pathlib import Path
+
+import pytest
+
+from schorle.batch import RenderJob, drain, read_jobs, render_many
+from schorle.manifest import SchorleProject
+from schorle.render_pool import RenderPool
+
+
+@pytest.fixture
+def project(build_pages) -> SchorleProject:
+    return build_pages(["Index", "Report"])
+
+
+@pytest.mark.asyncio
+async def test_results_follow_job_order(project: SchorleProject, fake_worker):
+    pool = RenderPool(project, size=2, command=fake_worker)
+    await pool.start()
+    try:
+        jobs = [
+            RenderJob("Report" if i % 2 else "Index", {"n": "x" * i}, name=f"p{i}")
+            for i in range(8)
+        ]
+        results = [r async for r in render_many(pool, project, jobs)]
+        assert [r.name for r in results] == [f"p{i}" for i in range(8)]
+        assert all(r.ok for r in results)
+        assert b"Report/report.js" in results[3].body
+    finally:
+        await pool.stop()
+
+
+@pytest.mark.asyncio
+async def test_jobs_are_read_lazily(project: SchorleProject, fake_worker):
+    pool = RenderPool(project, size=2, command=fake_worker)
+    await pool.start()
+    consumed = 0
+
+    def jobs():
+        nonlocal consumed
+        for i in range(100):
+            consumed += 1
+            yield RenderJob("Index", name=str(i))
+
+    try:
+        results = render_many(pool, project, jobs(), ordered=False, concurrency=2)
+        assert (await anext(results)).ok
+        assert consumed == 2
+        rest = [r.name async for r in results]
+        assert len(rest) == 99
+    finally:
+        await pool.stop()
+
+
+@pytest.mark.asyncio
+async def test_failed_jobs_do_not_stop_the_batch(
+    project: SchorleProject, tmp_path: Path, fake_worker
+):
+    pool = RenderPool(project, size=1, command=fake_worker)
+    await pool.start()
+    jobs_file = tmp_path / "jobs.jsonl"
+    jobs_file.write_text(
+        '{"page": "Index", "name": "home", "props": {"title": "Home"}}\n'
+        '{"page": "Missing", "name": "missing"}\n'
+        "\n"
+        '{"page": "Report", "name": "reports/daily"}\n'
+        '{"page": "Index", "name": "../escaped"}\n'
+        '{"page": "Index", "name": "a/../../escaped"}\n'
+    )
+    try:
+        out = tmp_path / "out"
+        results = render_many(pool, project, read_jobs(jobs_file))
+        report = await drain(results, out)
+        assert (report.rendered, report.failed) == (2, 3)
+        # the same tree as `slx export` writes
+        assert b"Index/index.js" in (out / "home/index.html").read_bytes()
+        page = out / "reports/daily/index.html"
+        assert b"Report/report.js" in page.read_bytes()
+        assert not (out / "missing").exists()
+        # names escaping the output directory fail their job
+        assert not (tmp_path / "escaped").exists()
+    finally:
+        await pool.stop()
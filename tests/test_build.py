@@ -1,7 +1,24 @@
+import gzip
 from pathlib import Path
-from schorle.build import build_entrypoints
+
+import pytest
+
+from schorle.build import (
+    build_entrypoints,
+    collect_island_assets,
+    collect_static_imports,
+    find_islands,
+    get_client_template,
+    get_server_template,
+    prerender_pages,
+    transform_artifacts_to_manifest,
+)
+from schorle.manifest import (
+    PageInfo,
+    SchorleProject,
+    find_schorle_project,
+)
 from schorle.utils import cwd
-from schorle.manifest import find_schorle_project
 
 
 def test_build_entrypoints():
@@ -9,3 +26,130 @@ def test_build_entrypoints():
         proj = find_schorle_project(Path.cwd())
         build_entrypoints(("bun", "run", "slx-ipc", "build"), proj)
         assert proj.manifest.entries[0].page == "Index"
+
+
+def test_collect_static_imports(tmp_path: Path):
+    files = {
+        "pages/Index/a1.js": 'import{x as y}from"./chunks/c1.js";import("../../lazy.js")',
+        "pages/Index/chunks/c1.js": 'import"../../../shared.js";export const x=1',
+        "shared.js": 'import{x}from"./pages/Index/chunks/c1.js"',
+        "lazy.js": "",
+    }
+    for path, source in files.items():
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_text(source)
+
+    chunks = collect_static_imports(tmp_path, "pages/Index/a1.js", set(files))
+    assert chunks == ["pages/Index/chunks/c1.js", "shared.js"]
+
+
+def test_prerender_pages(fake_worker, build_pages):
+    static = "export const prerender = true;\nexport default () => null;"
+    project = build_pages({"Index": static, "About": "export default () => null;"})
+
+    # only pages declaring that they do not depend on the request
+    assert prerender_pages(project, command=fake_worker) == 1
+    index = project.page_registry.resolve("Index")
+    assert index.html == "/.schorle/dist/prerendered/Index.html"
+    assert index.html_path is not None and index.html_gzip_path is not None
+    assert b"index.js" in index.html_path.read_bytes()
+    assert gzip.decompress(index.html_gzip_path.read_bytes()) == (
+        index.html_path.read_bytes()
+    )
+    assert project.page_registry.resolve("About").html_path is None
+
+    # a static page failing to render fails the build
+    build_pages({"Index": static, "Broken": static})
+    with pytest.raises(RuntimeError, match="Failed to prerender Broken"):
+        prerender_pages(project, command=fake_worker)
+
+
+@pytest.mark.parametrize("static_key", ["Index", "users/Index"])
+def test_prerendered_documents_follow_their_bundle(
+    fake_worker, build_pages, static_key
+):
+    static = "export const prerender = true;\nexport default () => null;"
+    project = build_pages(["Index"])
+    # a second page with the same name, built into the same manifest entry
+    (project.pages_path / "users").mkdir()
+    (project.pages_path / "users" / "Index.tsx").write_text("")
+    (project.pages_path / f"{static_key}.tsx").write_text(static)
+    project.invalidate_manifest_cache()
+
+    assert prerender_pages(project, command=fake_worker) == 1
+    (entry,) = project.manifest.entries
+    assert entry.assets.html == f"/.schorle/dist/prerendered/{static_key}.html"
+
+
+def test_pages_can_opt_out_of_hydration(tmp_path: Path):
+    project = SchorleProject(root_path=tmp_path, project_root=tmp_path / "ui")
+    project.pages_path.mkdir(parents=True)
+    (project.pages_path / "Index.tsx").write_text("export default () => null;")
+    (project.pages_path / "Docs.mdx").write_text(
+        "export const hydrate = false\n\n# Docs"
+    )
+    artifacts = [
+        {"path": f"pages/{page}/{page}-a1.{ext}", "kind": kind, "target": "client"}
+        for page in ["Index", "Docs"]
+        for ext, kind in [("js", "entry-point"), ("css", "asset")]
+    ]
+    page_infos = [
+        PageInfo(page=project.pages_path / f"{page}", layouts=[])
+        for page in ["Index.tsx", "Docs.mdx"]
+    ]
+
+    index, docs = transform_artifacts_to_manifest(artifacts, page_infos, project)
+    assert index.assets.hydrate
+    assert not docs.assets.hydrate
+    assert docs.assets.css == "/.schorle/dist/client/pages/Docs/Docs-a1.css"
+
+    template = get_client_template()
+    entry = template.render(
+        import_statements="import Page from '@/pages/Docs.mdx';",
+        layout_components="[]",
+        hydrate=False,
+    )
+    assert "hydrateRoot" not in entry and "import Page" in entry
+
+
+def test_hydrating_pages_render_islands_as_plain_components():
+    for template in (get_client_template(), get_server_template()):
+        entry = template.render(
+            import_statements="import Page from '@/pages/Index';",
+            layout_components="[]",
+            hydrate=True,
+        )
+        assert "<IslandProvider>{wrapLayouts(Page, layouts)}</IslandProvider>" in entry
+
+    entry = get_server_template().render(
+        import_statements="import Page from '@/pages/Docs.mdx';",
+        layout_components="[]",
+        hydrate=False,
+    )
+    assert "IslandProvider" not in entry
+
+
+def test_find_islands(tmp_path: Path):
+    project = SchorleProject(root_path=tmp_path, project_root=tmp_path / "ui")
+    components = project.project_root / "components"
+    components.mkdir(parents=True)
+    project.pages_path.mkdir(parents=True)
+    (components / "Counter.tsx").write_text(
+        '// a counter\n"use island";\nexport default () => null;'
+    )
+    (components / "Static.tsx").write_text("export default () => null;")
+    (project.pages_path / "Index.tsx").write_text('"use island";')
+    modules = project.project_root / "node_modules" / "lib"
+    modules.mkdir(parents=True)
+    (modules / "index.js").write_text("'use island';")
+
+    assert find_islands(project) == {"components/Counter": components / "Counter.tsx"}
+
+    artifacts = [
+        {"path": "pages/__islands/components/Counter/a1.js", "kind": "entry-point"},
+        {"path": "pages/Index/a1.js", "kind": "entry-point"},
+        {"path": "chunk-a1.js", "kind": "chunk"},
+    ]
+    assert collect_island_assets(artifacts) == {
+        "components/Counter": "/.schorle/dist/client/pages/__islands/components/Counter/a1.js"
+    }
@@ -0,0 +1,293 @@
+import asyncio
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+
+from schorle.app import Schorle
+from schorle.cache import (
+    CachePolicy,
+    MemoryRenderCache,
+    Revalidator,
+    SqliteRenderCache,
+    cache_stream,
+    render_cache_key,
+)
+from schorle.export import request
+from schorle.render_pool import RenderPool
+
+
+def test_render_cache_key_depends_on_inputs():
+    base = render_cache_key("Index", b"\x80", {"accept-language": "en"}, {})
+    assert base == render_cache_key("Index", b"\x80", {"accept-language": "en"}, {})
+    assert base != render_cache_key("About", b"\x80", {"accept-language": "en"}, {})
+    assert base != render_cache_key("Index", b"\x81", {"accept-language": "en"}, {})
+    assert base != render_cache_key("Index", b"\x80", {"accept-language": "de"}, {})
+    assert base != render_cache_key("Index", b"\x80", {}, {"theme": "dark"})
+
+
+def test_cache_policy_selects_allowlisted_request_data():
+    policy = CachePolicy(vary_headers=("Accept-Language",), vary_cookies=("theme",))
+    headers = {"accept-language": "en", "authorization": "secret"}
+    cookies = {"theme": "dark", "session": "secret"}
+    assert policy.select_headers(headers) == {"accept-language": "en"}
+    assert policy.select_cookies(cookies) == {"theme": "dark"}
+
+
+def test_memory_cache_lru_eviction_by_budget():
+    cache = MemoryRenderCache(max_bytes=10, max_entry_bytes=10)
+    cache.set("a", b"aaaa", ttl=60)
+    cache.set("b", b"bbbb", ttl=60)
+    assert cache.get("a") is not None  # a is now most recently used
+    cache.set("c", b"cccc", ttl=60)
+
+    assert cache.get("b") is None
+    assert cache.get("a").body == b"aaaa"
+    assert cache.get("c").body == b"cccc"
+    assert cache.stats()["bytes"] == 8
+    assert cache.stats()["evictions"] == 1
+
+
+def test_memory_cache_ttl_and_entry_limit():
+    cache = MemoryRenderCache(max_bytes=100, max_entry_bytes=5)
+    cache.set("short", b"x", ttl=0.01)
+    cache.set("large", b"x" * 6, ttl=60)
+    time.sleep(0.02)
+    assert cache.get("short") is None
+    assert cache.get("large") is None
+    assert cache.stats() == {
+        "entries": 0,
+        "bytes": 0,
+        "hits": 0,
+        "misses": 2,
+        "evictions": 0,
+    }
+
+
+@pytest.mark.asyncio
+async def test_cache_stream_stores_only_complete_renders():
+    cache = MemoryRenderCache()
+
+    async def render(fail: bool = False):
+        yield b"<html>"
+        if fail:
+            raise RuntimeError("render failed")
+        yield b"</html>"
+
+    chunks = [chunk async for chunk in cache_stream(render(), cache, "ok", 60)]
+    assert chunks == [b"<html>", b"</html>"]
+    assert cache.get("ok").body == b"<html></html>"
+
+    with pytest.raises(RuntimeError):
+        async for _ in cache_stream(render(fail=True), cache, "failed", 60):
+            pass
+    assert cache.get("failed") is None
+
+
+def test_memory_cache_serves_stale_entries_within_window():
+    cache = MemoryRenderCache()
+    cache.set("page", b"old", ttl=0.01, stale=60)
+    time.sleep(0.02)
+
+    entry = cache.get("page")
+    assert entry is not None and entry.expired()
+    assert entry.body == b"old"
+
+
+@pytest.mark.asyncio
+async def test_revalidator_refreshes_once_per_key():
+    cache = MemoryRenderCache()
+    revalidator = Revalidator(cache)
+    release = asyncio.Event()
+    calls = 0
+
+    async def render():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        yield b"new"
+
+    assert revalidator.refresh("page", render, ttl=60)
+    assert not revalidator.refresh("page", render, ttl=60)
+    assert revalidator.stats()["refreshing"] == 1
+
+    release.set()
+    await asyncio.sleep(0.01)
+
+    assert calls == 1
+    assert cache.get("page").body == b"new"
+    stats = revalidator.stats()
+    assert stats["refreshing"] == 0
+    assert stats["refreshes"] == 1
+    assert stats["last_duration"] > 0
+
+
+@pytest.mark.asyncio
+async def test_revalidator_failure_keeps_stale_entry(caplog):
+    cache = MemoryRenderCache()
+    cache.set("page", b"old", ttl=0, stale=60)
+    revalidator = Revalidator(cache)
+
+    async def render():
+        yield b"<html>"
+        raise RuntimeError("upstream down")
+
+    revalidator.refresh("page", render, ttl=60)
+    await asyncio.sleep(0.01)
+
+    assert cache.get("page").body == b"old"
+    assert revalidator.stats()["failures"] == 1
+    assert "Background refresh of page failed" in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_stale_hit_in_sync_endpoint_refreshes_on_event_loop(
+    tmp_path: Path, monkeypatch, fake_worker, build_pages
+):
+    (tmp_path / "pyproject.toml").write_text('[tool.schorle]\nproject_root = "ui"\n')
+    monkeypatch.chdir(tmp_path)
+    build_pages(["Index"])
+    cache = MemoryRenderCache()
+    ui = Schorle(dev=False, render_cache=cache)
+    ui.render_pool = RenderPool(ui.project, size=1, command=fake_worker)
+    cache.set(render_cache_key("Index", None), b"<html>old</html>", ttl=0, stale=60)
+
+    app = FastAPI()
+
+    @app.get("/")
+    def index():
+        # sync endpoints render from a threadpool thread, without an event loop
+        return ui.render(Path("Index"), cache=CachePolicy(ttl=60))
+
+    await ui.render_pool.start()
+    try:
+        status, _, body = await request(app, "/")
+        assert (status, body) == (200, b"<html>old</html>")
+        assert ui.revalidator is not None
+        for _ in range(100):
+            if ui.revalidator.stats()["refreshes"]:
+                break
+            await asyncio.sleep(0.01)
+
+        status, _, body = await request(app, "/")
+    finally:
+        await ui.render_pool.stop()
+    assert status == 200
+    assert b"/.schorle/dist/server/pages/Index/index.js" in body
+
+
+def test_sqlite_cache_is_shared_between_processes(tmp_path):
+    path = tmp_path / "cache" / "render.sqlite"
+    cache = SqliteRenderCache(path)
+    cache.set("page", b"<html></html>", ttl=60)
+
+    script = (
+        "import sys\n"
+        "from schorle.cache import SqliteRenderCache\n"
+        "cache = SqliteRenderCache(sys.argv[1])\n"
+        "assert cache.get('page').body == b'<html></html>'\n"
+        "cache.set('other', b'from another process', ttl=60)\n"
+    )
+    subprocess.run([sys.executable, "-c", script, str(path)], check=True)
+
+    assert cache.get("other").body == b"from another process"
+    assert cache.stats()["entries"] == 2
+
+
+def test_sqlite_cache_ttl_and_stale_window(tmp_path):
+    cache = SqliteRenderCache(tmp_path / "render.sqlite")
+    cache.set("gone", b"x", ttl=0)
+    cache.set("stale", b"y", ttl=0, stale=60)
+
+    assert cache.get("gone") is None
+    entry = cache.get("stale")
+    assert entry is not None and entry.expired()
+
+
+def test_sqlite_cache_lru_eviction_by_budget(tmp_path):
+    cache = SqliteRenderCache(
+        tmp_path / "render.sqlite", max_bytes=10, max_entry_bytes=10
+    )
+    cache.set("a", b"aaaa", ttl=60)
+    time.sleep(0.01)
+    cache.set("b", b"bbbb", ttl=60)
+    time.sleep(0.01)
+    cache.set("c", b"cccc", ttl=60)
+
+    assert cache.get("a") is None
+    assert cache.get("b").body == b"bbbb"
+    assert cache.get("c").body == b"cccc"
+    assert cache.stats()["bytes"] == 8
+    assert cache.stats()["evictions"] == 1
+
+    cache.set("large", b"x" * 11, ttl=60)
+    assert cache.get("large") is None
+
+
+def test_sqlite_cache_defaults_to_the_project(tmp_path: Path, monkeypatch):
+    (tmp_path / "pyproject.toml").write_text('[tool.schorle]\nproject_root = "ui"\n')
+    (tmp_path / "app").mkdir()
+    monkeypatch.chdir(tmp_path / "app")
+    cache = SqliteRenderCache()
+    assert cache.path == tmp_path / ".schorle" / "cache" / "render.sqlite"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+async def test_cache_is_shared_between_threads(tmp_path: Path, backend):
+    cache = (
+        MemoryRenderCache(max_bytes=400)
+        if backend == "memory"
+        else SqliteRenderCache(tmp_path / "render.sqlite", max_bytes=400)
+    )
+
+    def work(worker: int) -> None:
+        for i in range(50):
+            cache.set(f"{worker}:{i % 5}", b"x" * 20, ttl=60, tags=[f"t{i % 3}"])
+            cache.get(f"{(worker + 1) % 4}:{i % 5}")
+            if i % 10 == 0:
+                cache.invalidate_tags([f"t{worker % 3}"])
+
+    await asyncio.gather(*(asyncio.to_thread(work, worker) for worker in range(4)))
+    assert cache.stats()["bytes"] <= 400
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_invalidate_tags_purges_tagged_entries(tmp_path, backend):
+    cache = (
+        MemoryRenderCache()
+        if backend == "memory"
+        else SqliteRenderCache(tmp_path / "render.sqlite")
+    )
+    cache.set("post-1", b"1", ttl=60, tags=["post:1", "posts"])
+    cache.set("post-2", b"2", ttl=60, tags=["post:2", "posts"])
+    cache.set("about", b"about", ttl=60)
+
+    assert cache.invalidate_tags(["post:1"]) == 1
+    assert cache.get("post-1") is None
+    assert cache.get("post-2") is not None
+
+    assert cache.invalidate_tags(["posts"]) == 1
+    assert cache.get("post-2") is None
+    assert cache.get("about") is not None
+    assert cache.invalidate_tags(["posts"]) == 0
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_renders_started_before_invalidation_are_not_stored(tmp_path, backend):
+    cache = (
+        MemoryRenderCache()
+        if backend == "memory"
+        else SqliteRenderCache(tmp_path / "render.sqlite")
+    )
+    started_at = time.time()
+    cache.invalidate_tags(["post:1"])
+
+    cache.set("post-1", b"old", ttl=60, tags=["post:1"], started_at=started_at)
+    assert cache.get("post-1") is None
+
+    cache.set("post-1", b"new", ttl=60, tags=["post:1"], started_at=time.time())
+    assert cache.get("post-1").body == b"new"
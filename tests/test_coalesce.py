@@ -0,0 +1,185 @@
+import asyncio
+from pathlib import Path
+from typing import AsyncGenerator
+
+import pytest
+from fastapi.datastructures import Headers
+
+from schorle.app import Schorle
+from schorle.cache import CachePolicy, MemoryRenderCache
+from schorle.coalesce import SingleFlight
+
+
+class SlowRender:
+    """A render that streams a few chunks and records how often it ran."""
+
+    def __init__(self, chunks: list[bytes], fail: bool = False) -> None:
+        self.chunks = chunks
+        self.fail = fail
+        self.started = 0
+        self.closed = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self) -> AsyncGenerator[bytes, None]:
+        self.started += 1
+        try:
+            for index, chunk in enumerate(self.chunks):
+                if index == 1:
+                    await self.release.wait()
+                yield chunk
+            if self.fail:
+                raise RuntimeError("boom")
+        finally:
+            self.closed += 1
+
+
+async def collect(stream: AsyncGenerator[bytes, None]) -> bytes:
+    return b"".join([chunk async for chunk in stream])
+
+
+@pytest.mark.asyncio
+async def test_concurrent_renders_share_one_flight():
+    flight = SingleFlight()
+    render = SlowRender([b"<html>", b"<body>", b"</html>"])
+
+    tasks = [
+        asyncio.create_task(collect(flight.stream("page", render))) for _ in range(5)
+    ]
+    await asyncio.sleep(0)
+    render.release.set()
+    results = await asyncio.gather(*tasks)
+
+    assert results == [b"<html><body></html>"] * 5
+    assert render.started == 1
+    assert flight.stats() == {"in_flight": 0, "leaders": 1, "followers": 4}
+
+
+@pytest.mark.asyncio
+async def test_late_subscriber_replays_earlier_chunks():
+    flight = SingleFlight()
+    render = SlowRender([b"a", b"b", b"c"])
+
+    first = flight.stream("page", render)
+    assert await anext(first) == b"a"
+    second = asyncio.create_task(collect(flight.stream("page", render)))
+    render.release.set()
+
+    assert await collect(first) == b"bc"
+    assert await second == b"abc"
+    assert render.started == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_does_not_abort_followers():
+    flight = SingleFlight()
+    render = SlowRender([b"a", b"b"])
+
+    leader = asyncio.create_task(collect(flight.stream("page", render)))
+    follower = asyncio.create_task(collect(flight.stream("page", render)))
+    await asyncio.sleep(0.01)
+    leader.cancel()
+    await asyncio.sleep(0.01)
+    render.release.set()
+
+    assert await follower == b"ab"
+    assert render.closed == 1
+
+
+@pytest.mark.asyncio
+async def test_render_is_cancelled_without_subscribers():
+    flight = SingleFlight()
+    render = SlowRender([b"a", b"b"])
+
+    stream = flight.stream("page", render)
+    assert await anext(stream) == b"a"
+    await stream.aclose()
+    await asyncio.sleep(0.01)
+
+    assert render.closed == 1
+    assert flight.stats()["in_flight"] == 0
+
+    # the next request starts a fresh render
+    render.release.set()
+    assert await collect(flight.stream("page", render)) == b"ab"
+    assert render.started == 2
+
+
+@pytest.mark.asyncio
+async def test_request_during_cancellation_starts_a_fresh_render():
+    flight = SingleFlight()
+    render = SlowRender([b"<html>", b"</html>"])
+
+    stream = flight.stream("page", render)
+    assert await anext(stream) == b"<html>"
+    await stream.aclose()
+    # joins before the cancelled render has unwound
+    late = flight.stream("page", render)
+    assert await anext(late) == b"<html>"
+    render.release.set()
+
+    assert await collect(late) == b"</html>"
+    assert render.started == 2
+
+
+@pytest.mark.asyncio
+async def test_errors_reach_every_subscriber():
+    flight = SingleFlight()
+    render = SlowRender([b"a", b"b"], fail=True)
+
+    tasks = [
+        asyncio.create_task(collect(flight.stream("page", render))) for _ in range(3)
+    ]
+    await asyncio.sleep(0)
+    render.release.set()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert render.started == 1
+
+
+@pytest.mark.asyncio
+async def test_different_keys_render_separately():
+    flight = SingleFlight()
+    render = SlowRender([b"a", b"b"])
+    render.release.set()
+
+    results = await asyncio.gather(
+        collect(flight.stream("one", render)), collect(flight.stream("two", render))
+    )
+
+    assert results == [b"ab", b"ab"]
+    assert render.started == 2
+
+
+@pytest.mark.asyncio
+async def test_app_coalesces_renders_on_the_request_data_they_see(
+    tmp_path: Path, monkeypatch, build_pages
+):
+    (tmp_path / "pyproject.toml").write_text('[tool.schorle]\nproject_root = "ui"\n')
+    monkeypatch.chdir(tmp_path)
+    build_pages(["Index"])
+    ui = Schorle(dev=False, render_cache=MemoryRenderCache())
+    render = SlowRender([b"<html>", b"</html>"])
+    monkeypatch.setattr(ui, "_start_render", lambda *args, **kwargs: render())
+
+    async def render_twice(cache: CachePolicy | None = None) -> int:
+        started = render.started
+        streams = [
+            ui._render_stream(
+                Path("Index"),
+                headers=Headers({"user-agent": agent, "accept-language": "en"}),
+                cache=cache,
+            )
+            for agent in ("curl", "firefox")
+        ]
+        tasks = [asyncio.create_task(collect(stream)) for stream in streams]
+        await asyncio.sleep(0.01)
+        render.release.set()
+        await asyncio.gather(*tasks)
+        render.release.clear()
+        return render.started - started
+
+    # without a cache policy the page sees every header
+    assert await render_twice() == 2
+    # with one, only the allowlisted headers tell the renders apart
+    assert await render_twice(CachePolicy(vary_headers=("accept-language",))) == 1
@@ -0,0 +1,184 @@
+import asyncio
+import logging
+from pathlib import Path
+
+import pytest
+import pytest_asyncio
+
+from schorle import daemon as daemon_module
+from schorle.daemon import DaemonClient, RenderDaemon
+from schorle.deferred import DeferredProps
+from schorle.render_pool import RenderError, RenderPool
+
+
+async def collect(stream) -> bytes:
+    return b"".join([chunk async for chunk in stream])
+
+
+@pytest_asyncio.fixture
+async def daemon(tmp_path: Path, fake_worker, project):
+    pool = RenderPool(project, size=2, command=fake_worker)
+    daemon = RenderDaemon(pool, tmp_path / "render.sock")
+    await daemon.start()
+    try:
+        yield daemon
+    finally:
+        await daemon.stop()
+
+
+@pytest.mark.asyncio
+async def test_clients_share_the_daemon_workers(tmp_path: Path, daemon, project):
+    clients = [DaemonClient(project, daemon.socket_path) for _ in range(3)]
+    for client in clients:
+        await client.start()
+    try:
+        request = {"js": "", "css": ""}
+        outputs = await asyncio.gather(
+            *(
+                collect(clients[i % 3].render(Path(f"page{i}.js"), request, b"\x80"))
+                for i in range(9)
+            )
+        )
+        assert all(out.startswith(b"<!DOCTYPE html>") for out in outputs)
+        assert b"page4.js:1:" in outputs[4]
+        # nine renders from three processes served by the two daemon workers
+        pids = {out.decode().split(":")[-1].split("<")[0] for out in outputs}
+        assert len(pids) == 2
+    finally:
+        for client in clients:
+            await client.stop()
+
+
+@pytest.mark.asyncio
+async def test_client_size_is_the_daemon_worker_count(daemon, project):
+    client = DaemonClient(project, daemon.socket_path, connections=1)
+    await client.start()
+    try:
+        # batch renders default to `size` at once, as with a local pool
+        assert client.size == daemon.pool.size == 2
+    finally:
+        await client.stop()
+
+
+@pytest.mark.asyncio
+async def test_render_errors_cross_the_socket(tmp_path: Path, daemon, project):
+    client = DaemonClient(project, daemon.socket_path)
+    await client.start()
+    try:
+        with pytest.raises(RenderError, match="boom"):
+            await collect(client.render(Path("broken.js"), {}, None))
+        assert b"ok.js" in await collect(client.render(Path("ok.js"), {}, None))
+    finally:
+        await client.stop()
+
+
+@pytest.mark.asyncio
+async def test_unexpected_daemon_failures_reach_the_client(
+    tmp_path: Path, daemon, caplog, project
+):
+    client = DaemonClient(project, daemon.socket_path)
+    await client.start()
+    try:
+        # renders on a stopped pool raise a RuntimeError in the daemon
+        await daemon.pool.stop()
+        with pytest.raises(RenderError, match="failed in the render daemon"):
+            await asyncio.wait_for(collect(client.render(Path("ok.js"), {}, None)), 5)
+    finally:
+        await client.stop()
+    assert "Render pool is not running" in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_render_falling_behind_is_aborted(
+    tmp_path: Path, daemon, monkeypatch, project
+):
+    monkeypatch.setattr(daemon_module, "MAX_QUEUED_FRAMES", 2)
+    client = DaemonClient(project, daemon.socket_path, connections=1)
+    await client.start()
+    try:
+        stream = client.render(Path("page.js"), {"js": "", "css": ""}, None)
+        with pytest.raises(RenderError, match="too far behind"):
+            async for _ in stream:
+                # a reader slower than the render
+                await asyncio.sleep(0.05)
+        # the connection keeps serving other renders
+        monkeypatch.undo()
+        out = await collect(client.render(Path("ok.js"), {"js": "", "css": ""}, None))
+        assert b"ok.js" in out
+    finally:
+        await client.stop()
+
+
+@pytest.mark.asyncio
+async def test_abandoned_render_is_aborted_in_the_daemon(
+    tmp_path: Path, daemon, caplog, project
+):
+    caplog.set_level(logging.INFO, logger="schorle.worker_logs")
+    client = DaemonClient(project, daemon.socket_path, connections=1)
+    await client.start()
+    try:
+        stream = client.render(Path("slow.js"), {"js": "", "css": ""}, None)
+        assert await anext(stream) == b"<html>"
+        await stream.aclose()
+
+        out = await collect(client.render(Path("page.js"), {"js": "", "css": ""}, None))
+        assert b"page.js:" in out
+        assert client.stats() == {"connections": 1, "in_flight": 0}
+    finally:
+        await client.stop()
+
+    for _ in range(50):
+        if "aborted" in caplog.text:
+            break
+        await asyncio.sleep(0.02)
+    assert "aborted" in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_props_follow_the_render_request(tmp_path: Path, daemon, project):
+    client = DaemonClient(project, daemon.socket_path)
+    await client.start()
+    try:
+        props = asyncio.get_running_loop().create_future()
+        render = asyncio.create_task(
+            collect(client.render(Path("page.js"), {"js": "", "css": ""}, props))
+        )
+        await asyncio.sleep(0.05)
+        assert daemon.pool.stats()["busy"] == 1
+        props.set_result(b"\x80")
+        assert b"page.js:1:" in await render
+    finally:
+        await client.stop()
+
+
+@pytest.mark.asyncio
+async def test_deferred_props_are_forwarded(tmp_path: Path, daemon, project):
+    client = DaemonClient(project, daemon.socket_path)
+    await client.start()
+    try:
+        deferred = DeferredProps(
+            {"a": asyncio.sleep(0.05, 1), "b": asyncio.sleep(0.01, 2)}
+        )
+        request = {"js": "", "css": "", "deferred": deferred.names}
+        stream = client.render(
+            Path("page.js"), request, None, None, deferred.payloads()
+        )
+        out = await collect(stream)
+        assert out.index(b'"name": "b"') < out.index(b'"name": "a"')
+        assert out.endswith(b"</html>")
+    finally:
+        await client.stop()
+
+
+@pytest.mark.asyncio
+async def test_client_reconnects_after_daemon_restart(tmp_path: Path, daemon, project):
+    client = DaemonClient(project, daemon.socket_path, connections=1)
+    await client.start()
+    try:
+        assert b"a.js" in await collect(client.render(Path("a.js"), {}, None))
+        await daemon.stop()
+        await daemon.start()
+        await asyncio.sleep(0.05)
+        assert b"b.js" in await collect(client.render(Path("b.js"), {}, None))
+    finally:
+        await client.stop()
@@ -0,0 +1,58 @@
+import asyncio
+
+import msgpack
+import pytest
+from pydantic import BaseModel
+
+from schorle.deferred import DEFERRED_ERROR, DeferredProps, encode_deferred
+
+
+class Comment(BaseModel):
+    author_name: str
+
+
+async def collect(deferred: DeferredProps) -> list[dict]:
+    return [msgpack.unpackb(payload) async for payload in deferred.payloads()]
+
+
+def test_encode_deferred_uses_camel_case_keys():
+    payload = encode_deferred("comments", [Comment(author_name="ada")])
+    assert msgpack.unpackb(payload) == {
+        "name": "comments",
+        "value": [{"authorName": "ada"}],
+    }
+
+
+@pytest.mark.asyncio
+async def test_payloads_follow_resolution_order():
+    deferred = DeferredProps(
+        {"slow": asyncio.sleep(0.05, "s"), "fast": asyncio.sleep(0.01, "f")}
+    )
+    assert deferred.names == ["slow", "fast"]
+    assert await collect(deferred) == [
+        {"name": "fast", "value": "f"},
+        {"name": "slow", "value": "s"},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_async_iterables_are_collected():
+    async def rows():
+        for i in range(3):
+            yield {"row_id": i}
+
+    assert await collect(DeferredProps({"rows": rows()})) == [
+        {"name": "rows", "value": [{"rowId": 0}, {"rowId": 1}, {"rowId": 2}]}
+    ]
+
+
+@pytest.mark.asyncio
+async def test_failures_are_sent_as_errors(caplog):
+    async def fail():
+        raise LookupError("connection to db.internal refused")
+
+    assert await collect(DeferredProps({"comments": fail()})) == [
+        {"name": "comments", "error": DEFERRED_ERROR}
+    ]
+    # the details stay in the server log, out of the page
+    assert "connection to db.internal refused" in caplog.text
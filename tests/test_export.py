@@ -0,0 +1,85 @@
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import HTMLResponse, StreamingResponse
+
+from schorle.export import export_app, export_paths, output_file
+from schorle.manifest import SchorleProject
+
+PAGE = b"<!DOCTYPE html><html><body>page</body></html>"
+
+
+def make_app() -> FastAPI:
+    started = []
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        started.append(True)
+        yield
+
+    app = FastAPI(lifespan=lifespan)
+
+    @app.get("/")
+    async def index():
+        # like rendered pages, streamed without a content type
+        assert started
+        return StreamingResponse(iter([PAGE]))
+
+    @app.get("/docs/intro", response_class=HTMLResponse)
+    async def intro():
+        return "<html>intro</html>"
+
+    @app.get("/api/items")
+    async def items():
+        return [1, 2]
+
+    @app.get("/broken", response_class=HTMLResponse)
+    async def broken():
+        raise RuntimeError("boom")
+
+    @app.get("/items/{item_id}", response_class=HTMLResponse)
+    async def item(item_id: int):
+        return f"<html>item {item_id}</html>"
+
+    return app
+
+
+def test_export_paths_skip_parameterized_routes():
+    assert export_paths(make_app()) == ["/", "/docs/intro", "/api/items", "/broken"]
+
+
+def test_output_file(tmp_path: Path):
+    assert output_file(tmp_path, "/") == tmp_path / "index.html"
+    assert output_file(tmp_path, "/a/b") == tmp_path / "a/b/index.html"
+    # batch job names are the same paths, without the leading slash
+    assert output_file(tmp_path, "a/b") == tmp_path / "a/b/index.html"
+    for path in ["/../etc", "a/../../x", "..\\x"]:
+        with pytest.raises(ValueError):
+            output_file(tmp_path, path)
+    # would overwrite /a/b
+    with pytest.raises(ValueError):
+        output_file(tmp_path, "/a/b?x=1")
+
+
+@pytest.mark.asyncio
+async def test_export_app_writes_html_pages(tmp_path: Path):
+    project = SchorleProject(root_path=tmp_path, project_root=tmp_path / "ui")
+    bundle = project.dist_path / "client/pages/Index/a1.js"
+    bundle.parent.mkdir(parents=True)
+    bundle.write_text("export {}")
+    out = tmp_path / "site"
+
+    report = await export_app(make_app(), project, out)
+    assert [page.path for page in report.written] == ["/", "/docs/intro"]
+    # a failing route does not stop the export
+    assert [(page.path, page.status) for page in report.failed] == [("/broken", 500)]
+    assert (out / "index.html").read_bytes() == PAGE
+    assert (out / "docs/intro/index.html").read_text() == "<html>intro</html>"
+    assert not (out / "api").exists()
+    assert (out / ".schorle/dist/client/pages/Index/a1.js").exists()
+
+    report = await export_app(make_app(), project, out, ["/items/2", "/missing"])
+    assert (out / "items/2/index.html").read_text() == "<html>item 2</html>"
+    assert [(page.path, page.status) for page in report.failed] == [("/missing", 404)]
@@ -0,0 +1,66 @@
+import os
+from pathlib import Path
+
+from schorle.manifest import (
+    BuildManifest,
+    BuildManifestAssets,
+    BuildManifestEntry,
+    SchorleProject,
+)
+
+
+def write_manifest(project: SchorleProject, js: str) -> None:
+    manifest = BuildManifest(
+        entries=[
+            BuildManifestEntry(
+                page="Index",
+                layouts=[],
+                assets=BuildManifestAssets(js=js, server_js="/server.js"),
+            )
+        ],
+        mode="production",
+    )
+    project.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    project.manifest_path.write_text(manifest.model_dump_json())
+
+
+def test_manifest_is_cached(tmp_path: Path):
+    project = SchorleProject(root_path=tmp_path, project_root=tmp_path / "ui")
+    write_manifest(project, "/index.js")
+
+    entry = project.get_manifest_entry("Index")
+    assert entry is not None and entry.assets.js == "/index.js"
+    assert project.get_manifest_entry("Missing") is None
+    assert project.manifest.entries[0].page == "Index"
+    assert project.manifest_cache_info() == {"hits": 2, "misses": 1}
+
+
+def test_manifest_cache_invalidated_by_mtime(tmp_path: Path):
+    project = SchorleProject(root_path=tmp_path, project_root=tmp_path / "ui")
+    write_manifest(project, "/index.js")
+    entry = project.get_manifest_entry("Index")
+    assert entry is not None and entry.assets.js == "/index.js"
+
+    write_manifest(project, "/other.js")
+    stat = project.manifest_path.stat()
+    os.utime(project.manifest_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    entry = project.get_manifest_entry("Index")
+    assert entry is not None and entry.assets.js == "/other.js"
+    assert project.manifest_cache_info() == {"hits": 0, "misses": 2}
+
+
+def test_manifest_cache_in_prod_skips_stat(tmp_path: Path):
+    project = SchorleProject(
+        root_path=tmp_path, project_root=tmp_path / "ui", dev=False
+    )
+    write_manifest(project, "/index.js")
+    project.get_manifest_entry("Index")
+
+    project.manifest_path.unlink()
+    # served from memory, the file is not touched again
+    entry = project.get_manifest_entry("Index")
+    assert entry is not None and entry.assets.js == "/index.js"
+
+    project.invalidate_manifest_cache()
+    assert project.get_manifest_entry("Index") is None
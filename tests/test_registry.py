@@ -0,0 +1,117 @@
+from pathlib import Path
+
+import pytest
+
+from schorle.manifest import (
+    BuildManifest,
+    BuildManifestAssets,
+    BuildManifestEntry,
+    SchorleProject,
+)
+from schorle.page_system import PageReference
+from schorle.registry import PageRecord, PageRegistry
+
+
+@pytest.fixture
+def pages_project(project: SchorleProject) -> SchorleProject:
+    """A pages tree with layouts and an MDX page, and its manifest."""
+    pages = project.pages_path
+    (pages / "dashboard").mkdir(parents=True)
+    for name in ["Index.tsx", "__layout.tsx", "dashboard/About.mdx"]:
+        (pages / name).write_text("")
+    (pages / "dashboard" / "__layout.tsx").write_text("")
+
+    server_js = project.root_path / ".schorle/dist/server/pages/Index/abc.js"
+    server_js.parent.mkdir(parents=True)
+    server_js.write_text("")
+
+    manifest = BuildManifest(
+        entries=[
+            BuildManifestEntry(
+                page="Index",
+                layouts=[],
+                assets=BuildManifestAssets(
+                    js="/index.js",
+                    css="/index.css",
+                    server_js="/.schorle/dist/server/pages/Index/abc.js",
+                    chunks=["/chunk.js"],
+                ),
+            ),
+            BuildManifestEntry(
+                page="About",
+                layouts=[],
+                assets=BuildManifestAssets(
+                    js="/about.js",
+                    server_js="/missing.js",
+                    hydrate=False,
+                ),
+            ),
+        ],
+        mode="production",
+        islands={"components/Counter": "/counter.js"},
+    )
+    project.manifest_path.write_text(manifest.model_dump_json())
+    return project
+
+
+def test_registry_resolves_all_reference_kinds(pages_project: SchorleProject):
+    registry = pages_project.page_registry
+    index = registry.resolve("Index")
+
+    assert index is registry.resolve(Path("Index.tsx"))
+    assert index is registry.resolve(Path("pages/Index"))
+    assert index is registry.resolve(PageReference(index.page, pages_project))
+    assert index.layouts == (pages_project.pages_path / "__layout.tsx",)
+    assert index.css == "/index.css"
+    assert index.chunks == ("/chunk.js",)
+    assert index.server_js is not None
+    assert index.server_js_path == pages_project.root_path / index.server_js.lstrip("/")
+
+    about = registry.resolve("dashboard/About")
+    assert about is registry.resolve("About")
+    assert about.layouts == (
+        pages_project.pages_path / "__layout.tsx",
+        pages_project.pages_path / "dashboard" / "__layout.tsx",
+    )
+    assert about.server_js_path is None
+    # pages that do not hydrate get no client JS
+    assert about.js is None
+    # islands are hydrated on their own only on pages that do not hydrate
+    assert about.islands == (("components/Counter", "/counter.js"),)
+    assert index.islands == ()
+
+    with pytest.raises(FileNotFoundError):
+        registry.resolve("Missing")
+
+
+def test_registry_is_compiled_once_per_manifest(pages_project: SchorleProject):
+    registry = pages_project.page_registry
+    assert pages_project.page_registry is registry
+    assert len(registry) == 2
+
+    pages_project.invalidate_manifest_cache()
+    assert pages_project.page_registry is not registry
+
+
+def test_shared_page_names_need_their_key(pages_project: SchorleProject):
+    def record(key: str) -> PageRecord:
+        page = pages_project.pages_path / f"{key}.tsx"
+        return PageRecord(
+            name=page.stem,
+            key=key,
+            page=page,
+            layouts=(),
+            js=None,
+            css=None,
+            server_js=None,
+            server_js_path=None,
+        )
+
+    registry = PageRegistry(
+        pages_project,
+        [record("admin/Index"), record("dashboard/Index"), record("About")],
+    )
+    assert registry.resolve("About").key == "About"
+    assert registry.resolve("admin/Index").key == "admin/Index"
+    with pytest.raises(ValueError, match="admin/Index, dashboard/Index"):
+        registry.resolve("Index")
@@ -1,4 +1,4 @@
-from schorle.render import render
+from schorle.render import render, render_async
 from schorle.utils import cwd
 from schorle.manifest import find_schorle_project
 from pathlib import Path
@@ -8,6 +8,7 @@ import subprocess
 import os
 from fastapi.datastructures import Headers
 from pydantic import BaseModel
+import pytest
 
 
 def test_render():
@@ -439,3 +440,12 @@ def test_render_mdx():
         html = b"".join(gen).decode("utf-8")
         print(html)
         assert "This is the about page." in html
+
+
+@pytest.mark.asyncio
+async def test_render_async():
+    with cwd("packages/aurora"):
+        proj = find_schorle_project(Path("."))
+        chunks = [chunk async for chunk in render_async(proj, "About")]
+        html = b"".join(chunks).decode("utf-8")
+        assert "This is the about page." in html
@@ -0,0 +1,285 @@
+import asyncio
+import logging
+from pathlib import Path
+
+import pytest
+
+from schorle.deferred import DeferredProps
+from schorle.render import render_pooled
+from schorle.render_pool import RenderError, RenderPool
+
+
+async def collect(stream) -> bytes:
+    return b"".join([chunk async for chunk in stream])
+
+
+@pytest.mark.asyncio
+async def test_pool_reuses_workers(tmp_path: Path, fake_worker, project):
+    pool = RenderPool(project, size=2, command=fake_worker)
+    await pool.start()
+    try:
+        request = {"js": "", "css": ""}
+        outputs = await asyncio.gather(
+            *(
+                collect(pool.render(Path(f"page{i}.js"), request, b"\x80"))
+                for i in range(6)
+            )
+        )
+        pids = {out.decode().split(":")[-1].split("<")[0] for out in outputs}
+        assert len(pids) == 2
+        assert all(out.startswith(b"<!DOCTYPE html>") for out in outputs)
+        assert b"page3.js:1:" in outputs[3]
+    finally:
+        await pool.stop()
+
+
+@pytest.mark.asyncio
+async def test_pool_surfaces_render_errors(tmp_path: Path, fake_worker, project):
+    pool = RenderPool(project, size=1, command=fake_worker)
+    await pool.start()
+    try:
+        with pytest.raises(RenderError, match="boom"):
+            await collect(pool.render(Path("broken.js"), {}, None))
+        # the worker stays usable after a failed render
+        assert b"ok.js" in await collect(pool.render(Path("ok.js"), {}, None))
+    finally:
+        await pool.stop()
+
+
+@pytest.mark.asyncio
+async def test_pool_replaces_recycled_workers(tmp_path: Path, fake_worker, project):
+    pool = RenderPool(project, size=1, command=fake_worker)
+    await pool.start()
+    try:
+        first = await collect(pool.render(Path("a.js"), {}, None))
+        pool.recycle()
+        second = await collect(pool.render(Path("a.js"), {}, None))
+        assert first != second  # rendered by a fresh process
+    finally:
+        await pool.stop()
+
+
+@pytest.mark.asyncio
+async def test_abandoned_render_is_aborted(
+    tmp_path: Path, caplog, fake_worker, project
+):
+    caplog.set_level(logging.INFO, logger="schorle.worker_logs")
+    pool = RenderPool(project, size=1, command=fake_worker)
+    await pool.start()
+    try:
+        stream = pool.render(Path("slow.js"), {"js": "", "css": ""}, None)
+        assert await anext(stream) == b"<html>"
+        await stream.aclose()
+
+        # the worker skips the aborted render's output and serves the next one
+        out = await collect(pool.render(Path("page.js"), {"js": "", "css": ""}, None))
+        assert b"page.js:0:" in out
+    finally:
+        await pool.stop()
+
+    assert "aborted 1" in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_workers_preload_manifest_bundles(caplog, fake_worker, build_pages):
+    caplog.set_level(logging.INFO, logger="schorle.worker_logs")
+    project = build_pages(["Index"])
+    server_js = project.root_path / ".schorle/dist/server/pages/Index/index.js"
+
+    pool = RenderPool(project, size=1, command=fake_worker)
+    await pool.start()
+    await pool.stop()
+
+    assert f"preloaded {server_js}" in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_pool_recycles_workers_after_max_renders(
+    tmp_path: Path, fake_worker, project
+):
+    pool = RenderPool(project, size=1, command=fake_worker, max_renders=2)
+    await pool.start()
+    try:
+        request = {"js": "", "css": ""}
+        pids = []
+        for _ in range(4):
+            out = await collect(pool.render(Path("page.js"), request, None))
+            pids.append(out.decode().split(":")[-1].split("<")[0])
+        assert pids[0] == pids[1] != pids[2] == pids[3]
+        assert pool.stats()["recycled"] == 2
+    finally:
+        await pool.stop()
+
+
+@pytest.mark.asyncio
+async def test_pool_recycles_workers_over_rss_ceiling(
+    tmp_path: Path, fake_worker, project
+):
+    pool = RenderPool(
+        project,
+        size=1,
+        command=fake_worker,
+        max_renders=None,
+        max_rss=2500,
+    )
+    await pool.start()
+    try:
+        request = {"js": "", "css": ""}
+        for _ in range(3):
+            await collect(pool.render(Path("page.js"), request, None))
+        # the third render reported 3000 bytes
+        assert pool.stats()["recycled"] == 1
+    finally:
+        await pool.stop()
+
+
+@pytest.mark.asyncio
+async def test_render_is_retried_when_worker_crashes(
+    tmp_path: Path, fake_worker, project
+):
+    crash = tmp_path / "crash.js"
+    crash.write_text("")
+    pool = RenderPool(project, size=1, command=fake_worker)
+    await pool.start()
+    try:
+        out = await collect(pool.render(crash, {"js": "", "css": ""}, None))
+        assert out.endswith(b"</html>")
+        assert pool.stats()["crashed"] == 1
+        assert len(pool.stats()["workers"]) == 1
+    finally:
+        await pool.stop()
+
+
+@pytest.mark.asyncio
+async def test_stop_drains_in_flight_renders(tmp_path: Path, fake_worker, project):
+    pool = RenderPool(project, size=1, command=fake_worker)
+    await pool.start()
+    release = asyncio.Event()
+
+    async def slow_consumer():
+        chunks = []
+        async for chunk in pool.render(Path("page.js"), {"js": "", "css": ""}, None):
+            chunks.append(chunk)
+            await release.wait()
+        return b"".join(chunks)
+
+    render = asyncio.create_task(slow_consumer())
+    await asyncio.sleep(0.05)
+    stop = asyncio.create_task(pool.stop())
+    await asyncio.sleep(0.05)
+    assert not stop.done()
+
+    release.set()
+    assert (await render).endswith(b"</html>")
+    await stop
+
+
+@pytest.mark.asyncio
+async def test_stop_fails_renders_waiting_for_a_worker(fake_worker, project):
+    pool = RenderPool(project, size=1, command=fake_worker)
+    await pool.start()
+    busy = pool.render(Path("page.js"), {"js": "", "css": ""}, None)
+    await anext(busy)
+
+    queued = asyncio.create_task(
+        collect(pool.render(Path("page.js"), {"js": "", "css": ""}, None))
+    )
+    await asyncio.sleep(0.05)
+    stop = asyncio.create_task(pool.stop())
+    with pytest.raises(RuntimeError, match="not running"):
+        await asyncio.wait_for(queued, 1)
+
+    await busy.aclose()
+    await stop
+
+
+@pytest.mark.asyncio
+async def test_props_are_sent_once_resolved(tmp_path: Path, fake_worker, project):
+    pool = RenderPool(project, size=1, command=fake_worker)
+    await pool.start()
+    try:
+        props = asyncio.get_running_loop().create_future()
+        render = asyncio.create_task(
+            collect(pool.render(Path("page.js"), {"js": "", "css": ""}, props))
+        )
+        await asyncio.sleep(0.05)
+        # the request went out and holds the worker while props load
+        assert pool.stats()["busy"] == 1
+        props.set_result(b"\x81\xa1a\x01")
+        assert b"page.js:4:" in await render
+    finally:
+        await pool.stop()
+
+
+@pytest.mark.asyncio
+async def test_failed_props_abort_the_render(tmp_path: Path, fake_worker, project):
+    pool = RenderPool(project, size=1, command=fake_worker)
+    await pool.start()
+    try:
+
+        async def load() -> bytes:
+            raise ValueError("no data")
+
+        with pytest.raises(ValueError, match="no data"):
+            await collect(pool.render(Path("page.js"), {}, load()))
+        assert b"ok.js:0:" in await collect(pool.render(Path("ok.js"), {}, None))
+    finally:
+        await pool.stop()
+
+
+@pytest.mark.asyncio
+async def test_deferred_props_reach_the_running_render(
+    tmp_path: Path, fake_worker, project
+):
+    pool = RenderPool(project, size=1, command=fake_worker)
+    await pool.start()
+    try:
+        deferred = DeferredProps({"slow": asyncio.sleep(0.05, "late")})
+        stream = pool.render(
+            Path("page.js"),
+            {"deferred": deferred.names},
+            None,
+            deferred=deferred.payloads(),
+        )
+        # the shell streams before the deferred value resolved
+        assert await anext(stream) == b"<html><body>"
+        rest = await collect(stream)
+        assert b'{"name": "slow", "value": "late"}' in rest
+        assert b"ok.js:0:" in await collect(pool.render(Path("ok.js"), {}, None))
+    finally:
+        await pool.stop()
+
+
+@pytest.mark.asyncio
+async def test_unconsumed_render_leaves_props_alone(fake_worker, build_pages):
+    project = build_pages(["Index"])
+    pool = RenderPool(project, size=1, command=fake_worker)
+    started = asyncio.Event()
+
+    async def load_props() -> bytes:
+        started.set()
+        return b"\x80"
+
+    props = load_props()
+    # e.g. served from the cache, or refused by admission control
+    stream = render_pooled(pool, project, "Index", props)
+    await stream.aclose()
+    await asyncio.sleep(0.01)
+    assert not started.is_set()
+    props.close()
+
+
+@pytest.mark.asyncio
+async def test_failed_render_cancels_its_props_loader(fake_worker, build_pages):
+    project = build_pages(["Index"])
+    pool = RenderPool(project, size=1, command=fake_worker)
+
+    async def load_props() -> bytes:
+        await asyncio.sleep(60)
+        return b"\x80"
+
+    # the pool is not running, so the render fails before loading props
+    with pytest.raises(RuntimeError, match="not running"):
+        await collect(render_pooled(pool, project, "Index", load_props()))
+    await asyncio.sleep(0.01)
+    assert asyncio.all_tasks() == {asyncio.current_task()}
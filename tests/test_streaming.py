@@ -0,0 +1,234 @@
+import asyncio
+
+import pytest
+
+from schorle.streaming import (
+    FlushPolicy,
+    HeadInjector,
+    ainject_head,
+    build_head_injection,
+    build_prelude,
+    client_shell,
+    flush_chunks,
+    inject_head,
+    preload_links,
+    strip_prelude,
+    with_deadline,
+)
+
+DOCUMENT = (
+    b"<!DOCTYPE html><html><head><meta charset='utf-8'/></head><body>hi</body></html>"
+)
+INJECTION = b"<link rel='stylesheet' href='/app.css' />\n"
+EXPECTED = DOCUMENT.replace(b"</head>", INJECTION + b"</head>")
+
+
+def test_build_head_injection():
+    injection = build_head_injection(
+        {"css": "/app.css", "headers": {"a": "b"}, "cookies": None}, b"\x81\xa1a\x01"
+    )
+    assert injection.startswith(INJECTION)
+    assert (
+        b"<script id='__SCHORLE_PROPS__' type='application/msgpack'>gaFhAQ==</script>"
+        in injection
+    )
+    assert b'{"a": "b"}' in injection
+    assert b"__SCHORLE_COOKIES__" not in injection
+    assert b"schorle-island" not in injection
+
+
+def test_build_head_injection_loads_islands():
+    injection = build_head_injection(
+        {"css": None, "headers": {}, "cookies": None},
+        None,
+        islands=[("components/Counter", "/counter.js")],
+    )
+    assert b'<script type="module">' in injection
+    assert b'"components/Counter":"/counter.js"' in injection
+
+
+@pytest.mark.parametrize("split", range(len(DOCUMENT) + 1))
+def test_head_injector_handles_any_split(split: int):
+    chunks = [DOCUMENT[:split], DOCUMENT[split:]]
+    assert b"".join(inject_head(chunks, INJECTION)) == EXPECTED
+
+
+def test_head_injector_byte_by_byte():
+    chunks = [DOCUMENT[i : i + 1] for i in range(len(DOCUMENT))]
+    assert b"".join(inject_head(chunks, INJECTION)) == EXPECTED
+
+
+def test_head_injector_passes_chunks_through_after_match():
+    injector = HeadInjector(INJECTION)
+    injector.feed(b"<html><head></head>")
+    body = b"<body></head></body>"
+    assert injector.feed(body) is body
+    assert injector.flush() == b""
+
+
+def test_head_injector_without_head():
+    chunks = [b"<div>no head here </he", b"ader>"]
+    assert b"".join(inject_head(chunks, INJECTION)) == b"".join(chunks)
+
+
+@pytest.mark.asyncio
+async def test_ainject_head():
+    async def stream():
+        for i in range(0, len(DOCUMENT), 5):
+            yield DOCUMENT[i : i + 5]
+
+    chunks = [chunk async for chunk in ainject_head(stream(), INJECTION)]
+    assert b"".join(chunks) == EXPECTED
+    assert all(chunks)
+
+
+@pytest.mark.asyncio
+async def test_ainject_head_awaits_injection_on_first_chunk():
+    resolved = asyncio.get_running_loop().create_future()
+
+    async def injection() -> bytes:
+        return await resolved
+
+    async def stream():
+        resolved.set_result(INJECTION)
+        yield DOCUMENT
+
+    assert [chunk async for chunk in ainject_head(stream(), injection())] == [EXPECTED]
+
+
+async def slow_render(chunks, delay, closed):
+    try:
+        for chunk in chunks:
+            await asyncio.sleep(delay)
+            yield chunk
+    finally:
+        closed.append(True)
+
+
+@pytest.mark.asyncio
+async def test_deadline_serves_fallback_before_first_chunk():
+    closed = []
+    stream = with_deadline(
+        slow_render([b"<html>"], 1, closed), 0.01, b"<shell>", "Index"
+    )
+    assert [chunk async for chunk in stream] == [b"<shell>"]
+    assert closed == [True]
+
+
+@pytest.mark.asyncio
+async def test_deadline_cuts_started_render():
+    closed = []
+
+    async def render():
+        try:
+            yield b"<html>"
+            await asyncio.sleep(1)
+            yield b"</html>"
+        finally:
+            closed.append(True)
+
+    stream = with_deadline(render(), 0.05, b"<shell>", "Index")
+    assert [chunk async for chunk in stream] == [b"<html>"]
+    assert closed == [True]
+
+
+@pytest.mark.asyncio
+async def test_deadline_without_fallback_aborts():
+    closed = []
+    stream = with_deadline(
+        slow_render([b"<html>"], 1, closed), 0.01, lambda: None, "Index"
+    )
+    assert [chunk async for chunk in stream] == []
+    assert closed == [True]
+
+
+@pytest.mark.asyncio
+async def test_deadline_passes_fast_renders_through():
+    closed = []
+    stream = with_deadline(slow_render([b"a", b"b"], 0, closed), 1, b"<shell>", "Index")
+    assert [chunk async for chunk in stream] == [b"a", b"b"]
+
+
+def test_client_shell_loads_page_bundle():
+    shell = client_shell("/page.js", b"<link rel='stylesheet' href='/page.css' />")
+    assert shell.startswith(b"<!DOCTYPE html><html><head><link")
+    assert b'<script type="module" src="/page.js"></script>' in shell
+
+
+async def chunked(data: bytes, size: int, delay: float = 0):
+    for i in range(0, len(data), size):
+        await asyncio.sleep(delay)
+        yield data[i : i + size]
+
+
+@pytest.mark.asyncio
+async def test_flush_policy_flushes_head_then_coalesces():
+    body = DOCUMENT + b"x" * 100
+    policy = FlushPolicy(min_bytes=64, max_delay=1)
+    chunks = [chunk async for chunk in flush_chunks(chunked(body, 3), policy)]
+
+    assert b"".join(chunks) == body
+    assert chunks[0] == DOCUMENT[: DOCUMENT.index(b"</head>") + len(b"</head>")]
+    assert all(len(chunk) >= 64 for chunk in chunks[1:-1])
+    assert len(chunks) < len(body) // 3
+
+
+@pytest.mark.asyncio
+async def test_flush_policy_flushes_after_max_delay():
+    closed = []
+    policy = FlushPolicy(min_bytes=1024, max_delay=0.02)
+    stream = flush_chunks(slow_render([b"a", b"b", b"c"], 0.05, closed), policy)
+
+    assert [chunk async for chunk in stream] == [b"a", b"b", b"c"]
+    assert closed == [True]
+
+
+@pytest.mark.asyncio
+async def test_flush_policy_closes_abandoned_render():
+    closed = []
+    policy = FlushPolicy(min_bytes=1, max_delay=0)
+    stream = flush_chunks(slow_render([b"a", b"b"], 0.01, closed), policy)
+
+    assert await anext(stream) == b"a"
+    await stream.aclose()
+    assert closed == [True]
+
+
+def test_prelude_links_page_assets():
+    prelude = build_prelude("/page.css", "/page.js", ["/chunk.js"])
+    assert prelude.startswith(b'<!DOCTYPE html><meta charset="utf-8">')
+    assert b'<link rel="stylesheet" href="/page.css">' in prelude
+    assert b'<link rel="modulepreload" href="/page.js">' in prelude
+    assert prelude.endswith(b'<link rel="modulepreload" href="/chunk.js">')
+    assert b"<head>" not in prelude
+    assert (
+        preload_links("/page.css", "/page.js", ["/chunk.js"])
+        == "</page.css>; rel=preload; as=style, </page.js>; rel=modulepreload, "
+        "</chunk.js>; rel=modulepreload"
+    )
+    assert preload_links(None, None) == ""
+
+
+@pytest.mark.asyncio
+async def test_strip_prelude_split_across_chunks():
+    chunks = [chunk async for chunk in strip_prelude(chunked(DOCUMENT, 4))]
+    assert b"".join(chunks) == DOCUMENT.removeprefix(b"<!DOCTYPE html>")
+    assert all(chunks)
+
+    other = b"<html><body></body></html>"
+    assert b"".join([c async for c in strip_prelude(chunked(other, 100))]) == other
+
+
+@pytest.mark.asyncio
+async def test_strip_prelude_drops_the_injected_stylesheet():
+    render_request = {"css": "/page.css", "headers": None, "cookies": None}
+    injection = build_head_injection(render_request, None)
+    document = DOCUMENT.replace(b"</head>", injection + b"</head>", 1)
+    assert b"/page.css" in document
+
+    stripped = b"".join(
+        [c async for c in strip_prelude(chunked(document, 3), "/page.css")]
+    )
+    prelude = build_prelude("/page.css", None)
+    assert (prelude + stripped).count(b"/page.css") == 1
+    assert stripped.endswith(b"</html>")
@@ -0,0 +1,91 @@
+import logging
+from pathlib import Path
+
+import pytest
+
+from schorle.registry import PageRecord
+from schorle.render import render, render_async
+from schorle.render_pool import RenderPool
+from schorle.worker_logs import StderrLogger
+
+
+def make_record(tmp_path: Path, name: str) -> PageRecord:
+    server_js = tmp_path / ".schorle" / "dist" / "server" / f"{name}.js"
+    server_js.parent.mkdir(parents=True)
+    server_js.write_text("")
+    return PageRecord(
+        name=name,
+        key=name,
+        page=tmp_path / "ui" / "pages" / f"{name}.tsx",
+        layouts=(),
+        js=None,
+        css=None,
+        server_js=f"/.schorle/dist/server/{name}.js",
+        server_js_path=server_js,
+    )
+
+
+def test_stderr_logger_splits_and_caps_lines(caplog):
+    caplog.set_level(logging.INFO, logger="schorle.worker_logs")
+    sink = StderrLogger(lambda: ("Index", "7"), pid=42, max_line_bytes=8)
+    sink.feed(b"first\nsec")
+    sink.feed(b"ond\n" + b"z" * 20)
+    sink.feed(b"z" * 20 + b"\nlast")
+    sink.flush()
+
+    messages = [record.getMessage() for record in caplog.records]
+    assert messages == [
+        "[Index #7] first",
+        "[Index #7] second",
+        "[Index #7] zzzzzzzz...",
+        "[Index #7] last",
+    ]
+    assert caplog.records[0].page == "Index"
+    assert caplog.records[0].request_id == "7"
+    assert caplog.records[0].pid == 42
+
+
+@pytest.mark.asyncio
+async def test_pool_worker_logging_megabytes_does_not_stall(
+    tmp_path, caplog, fake_worker, project
+):
+    caplog.set_level(logging.INFO, logger="schorle.worker_logs")
+    pool = RenderPool(project, size=1, command=fake_worker)
+    await pool.start()
+    try:
+        stream = pool.render(Path("chatty.js"), {}, None, page="Chatty")
+        html = b"".join([chunk async for chunk in stream])
+    finally:
+        await pool.stop()
+
+    assert html.endswith(b"</html>")
+    lines = [r for r in caplog.records if r.name == "schorle.worker_logs"]
+    assert len(lines) == 4 * 1024 + 1
+    assert lines[0].page == "Chatty"
+    assert len(lines[-1].getMessage()) < 10_000
+
+
+@pytest.mark.asyncio
+async def test_one_shot_render_logging_megabytes_does_not_stall(
+    tmp_path, caplog, fake_worker, project
+):
+    caplog.set_level(logging.INFO, logger="schorle.worker_logs")
+    record = make_record(tmp_path, "chatty")
+
+    stream = render_async(project, record, command=(*fake_worker, "render"))
+    html = b"".join([chunk async for chunk in stream])
+
+    assert html.endswith(b"</html>")
+    assert len(caplog.records) == 4 * 1024 + 1
+    assert caplog.records[0].page == "chatty"
+
+
+def test_sync_render_logging_megabytes_does_not_stall(
+    tmp_path, caplog, fake_worker, project
+):
+    caplog.set_level(logging.INFO, logger="schorle.worker_logs")
+    record = make_record(tmp_path, "chatty")
+
+    html = b"".join(render(project, record, command=(*fake_worker, "render")))
+
+    assert html.endswith(b"</html>")